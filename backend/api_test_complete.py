@@ -4,6 +4,8 @@ import math
 import random
 from datetime import datetime
 
+from services.simulated_annealing import calculate_distance_matrix_gps
+
 app = Flask(__name__)
 CORS(app, supports_credentials=True)
 app.config['SECRET_KEY'] = 'dev-secret-key'
@@ -32,23 +34,6 @@ CAMIONS = [
 
 TOURNEES = []
 
-def calculate_distance_gps(lat1, lon1, lat2, lon2):
-    """Calcule la distance entre deux points GPS (formule haversine)"""
-    R = 6371  # Rayon de la Terre en km
-    
-    lat1_rad = math.radians(lat1)
-    lon1_rad = math.radians(lon1)
-    lat2_rad = math.radians(lat2)
-    lon2_rad = math.radians(lon2)
-    
-    dlat = lat2_rad - lat1_rad
-    dlon = lon2_rad - lon1_rad
-    
-    a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    
-    return R * c
-
 def simulated_annealing_tsp(distance_matrix, cities, initial_temp=1000, cooling_rate=0.95, min_temp=1):
     """Algorithme de recuit simulé pour résoudre le TSP"""
     
@@ -160,16 +145,9 @@ def optimize_tournee(camion_id):
         
         # Créer la matrice des distances
         n = len(CLIENTS)
-        distance_matrix = [[0 for _ in range(n)] for _ in range(n)]
-        
-        for i in range(n):
-            for j in range(n):
-                if i != j:
-                    dist = calculate_distance_gps(
-                        CLIENTS[i]['latitude'], CLIENTS[i]['longitude'],
-                        CLIENTS[j]['latitude'], CLIENTS[j]['longitude']
-                    )
-                    distance_matrix[i][j] = dist
+        distance_matrix = calculate_distance_matrix_gps(
+            [c['latitude'] for c in CLIENTS], [c['longitude'] for c in CLIENTS]
+        )
         
         # Optimiser avec recuit simulé
         cities = list(range(n))
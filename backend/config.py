@@ -7,3 +7,15 @@ class Config:
     DB_NAME = "viaCargo"
     DB_PORT = 5432
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key'
+    # Serveur OSRM (service table) ; une instance locale évite les limites du serveur public
+    OSRM_URL = os.environ.get('OSRM_URL') or 'http://router.project-osrm.org'
+    OSRM_TAILLE_TUILE = int(os.environ.get('OSRM_TAILLE_TUILE', 100))
+    OSRM_TIMEOUT = float(os.environ.get('OSRM_TIMEOUT', 10))
+    # Requêtes OSRM simultanées lors du calcul des matrices de toute la flotte
+    OSRM_WORKERS = int(os.environ.get('OSRM_WORKERS', 8))
+    # Fournisseur de distances (haversine ou osrm) des tournées, et celui des matrices stockées
+    DISTANCE_PROVIDER = os.environ.get('DISTANCE_PROVIDER') or 'haversine'
+    DISTANCE_PROVIDER_MATRICES = os.environ.get('DISTANCE_PROVIDER_MATRICES') or 'osrm'
+    # OSRM derrière le cache de distances, avec repli sur haversine s'il est indisponible
+    DISTANCE_CACHE = os.environ.get('DISTANCE_CACHE', '1') == '1'
+    DISTANCE_REPLI = os.environ.get('DISTANCE_REPLI', '1') == '1'
@@ -45,12 +45,26 @@ CREATE TABLE
         CONSTRAINT fk_colis_client FOREIGN KEY (id_client) REFERENCES client (id_client) ON DELETE CASCADE
     );
 
+CREATE TABLE
+    optimisation_runs (
+        id INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+        executed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        valeur DOUBLE PRECISION,
+        borne DOUBLE PRECISION,
+        gap DOUBLE PRECISION,
+        optimal BOOLEAN,
+        arret VARCHAR(20),
+        noeuds_explores BIGINT
+    );
+
 CREATE TABLE
     assignments (
         id_assignment INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
         id_camion INTEGER NOT NULL,
         id_colis INTEGER NOT NULL,
         time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        run_id INTEGER,
+        CONSTRAINT fk_assig_run FOREIGN KEY (run_id) REFERENCES optimisation_runs (id) ON DELETE SET NULL,
         CONSTRAINT fk_assig_camion FOREIGN KEY (id_camion) REFERENCES camion (id_camion) ON DELETE CASCADE,
         CONSTRAINT fk_assig_colis FOREIGN KEY (id_colis) REFERENCES colis (id_colis) ON DELETE CASCADE
     );
@@ -64,6 +78,26 @@ CREATE TABLE
         longitude DOUBLE PRECISION
     );
 
+CREATE TABLE
+    matrice_distances (
+        id_camion INTEGER PRIMARY KEY,
+        points JSONB NOT NULL,
+        distances BYTEA NOT NULL,
+        calculee_le TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        CONSTRAINT fk_matrice_camion FOREIGN KEY (id_camion) REFERENCES camion (id_camion) ON DELETE CASCADE
+    );
+
+CREATE TABLE
+    cache_distances (
+        id INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+        source VARCHAR(20) NOT NULL,
+        depart VARCHAR(40) NOT NULL,
+        arrivee VARCHAR(40) NOT NULL,
+        distance DOUBLE PRECISION NOT NULL
+    );
+
+CREATE UNIQUE INDEX idx_cache_distances ON cache_distances (source, depart, arrivee);
+
 CREATE TABLE
     tournee (
         id_tournee INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
@@ -72,6 +106,10 @@ CREATE TABLE
         ordre_clients JSONB NOT NULL,
         distance_totale DOUBLE PRECISION,
         temps_estime DOUBLE PRECISION,
+        parametres JSONB,
+        empreinte CHAR(64),
         CONSTRAINT fk_depot FOREIGN KEY (depot_id) REFERENCES depot (id_depot),
         CONSTRAINT fk_camion FOREIGN KEY (camion_id) REFERENCES camion (id_camion)
-    );
\ No newline at end of file
+    );
+
+CREATE INDEX idx_tournee_empreinte ON tournee (camion_id, empreinte);
\ No newline at end of file
@@ -2,4 +2,4 @@ from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
 
-from .models import Admin, Camion, Colis, Assignment, Depot, Client, DistanceMatrix
\ No newline at end of file
+from .models import Admin, Camion, Colis, Assignment, Depot, Client, DistanceMatrix, MatriceDistances, CacheDistance
\ No newline at end of file
@@ -118,6 +118,34 @@ class DistanceMatrix(db.Model):
             "distance": self.distance
         }
 
+class MatriceDistances(db.Model):
+    """
+    Matrice des distances d'un camion en un seul blob : float32 n×n en
+    ordre C, points = identifiants des lignes/colonnes (0 = dépôt).
+    """
+    __tablename__ = "matrice_distances"
+    id_camion = db.Column(db.Integer, db.ForeignKey("camion.id_camion"), primary_key=True)
+    points = db.Column(db.JSON, nullable=False)
+    distances = db.Column(db.LargeBinary, nullable=False)
+    calculee_le = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "id_camion": self.id_camion,
+            "points": self.points,
+            "calculee_le": self.calculee_le.isoformat() if self.calculee_le else None
+        }
+
+class CacheDistance(db.Model):
+    """Distance entre deux points (coordonnées arrondies) pour une source donnée, unité comprise (osrm_km, ...)"""
+    __tablename__ = "cache_distances"
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(20), nullable=False)
+    depart = db.Column(db.String(40), nullable=False)
+    arrivee = db.Column(db.String(40), nullable=False)
+    distance = db.Column(db.Float, nullable=False)
+    __table_args__ = (db.Index("idx_cache_distances", "source", "depart", "arrivee", unique=True),)
+
 class Client(db.Model):
     __tablename__ = "client"
     id_client = db.Column(db.Integer, primary_key=True)
@@ -145,6 +173,10 @@ class Tournee(db.Model):
     ordre_clients = db.Column(db.JSON, nullable=False)
     distance_totale = db.Column(db.Float, nullable=True)
     temps_estime = db.Column(db.Float, nullable=True)
+    # Graines et paramètres du recuit, pour régénérer la tournée à l'identique
+    parametres = db.Column(db.JSON, nullable=True)
+    # Empreinte (camion, colis, coordonnées, paramètres) : cache des résultats
+    empreinte = db.Column(db.String(64), nullable=True, index=True)
     
     def to_dict(self):
         return {
@@ -153,5 +185,6 @@ class Tournee(db.Model):
             "camion_id": self.camion_id,
             "ordre_clients": self.ordre_clients,
             "distance_totale": self.distance_totale,
-            "temps_estime": self.temps_estime
+            "temps_estime": self.temps_estime,
+            "parametres": self.parametres
         }
\ No newline at end of file
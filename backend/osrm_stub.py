@@ -0,0 +1,117 @@
+"""
+Faux serveur OSRM (service table) pour les tests et les mesures hors ligne.
+
+Les distances sont des distances haversine en mètres. Options pour
+reproduire le comportement d'un vrai serveur : latence par requête,
+taille maximale d'une table (réponse 400 TooBig) et échecs 503 sur les
+premières requêtes.
+
+    python osrm_stub.py --port 5001
+    python osrm_stub.py --bench 500     # mesure OSRMClient sur 500 points
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from services.simulated_annealing import calculate_distance_matrix_gps
+
+
+class ServeurOSRM(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, adresse, latence=0.0, taille_max=None, echecs=0):
+        super().__init__(adresse, GestionnaireOSRM)
+        self.latence = latence
+        self.taille_max = taille_max
+        self.echecs = echecs
+        self.requetes = 0
+        self.verrou = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class GestionnaireOSRM(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, comme un vrai serveur
+
+    def log_message(self, format, *args):
+        pass
+
+    def repondre(self, statut, corps):
+        contenu = json.dumps(corps).encode()
+        self.send_response(statut)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(contenu)))
+        self.end_headers()
+        self.wfile.write(contenu)
+
+    def do_GET(self):
+        serveur = self.server
+        with serveur.verrou:
+            serveur.requetes += 1
+            echoue = serveur.requetes <= serveur.echecs
+        if serveur.latence:
+            time.sleep(serveur.latence)
+        if echoue:
+            return self.repondre(503, {"code": "Unavailable"})
+
+        url = urlsplit(self.path)
+        morceaux = url.path.split("/")
+        if len(morceaux) != 5 or morceaux[1] != "table":
+            return self.repondre(400, {"code": "InvalidUrl", "message": url.path})
+        points = [tuple(map(float, c.split(","))) for c in morceaux[4].split(";")]
+        params = parse_qs(url.query)
+
+        def indices(nom):
+            if nom not in params:
+                return list(range(len(points)))
+            return [int(k) for k in params[nom][0].split(";")]
+
+        sources, destinations = indices("sources"), indices("destinations")
+        if serveur.taille_max and max(len(sources), len(destinations)) > serveur.taille_max:
+            return self.repondre(400, {"code": "TooBig", "message": "Too many table coordinates"})
+        longitudes, latitudes = zip(*points)
+        matrice = calculate_distance_matrix_gps(latitudes, longitudes) * 1000
+        self.repondre(200, {"code": "Ok", "distances": matrice[sources][:, destinations].tolist()})
+
+
+def demarrer(port=0, **options):
+    """Démarre le serveur dans un thread ; renvoie le serveur (arrêt : shutdown())"""
+    serveur = ServeurOSRM(("127.0.0.1", port), **options)
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    return serveur
+
+
+def mesurer(n, taille_tuile, latence):
+    import random
+    from services.osrm_client import OSRMClient
+    serveur = demarrer(latence=latence, taille_max=taille_tuile)
+    r = random.Random(0)
+    points = [(r.uniform(33, 34), r.uniform(-8, -7)) for _ in range(n)]
+    client = OSRMClient(serveur.url, taille_tuile=taille_tuile)
+    debut = time.perf_counter()
+    client.table(points)
+    print(f"{n} points, tuiles de {taille_tuile} : {client.requetes} requêtes, "
+          f"{time.perf_counter() - debut:.2f} s")
+    serveur.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--latence", type=float, default=0.0, help="secondes ajoutées à chaque requête")
+    parser.add_argument("--taille-max", type=int, default=100, help="sources ou destinations max par requête")
+    parser.add_argument("--echecs", type=int, default=0, help="nombre de premières requêtes en 503")
+    parser.add_argument("--bench", type=int, metavar="N", help="mesure OSRMClient sur N points puis quitte")
+    args = parser.parse_args()
+    if args.bench:
+        mesurer(args.bench, args.taille_max, args.latence)
+    else:
+        serveur = ServeurOSRM(("127.0.0.1", args.port), latence=args.latence,
+                              taille_max=args.taille_max, echecs=args.echecs)
+        print(f"Faux OSRM sur {serveur.url}")
+        serveur.serve_forever()
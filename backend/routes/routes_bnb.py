@@ -1,9 +1,54 @@
-from flask import Blueprint, jsonify
-from services.bnb_knapsack import executer_bnb
+from flask import Blueprint, jsonify, request
+from services.bnb_knapsack import (
+    executer_bnb, MODE_NAIF, MODE_FRACTIONNEL, STRATEGIE_PROFONDEUR, STRATEGIE_MEILLEUR,
+    MOTEUR_BNB, MOTEUR_DP
+)
 
 solution_bp = Blueprint("solution", __name__)
 
+# Budget par défaut : les répartiteurs doivent avoir une réponse en moins de 5 s
+TEMPS_MAX_DEFAUT = 5.0
+
+
+def lire_budget(nom, defaut, conversion):
+    """Lit un budget positif dans la query string ; 0 ou moins = pas de limite"""
+    valeur = request.args.get(nom)
+    if valeur is None:
+        return defaut
+    valeur = conversion(valeur)
+    return valeur if valeur > 0 else None
+
+
+def lire_option(nom):
+    """Option booléenne de la query string (1 / true / oui)"""
+    return request.args.get(nom, "0").lower() in ("1", "true", "oui")
+
+
 @solution_bp.route("/solution/sac_a_dos", methods=["GET"])
 def lancer():
-    sol = executer_bnb()
+    mode = request.args.get("mode", MODE_NAIF)
+    if mode not in (MODE_NAIF, MODE_FRACTIONNEL):
+        return jsonify({"error": f"Mode inconnu: {mode}"}), 400
+    moteur = request.args.get("engine", MOTEUR_BNB)
+    if moteur not in (MOTEUR_BNB, MOTEUR_DP):
+        return jsonify({"error": f"Moteur inconnu: {moteur}"}), 400
+    strategie = request.args.get("strategie", STRATEGIE_PROFONDEUR)
+    if strategie not in (STRATEGIE_PROFONDEUR, STRATEGIE_MEILLEUR):
+        return jsonify({"error": f"Stratégie inconnue: {strategie}"}), 400
+    try:
+        temps_max = lire_budget("temps_max", TEMPS_MAX_DEFAUT, float)
+        noeuds_max = lire_budget("noeuds_max", None, int)
+        # Nombre de processus du mode parallèle (absent ou 0 = séquentiel)
+        workers = lire_budget("workers", None, int)
+        # Colis déjà affectés que le mode incrémental peut changer de camion
+        deplacements_max = lire_budget("deplacements_max", None, int) or 0
+    except ValueError:
+        return jsonify({"error": "temps_max, noeuds_max, workers et deplacements_max doivent être des nombres"}), 400
+    incremental = lire_option("incremental")
+    # Décomposition par horizon de livraison (aujourd'hui / demain / plus tard)
+    horizon = lire_option("horizon")
+    sol = executer_bnb(mode=mode, temps_max=temps_max, noeuds_max=noeuds_max,
+                       strategie=strategie, workers=workers, moteur=moteur,
+                       incremental=incremental, deplacements_max=deplacements_max,
+                       horizon=horizon)
     return jsonify(sol)
@@ -1,14 +1,238 @@
+import hashlib
+import json
+import random
+from datetime import datetime, time, timedelta
+
 from flask import Blueprint, request, jsonify
+from config import Config
 from models import db
 from models.models import Tournee, Client, Camion, Depot, Colis, Assignment
 from routes.auth_route import login_required 
-from services.simulated_annealing import SimulatedAnnealing, calculate_distance_gps
+from services.distance_provider import DistanceIndisponible, fournisseur_distances
+from services.simulated_annealing import (
+    solve_multi_depart, solve_flotte, SimulatedAnnealingDepot,
+    TEMPERATURE_AUTO, MOUVEMENTS, CONSTRUCTIONS
+)
 
 tournee_bp = Blueprint("tournee", __name__)
 
+# Planning par défaut du recuit : ~20 itérations par ville et par palier,
+# au plus 2 s par tournée (paramètres surchargeables dans la query string)
+FACTEUR_ITERATIONS_DEFAUT = 20
+TEMPS_MAX_RECUIT_DEFAUT = 2.0
+
+VITESSE_MOYENNE = 50  # km/h
+# Temps passé à chaque arrêt en mode ancré au dépôt
+SERVICE_MINUTES_DEFAUT = 5
+
+
+def lire_parametres_recuit():
+    """
+    Paramètres du recuit lus dans la query string. Lève ValueError si une
+    valeur est invalide. temps_max ou max_sans_amelioration <= 0 = sans limite.
+    """
+    args = request.args
+    parametres = {
+        "initial_temp": TEMPERATURE_AUTO,
+        "min_temp": TEMPERATURE_AUTO,
+        "facteur_iterations": FACTEUR_ITERATIONS_DEFAUT,
+        "temps_max": TEMPS_MAX_RECUIT_DEFAUT,
+    }
+    for nom in ("initial_temp", "min_temp"):
+        if nom in args and args[nom] != TEMPERATURE_AUTO:
+            parametres[nom] = float(args[nom])
+            if parametres[nom] <= 0:
+                raise ValueError(f"{nom} doit être positif")
+    if "cooling_rate" in args:
+        parametres["cooling_rate"] = float(args["cooling_rate"])
+        if not 0 < parametres["cooling_rate"] < 1:
+            raise ValueError("cooling_rate doit être dans ]0, 1[")
+    if "facteur_iterations" in args:
+        parametres["facteur_iterations"] = int(args["facteur_iterations"])
+        if parametres["facteur_iterations"] <= 0:
+            raise ValueError("facteur_iterations doit être positif")
+    if "temps_max" in args:
+        parametres["temps_max"] = float(args["temps_max"]) if float(args["temps_max"]) > 0 else None
+    if "max_sans_amelioration" in args:
+        max_sans_amelioration = int(args["max_sans_amelioration"])
+        parametres["max_sans_amelioration"] = max_sans_amelioration if max_sans_amelioration > 0 else None
+    if "p0" in args:
+        parametres["p0"] = float(args["p0"])
+        if not 0 < parametres["p0"] < 1:
+            raise ValueError("p0 doit être dans ]0, 1[")
+    if "voisinages" in args:
+        voisinages = tuple(v for v in args["voisinages"].split(",") if v)
+        if not voisinages or set(voisinages) - set(MOUVEMENTS):
+            raise ValueError(f"voisinages parmi {', '.join(MOUVEMENTS)}")
+        parametres["voisinages"] = voisinages
+    if "construction" in args:
+        if args["construction"] not in CONSTRUCTIONS:
+            raise ValueError(f"construction parmi {', '.join(CONSTRUCTIONS)}")
+        parametres["construction"] = args["construction"]
+    return parametres
+
+
+def lire_parametres_departs():
+    """
+    departs (1 par défaut), workers et seed du multi-départ. Sans seed, une
+    graine est tirée puis enregistrée avec la tournée.
+    """
+    departs = int(request.args.get("departs", 1))
+    workers = int(request.args.get("workers", 0)) or None
+    if departs <= 0 or (workers is not None and workers < 0):
+        raise ValueError("departs et workers doivent être positifs")
+    seed = request.args.get("seed")
+    seed = int(seed) if seed is not None else random.SystemRandom().getrandbits(32)
+    return departs, workers, seed
+
+
+def lire_parametres_depot():
+    """
+    Mode ancré au dépôt (depot=1) : heure de départ (depart, ISO 8601 ;
+    par défaut maintenant, à la minute) et temps de service par arrêt
+    (service, en minutes). None si le mode n'est pas demandé.
+    """
+    if request.args.get("depot", "0").lower() not in ("1", "true", "oui"):
+        return None
+    depart = request.args.get("depart")
+    depart = datetime.fromisoformat(depart) if depart else datetime.now().replace(second=0, microsecond=0)
+    service = float(request.args.get("service", SERVICE_MINUTES_DEFAUT))
+    if service < 0:
+        raise ValueError("service doit être positif ou nul")
+    return {"depart": depart, "service": service / 60}
+
+
+def lire_fournisseur():
+    """
+    Fournisseur des distances (distances=haversine|osrm, par défaut
+    Config.DISTANCE_PROVIDER). Lève ValueError si le nom est inconnu.
+    """
+    return fournisseur_distances(request.args.get("distances") or Config.DISTANCE_PROVIDER)
+
+
+def echeance_livraison(date_livraison, depart):
+    """
+    Heures entre le départ et l'échéance d'un colis, None sans date.
+    Une date à minuit pile désigne toute la journée : l'échéance est la
+    fin de ce jour-là.
+    """
+    if date_livraison is None:
+        return None
+    if date_livraison.time() == time.min:
+        date_livraison += timedelta(days=1)
+    return (date_livraison - depart).total_seconds() / 3600
+
+
+def preparer_probleme(colis, depot, ancrage):
+    """
+    Coordonnées des points de la tournée et options propres au camion.
+    En mode ancré, le dépôt est le point 0 et chaque colis a son échéance.
+    """
+    latitudes = [c.latitude for c in colis]
+    longitudes = [c.longitude for c in colis]
+    if ancrage is None:
+        return latitudes, longitudes, {}
+    options = {
+        "echeances": [None] + [echeance_livraison(c.date_livraison, ancrage["depart"]) for c in colis],
+        "vitesse": VITESSE_MOYENNE,
+        "service": ancrage["service"],
+    }
+    return [depot.latitude] + latitudes, [depot.longitude] + longitudes, options
+
+
+def creer_tournee(camion_id, depot, colis, probleme, matrice, resultat, seed, empreinte):
+    """
+    Tournee à partir du résultat du recuit sur matrice. En mode ancré, l'ordre omet le
+    dépôt et temps_estime vient du planning (trajets + arrêts, retour au
+    dépôt compris) ; les colis livrés après leur échéance sont listés dans
+    parametres["retards"].
+    """
+    options = probleme[2]
+    best_route, best_distance, graines = resultat
+    parametres = {"seed_depart": seed, **graines}
+    if "echeances" in options:
+        sa = SimulatedAnnealingDepot(matrice, **options)
+        heures, temps_estime = sa.planning(best_route)
+        ordre_colis = [colis[i - 1].id_colis for i in best_route[1:]]
+        parametres["retards"] = [colis[v - 1].id_colis for v, h in zip(best_route, heures)
+                                 if h > sa.echeances[v] + 1e-9]
+    else:
+        ordre_colis = [colis[i].id_colis for i in best_route]
+        temps_estime = best_distance / VITESSE_MOYENNE
+    return Tournee(
+        depot_id=depot.id_depot if depot else 1,
+        camion_id=camion_id,
+        ordre_clients=ordre_colis,
+        distance_totale=round(best_distance, 2),
+        temps_estime=round(temps_estime, 2),
+        parametres=parametres,
+        empreinte=empreinte
+    )
+
+
+def calculer_empreinte(camion_id, colis, parametres, departs, ancrage=None, depot=None, distances=None):
+    """
+    Hash SHA-256 de tout ce qui détermine la tournée : camion, colis triés
+    avec leurs coordonnées, source des distances, paramètres du recuit,
+    nombre de départs et graine demandée (None = graine tirée au hasard) ; en mode ancré, le
+    dépôt, l'heure de départ, le temps de service et les échéances.
+    """
+    contenu = {
+        "camion_id": camion_id,
+        "colis": sorted((c.id_colis, c.latitude, c.longitude) for c in colis),
+        "parametres": parametres,
+        "departs": departs,
+        "seed": request.args.get("seed"),
+        "distances": distances,
+    }
+    if ancrage is not None:
+        contenu["ancrage"] = {
+            "depot": (depot.id_depot, depot.latitude, depot.longitude),
+            "depart": ancrage["depart"].isoformat(),
+            "service": ancrage["service"],
+            "echeances": sorted((c.id_colis, str(c.date_livraison)) for c in colis),
+        }
+    return hashlib.sha256(json.dumps(contenu, sort_keys=True, default=list).encode()).hexdigest()
+
+
+def tournee_en_cache(camion_id, empreinte):
+    """Dernière tournée calculée pour la même empreinte, ou None"""
+    if request.args.get("force", "0").lower() in ("1", "true", "oui"):
+        return None
+    return (Tournee.query.filter_by(camion_id=camion_id, empreinte=empreinte)
+            .order_by(Tournee.id_tournee.desc()).first())
+
+
+def verifier_depot(depot, ancrage):
+    """Message d'erreur si le mode ancré est demandé sans dépôt localisé, sinon None"""
+    if ancrage is not None and (depot is None or not depot.latitude or not depot.longitude):
+        return "Le mode dépôt exige un dépôt avec des coordonnées"
+    return None
+
+
+def verifier_colis(colis):
+    """Message d'erreur si les colis d'un camion ne permettent pas d'optimiser, sinon None"""
+    if not colis:
+        return "Aucun colis assigné à ce camion. Lancez d'abord l'optimisation B&B."
+    if len(colis) < 2:
+        return "Pas assez de colis assignés pour optimiser la tournée"
+    for c in colis:
+        if not c.latitude or not c.longitude:
+            return f"Coordonnées manquantes pour le colis {c.id_colis}"
+    return None
+
+
 @tournee_bp.route("/optimize/<int:camion_id>", methods=["POST"])
 def optimize_tournee(camion_id):
     """Optimise la tournée pour un camion donné"""
+    try:
+        parametres = lire_parametres_recuit()
+        departs, workers, seed = lire_parametres_departs()
+        ancrage = lire_parametres_depot()
+        fournisseur = lire_fournisseur()
+    except ValueError as e:
+        return jsonify({"error": f"Paramètre invalide : {e}"}), 400
+
     try:
         # Vérifier que le camion existe
         camion = Camion.query.get(camion_id)
@@ -17,55 +241,123 @@ def optimize_tournee(camion_id):
         
         # Récupérer SEULEMENT les colis assignés à ce camion par B&B
         assignments = db.session.query(Colis).join(Assignment).filter(Assignment.id_camion == camion_id).all()
+        depot = Depot.query.order_by(Depot.id_depot).first()
         
-        if not assignments:
-            return jsonify({"error": "Aucun colis assigné à ce camion. Lancez d'abord l'optimisation B&B."}), 400
-        
-        if len(assignments) < 2:
-            return jsonify({"error": "Pas assez de colis assignés pour optimiser la tournée"}), 400
-        
-        # Vérifier que tous les colis ont des coordonnées
-        for colis in assignments:
-            if not colis.latitude or not colis.longitude:
-                return jsonify({"error": f"Coordonnées manquantes pour le colis {colis.id_colis}"}), 400
-        
-        # Créer matrice des distances pour les colis assignés
-        n = len(assignments)
-        distance_matrix = [[0 for _ in range(n)] for _ in range(n)]
+        erreur = verifier_colis(assignments) or verifier_depot(depot, ancrage)
+        if erreur:
+            return jsonify({"error": erreur}), 400
+
+        # Mêmes colis, mêmes coordonnées, mêmes paramètres : tournée déjà connue
+        empreinte = calculer_empreinte(camion_id, assignments, parametres, departs, ancrage, depot,
+                                       fournisseur.nom)
+        existante = tournee_en_cache(camion_id, empreinte)
+        if existante:
+            return jsonify({**existante.to_dict(), "cache": True}), 200
         
-        for i in range(n):
-            for j in range(n):
-                if i != j:
-                    dist = calculate_distance_gps(
-                        assignments[i].latitude, assignments[i].longitude,
-                        assignments[j].latitude, assignments[j].longitude
-                    )
-                    distance_matrix[i][j] = dist
+        # Créer matrice des distances pour les colis assignés (dépôt en tête en mode ancré)
+        probleme = preparer_probleme(assignments, depot, ancrage)
+        latitudes, longitudes, options = probleme
+        distance_matrix = fournisseur.matrice(list(zip(latitudes, longitudes)))
         
         # Optimiser avec recuit simulé
-        sa = SimulatedAnnealing(distance_matrix, use_nearest_neighbor=True)
-        indices = list(range(n))
-        best_route, best_distance = sa.solve(indices)
-        
-        # Convertir en IDs des colis assignés
-        ordre_colis = [assignments[i].id_colis for i in best_route]
-        temps_estime = best_distance / 50  # Vitesse moyenne 50 km/h
+        indices = list(range(len(latitudes)))
+        resultat = solve_multi_depart(
+            distance_matrix, indices, departs=departs, workers=workers, seed=seed,
+            use_nearest_neighbor=True, coordonnees=list(zip(latitudes, longitudes)),
+            **options, **parametres
+        )
         
         # Sauvegarder en base
-        depot = db.session.query(db.func.min(Depot.id_depot)).scalar() or 1
-        tournee = Tournee(
-            depot_id=depot,
-            camion_id=camion_id,
-            ordre_clients=ordre_colis,
-            distance_totale=round(best_distance, 2),
-            temps_estime=round(temps_estime, 2)
-        )
+        tournee = creer_tournee(camion_id, depot, assignments, probleme, distance_matrix, resultat, seed, empreinte)
         
         db.session.add(tournee)
         db.session.commit()
         
-        return jsonify(tournee.to_dict()), 201
-        
+        return jsonify({**tournee.to_dict(), "cache": False}), 201
+
+    except DistanceIndisponible as e:
+        db.session.rollback()
+        return jsonify({"error": f"Distances indisponibles : {e}"}), 503
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+@tournee_bp.route("/optimize-all", methods=["POST"])
+def optimize_all():
+    """
+    Optimise les tournées de tous les camions ayant des colis assignés :
+    une seule requête pour les affectations, les recuits en parallèle
+    (un camion par worker) et toutes les tournées dans une transaction.
+    Les camions dont l'empreinte n'a pas changé reprennent leur tournée
+    existante (sauf force=1). Les camions impossibles à optimiser sont listés dans "ignores".
+    """
+    try:
+        parametres = lire_parametres_recuit()
+        departs, workers, seed = lire_parametres_departs()
+        ancrage = lire_parametres_depot()
+        fournisseur = lire_fournisseur()
+    except ValueError as e:
+        return jsonify({"error": f"Paramètre invalide : {e}"}), 400
+
+    try:
+        depot = Depot.query.order_by(Depot.id_depot).first()
+        erreur = verifier_depot(depot, ancrage)
+        if erreur:
+            return jsonify({"error": erreur}), 400
+
+        lignes = (db.session.query(Assignment.id_camion, Colis)
+                  .join(Colis, Colis.id_colis == Assignment.id_colis)
+                  .order_by(Assignment.id_camion, Colis.id_colis)
+                  .all())
+        colis_par_camion = {}
+        for camion_id, colis in lignes:
+            colis_par_camion.setdefault(camion_id, []).append(colis)
+
+        # Une graine par camion, dérivée de la graine de la requête
+        generateur = random.Random(seed)
+        problemes, ignores, seeds, empreintes, en_cache = {}, {}, {}, {}, []
+        preparations = {}
+        for camion_id, colis in colis_par_camion.items():
+            seeds[camion_id] = generateur.getrandbits(32)
+            erreur = verifier_colis(colis)
+            if erreur:
+                ignores[camion_id] = erreur
+                continue
+            empreintes[camion_id] = calculer_empreinte(camion_id, colis, parametres, departs, ancrage, depot,
+                                                       fournisseur.nom)
+            existante = tournee_en_cache(camion_id, empreintes[camion_id])
+            if existante:
+                en_cache.append(existante)
+                continue
+            preparations[camion_id] = preparer_probleme(colis, depot, ancrage)
+
+        # Matrices de tous les camions d'un coup (requêtes parallèles pour OSRM)
+        a_calculer = list(preparations)
+        matrices = fournisseur.matrices([list(zip(*preparations[camion_id][:2])) for camion_id in a_calculer])
+        for camion_id, matrice in zip(a_calculer, matrices):
+            if matrice is None:
+                ignores[camion_id] = "Distances indisponibles"
+                continue
+            latitudes, longitudes, options = preparations[camion_id]
+            problemes[camion_id] = (latitudes, longitudes, seeds[camion_id], {**options, "matrice": matrice})
+
+        resultats = solve_flotte(problemes, workers=workers, departs=departs,
+                                 use_nearest_neighbor=True, **parametres)
+
+        tournees = [
+            creer_tournee(camion_id, depot, colis_par_camion[camion_id], preparations[camion_id],
+                          problemes[camion_id][3]["matrice"], resultat, seeds[camion_id], empreintes[camion_id])
+            for camion_id, resultat in resultats.items()
+        ]
+        db.session.add_all(tournees)
+        db.session.commit()
+
+        return jsonify({
+            "tournees": ([{**t.to_dict(), "cache": False} for t in tournees]
+                         + [{**t.to_dict(), "cache": True} for t in en_cache]),
+            "ignores": ignores,
+        }), 201
+
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
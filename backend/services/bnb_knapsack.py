@@ -1,48 +1,821 @@
-from datetime import datetime
+import heapq
+import itertools
+import math
+import multiprocessing
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
 from database import get_connection
+from services.heuristiques_knapsack import demarrage as demarrage_heuristique
+from services.heuristiques_knapsack import inserer_avec_deplacements
 
-meilleure_solution = {"valeur": 0, "repartition": {}}
+# Modes de résolution disponibles pour executer_bnb
+MODE_NAIF = "naif"
+MODE_FRACTIONNEL = "fractionnel"
 
+# Stratégies de parcours de l'arbre
+STRATEGIE_PROFONDEUR = "profondeur"
+STRATEGIE_MEILLEUR = "meilleur_d_abord"
 
-def branch_and_bound(colis_restants, camions_dict, valeur_courante, repartition_courante):
-    global meilleure_solution
+# Taille maximale par défaut de la liste ouverte en meilleur d'abord
+MEMOIRE_MAX_DEFAUT = 100000
 
-    if not colis_restants:
-        if valeur_courante > meilleure_solution["valeur"]:
-            meilleure_solution["valeur"] = valeur_courante
-            meilleure_solution["repartition"] = {
-                k: v.copy() for k, v in repartition_courante.items()
+# Nombre maximal d'états gardés dans la table de transposition
+TABLE_MAX_DEFAUT = 200000
+
+# Moteurs de résolution : arbre de recherche ou programmation dynamique
+MOTEUR_BNB = "bnb"
+MOTEUR_DP = "dp"
+
+# Horizons de livraison pour la décomposition par date
+HORIZON_AUJOURDHUI = 0
+HORIZON_DEMAIN = 1
+HORIZON_PLUS_TARD = 2
+NOMS_HORIZONS = {HORIZON_AUJOURDHUI: "aujourdhui", HORIZON_DEMAIN: "demain", HORIZON_PLUS_TARD: "plus_tard"}
+
+# Priorité des colis en retard, et délai supposé des colis sans date
+PRIORITE_RETARD = 1000
+DELAI_SANS_DATE = timedelta(days=30)
+
+# Raisons d'arrêt anticipé de la recherche
+ARRET_TEMPS = "temps"
+ARRET_NOEUDS = "noeuds"
+
+# Le chronomètre n'est consulté que tous les N noeuds (time.monotonic a un coût)
+INTERVALLE_CHRONO = 1024
+
+
+def trier_par_ratio(colis):
+    """Trie les colis par priorite/poids décroissant (les plus rentables d'abord)"""
+    def ratio(c):
+        return c["priorite"] / c["poids"] if c["poids"] > 0 else float("inf")
+    return sorted(colis, key=ratio, reverse=True)
+
+
+def calculer_prefixes(colis_tries):
+    """
+    Sommes préfixes des poids et des priorités des colis triés.
+    prefixe_poids[i] = somme des poids des i premiers colis.
+    """
+    prefixe_poids = [0.0]
+    prefixe_valeurs = [0.0]
+    for c in colis_tries:
+        prefixe_poids.append(prefixe_poids[-1] + c["poids"])
+        prefixe_valeurs.append(prefixe_valeurs[-1] + c["priorite"])
+    return prefixe_poids, prefixe_valeurs
+
+
+def deplier(chaine, n):
+    """Affectation complète (liste de n entiers) à partir d'une chaîne (choix, parent)"""
+    choix = []
+    while chaine is not None:
+        k, chaine = chaine
+        choix.append(k)
+    choix.reverse()
+    return choix + [-1] * (n - len(choix))
+
+
+def calculer_poids_min_suffixe(colis):
+    """poids_min[i] = plus petit poids parmi les colis i, i+1, ... (inf au-delà)"""
+    poids_min = [float("inf")] * (len(colis) + 1)
+    for i in range(len(colis) - 1, -1, -1):
+        poids_min[i] = min(poids_min[i + 1], colis[i]["poids"])
+    return poids_min
+
+
+def borne_fractionnelle(prefixe_poids, prefixe_valeurs, i, capacite_totale):
+    """
+    Borne supérieure (relaxation linéaire) de la valeur atteignable avec
+    les colis i, i+1, ... dans une capacité totale donnée.
+
+    La relaxation du sac à dos multiple revient à un seul sac de capacité
+    égale à la somme des capacités restantes : on prend les colis dans
+    l'ordre du ratio et on complète avec une fraction du premier qui ne
+    rentre plus. Calcul en O(log n) grâce aux sommes préfixes.
+    """
+    n = len(prefixe_poids) - 1
+    if i >= n or capacite_totale <= 0:
+        return 0.0
+
+    # Dernier indice k tel que les colis i..k-1 tiennent entièrement
+    k = bisect_right(prefixe_poids, prefixe_poids[i] + capacite_totale, i, n + 1) - 1
+    borne = prefixe_valeurs[k] - prefixe_valeurs[i]
+
+    if k < n:
+        reste = capacite_totale - (prefixe_poids[k] - prefixe_poids[i])
+        poids_k = prefixe_poids[k + 1] - prefixe_poids[k]
+        if poids_k > 0:
+            borne += (prefixe_valeurs[k + 1] - prefixe_valeurs[k]) * reste / poids_k
+    return borne
+
+
+class TableTransposition:
+    """
+    Meilleure valeur atteinte pour chaque état (profondeur, capacités
+    restantes triées). Deux noeuds du même état ont exactement le même
+    sous-arbre : si on revient sur un état avec une valeur inférieure ou
+    égale, le sous-arbre ne peut rien apporter de mieux.
+    Éviction LRU pour borner la mémoire.
+    """
+
+    def __init__(self, taille_max=TABLE_MAX_DEFAUT):
+        self.taille_max = taille_max
+        self.etats = OrderedDict()
+
+    def domine(self, i, capacites, valeur):
+        """True si l'état a déjà été atteint avec une valeur >= valeur, sinon l'enregistre"""
+        cle = (i, tuple(sorted(capacites)))
+        connue = self.etats.get(cle)
+        if connue is not None:
+            self.etats.move_to_end(cle)
+            if connue >= valeur:
+                return True
+        self.etats[cle] = valeur
+        if connue is None and len(self.etats) > self.taille_max:
+            self.etats.popitem(last=False)
+        return False
+
+    def __len__(self):
+        return len(self.etats)
+
+
+class KnapsackSolver:
+    """
+    Branch and bound itératif pour l'affectation des colis aux camions.
+
+    Chaque instance possède sa propre solution courante et ses compteurs :
+    plusieurs résolutions peuvent tourner en parallèle (threads ou
+    processus) sans interférer. La recherche en profondeur utilise une pile
+    explicite, il n'y a donc pas de limite liée à la récursion Python.
+    """
+
+    def __init__(self, colis, camions, mode=MODE_FRACTIONNEL, symetrie=True,
+                 temps_max=None, noeuds_max=None, demarrage=True,
+                 strategie=STRATEGIE_PROFONDEUR, memoire_max=MEMOIRE_MAX_DEFAUT,
+                 table_max=TABLE_MAX_DEFAUT):
+        """
+        colis : liste de dicts avec id_colis, poids et priorite
+        camions : liste de dicts avec id_camion et capacite
+        mode : MODE_NAIF (borne = somme des priorités restantes)
+               ou MODE_FRACTIONNEL (colis triés par ratio, borne linéaire)
+        symetrie : ne place un colis que dans un seul camion par valeur de
+                   capacité restante (les camions identiques sont
+                   interchangeables, inutile d'explorer leurs permutations)
+        temps_max : budget en secondes (None = pas de limite)
+        noeuds_max : budget en noeuds explorés (None = pas de limite)
+        demarrage : amorce la solution courante avec un glouton best-fit
+                    suivi d'une recherche locale avant la recherche exacte
+        strategie : STRATEGIE_PROFONDEUR ou STRATEGIE_MEILLEUR (tas sur la borne)
+        memoire_max : taille de la liste ouverte au-delà de laquelle le
+                      meilleur d'abord plonge en profondeur
+        table_max : taille de la table de transposition (0 ou None = désactivée)
+
+        Quand un budget est épuisé, la recherche s'arrête et renvoie la
+        meilleure solution trouvée avec la borne prouvée et l'écart.
+        """
+        self.mode = mode
+        self.symetrie = symetrie
+        self.temps_max = temps_max
+        self.noeuds_max = noeuds_max
+        self.demarrage = demarrage
+        self.strategie = strategie
+        self.memoire_max = memoire_max
+        self.table = TableTransposition(table_max) if table_max else None
+        self.debut = None
+        self.colis = trier_par_ratio(colis) if mode == MODE_FRACTIONNEL else list(colis)
+        self.poids = [c["poids"] for c in self.colis]
+        self.valeurs = [c["priorite"] for c in self.colis]
+        self.ids_camions = [c["id_camion"] for c in camions]
+        self.capacites = [c["capacite"] for c in camions]
+        self.prefixe_poids, self.prefixe_valeurs = calculer_prefixes(self.colis)
+        self.poids_min_suffixe = calculer_poids_min_suffixe(self.colis)
+
+        self.meilleure_valeur = 0
+        # Seuil d'élagage : meilleure valeur connue, ici ou dans un autre
+        # processus via incumbent_partage (multiprocessing.Value)
+        self.seuil = 0
+        self.incumbent_partage = None
+        self.meilleure_affectation = [-1] * len(self.colis)
+        self.noeuds_explores = 0
+        self.prochain_controle = 0
+        self.noeuds_elagues = 0
+        self.noeuds_domines = 0
+        self.borne_prouvee = None
+        self.arret = None
+        self.duree = 0.0
+        # Statistiques du démarrage : valeur amorcée et élagages obtenus
+        # tant que la solution courante était encore celle du démarrage
+        self.valeur_demarrage = 0
+        self.elagues_par_demarrage = 0
+        self.incumbent_demarrage = False
+
+    def amorcer(self):
+        """Initialise la solution courante avec l'heuristique de démarrage"""
+        affectation, valeur = demarrage_heuristique(self.poids, self.valeurs, self.capacites)
+        self.valeur_demarrage = valeur
+        if valeur > self.meilleure_valeur:
+            self.meilleure_valeur = valeur
+            self.meilleure_affectation = affectation
+            self.seuil = max(self.seuil, valeur)
+            self.incumbent_demarrage = True
+
+    def borne(self, i, valeur, capacites):
+        """Borne supérieure d'un noeud où les colis 0..i-1 sont déjà décidés"""
+        if self.mode == MODE_NAIF:
+            return valeur + self.prefixe_valeurs[-1] - self.prefixe_valeurs[i]
+        # La place restante dans un camion où plus aucun colis ne rentre
+        # est perdue : on ne la compte pas dans la relaxation
+        poids_min = self.poids_min_suffixe[i]
+        capacite_utile = sum(c for c in capacites if c >= poids_min)
+        return valeur + borne_fractionnelle(
+            self.prefixe_poids, self.prefixe_valeurs, i, capacite_utile
+        )
+
+    def budget_epuise(self):
+        """Renvoie la raison d'arrêt si un budget est dépassé, sinon None"""
+        if self.noeuds_max is not None and self.noeuds_explores >= self.noeuds_max:
+            return ARRET_NOEUDS
+        # Seuil plutôt que modulo : en best-first, une itération ajoute
+        # plusieurs noeuds et peut sauter les multiples exacts
+        if self.noeuds_explores >= self.prochain_controle:
+            self.prochain_controle = self.noeuds_explores + INTERVALLE_CHRONO
+            if self.incumbent_partage is not None:
+                self.seuil = max(self.seuil, self.incumbent_partage.value)
+            if self.temps_max is not None and time.monotonic() - self.debut >= self.temps_max:
+                return ARRET_TEMPS
+        return None
+
+    def enregistrer(self, valeur, affectation):
+        """Met à jour la meilleure solution si la feuille atteinte l'améliore"""
+        if valeur > self.seuil:
+            self.meilleure_valeur = valeur
+            self.meilleure_affectation = list(affectation)
+            self.seuil = valeur
+            self.incumbent_demarrage = False
+            if self.incumbent_partage is not None:
+                with self.incumbent_partage.get_lock():
+                    if valeur > self.incumbent_partage.value:
+                        self.incumbent_partage.value = valeur
+
+    def est_domine(self, i, capacites, valeur):
+        """Consulte la table de transposition (les feuilles n'y passent pas)"""
+        if self.table is None or i == len(self.colis):
+            return False
+        if self.table.domine(i, capacites, valeur):
+            self.noeuds_domines += 1
+            return True
+        return False
+
+    def elaguer(self):
+        self.noeuds_elagues += 1
+        if self.incumbent_demarrage:
+            self.elagues_par_demarrage += 1
+
+    def resoudre(self):
+        self.debut = time.monotonic()
+        if self.demarrage:
+            self.amorcer()
+
+        if self.strategie == STRATEGIE_MEILLEUR:
+            reste = self.meilleur_d_abord()
+        else:
+            reste = self.profondeur(0, list(self.capacites), [-1] * len(self.colis), 0,
+                                    self.borne(0, 0, self.capacites))
+
+        # reste = plus grande borne des noeuds encore ouverts (None si tout est exploré)
+        self.borne_prouvee = self.meilleure_valeur if reste is None else max(self.meilleure_valeur, reste)
+        self.duree = time.monotonic() - self.debut
+        return self.solution()
+
+    def resoudre_depuis(self, i, capacites, affectation, valeur, borne):
+        """Explore le seul sous-arbre d'un noeud (sous-problème du mode parallèle)"""
+        self.debut = time.monotonic()
+        return self.profondeur(i, list(capacites), list(affectation), valeur, borne)
+
+    def decouper(self, nb_sous_problemes):
+        """
+        Développe l'arbre en largeur depuis la racine jusqu'à obtenir au
+        moins nb_sous_problemes noeuds ouverts, chacun étant un tuple
+        (i, capacites, affectation, valeur, borne), triés par borne
+        décroissante. Les feuilles atteintes en chemin sont enregistrées.
+        """
+        n = len(self.colis)
+        m = len(self.capacites)
+        front = [(0, tuple(self.capacites), [], 0, self.borne(0, 0, self.capacites))]
+        while front and len(front) < nb_sous_problemes and front[0][0] < n:
+            suivant = []
+            for i, capacites, prefixe, valeur, _ in front:
+                for choix in range(m + 1):
+                    if choix < m:
+                        if self.poids[i] > capacites[choix]:
+                            continue
+                        if self.symetrie and capacites[choix] in capacites[:choix]:
+                            continue
+                        fils_capacites = (capacites[:choix] + (capacites[choix] - self.poids[i],)
+                                          + capacites[choix + 1:])
+                        fils_valeur = valeur + self.valeurs[i]
+                    else:
+                        fils_capacites = capacites
+                        fils_valeur = valeur
+                    fils_prefixe = prefixe + [choix if choix < m else -1]
+
+                    self.noeuds_explores += 1
+                    fils_borne = self.borne(i + 1, fils_valeur, fils_capacites)
+                    if fils_borne <= self.seuil:
+                        self.elaguer()
+                    elif i + 1 == n:
+                        self.enregistrer(fils_valeur, fils_prefixe)
+                    else:
+                        suivant.append((i + 1, fils_capacites, fils_prefixe, fils_valeur, fils_borne))
+            front = suivant
+
+        sous_problemes = [
+            (i, capacites, prefixe + [-1] * (n - i), valeur, borne)
+            for i, capacites, prefixe, valeur, borne in front
+        ]
+        sous_problemes.sort(key=lambda noeud: noeud[4], reverse=True)
+        return sous_problemes
+
+    def profondeur(self, i0, capacites, affectation, valeur, borne_depart):
+        """
+        Explore en profondeur le sous-arbre du noeud où les colis 0..i0-1
+        sont déjà décidés. pile[-1] est le prochain choix à essayer pour le
+        colis courant : 0..m-1 = camion, m = ne pas charger.
+
+        capacites et affectation sont modifiées sur place. Renvoie None si
+        le sous-arbre a été exploré entièrement, sinon (budget épuisé) la
+        plus grande borne des noeuds restés ouverts.
+        """
+        n = len(self.colis)
+        m = len(self.capacites)
+        capacite_avant = [0] * n     # capacité du camion choisi avant d'y mettre le colis i
+        valeurs = [0] * (n + 1)      # valeur accumulée avant le colis i
+        bornes = [0] * (n + 1)       # borne du noeud dont les fils décident le colis i
+        valeurs[i0] = valeur
+        bornes[i0] = borne_depart
+
+        pile = [0]
+        while pile:
+            i = i0 + len(pile) - 1
+
+            self.arret = self.budget_epuise()
+            if self.arret is not None:
+                # Les sous-arbres non explorés sont tous sous un noeud de la pile
+                return max(bornes[i0:i + 1])
+
+            if i == n:
+                self.enregistrer(valeurs[n], affectation)
+                pile.pop()
+                continue
+
+            # Annuler le choix précédent pour ce colis (restauration exacte,
+            # pour que les camions identiques restent comparables)
+            k = affectation[i]
+            if k >= 0:
+                capacites[k] = capacite_avant[i]
+                affectation[i] = -1
+
+            choix = pile[-1]
+            if choix > m:
+                pile.pop()
+                continue
+            pile[-1] = choix + 1
+
+            if choix < m:
+                if self.poids[i] > capacites[choix]:
+                    continue
+                # Un camion de même capacité restante a déjà été essayé
+                if self.symetrie and capacites[choix] in capacites[:choix]:
+                    continue
+                capacite_avant[i] = capacites[choix]
+                capacites[choix] -= self.poids[i]
+                affectation[i] = choix
+                valeurs[i + 1] = valeurs[i] + self.valeurs[i]
+            else:
+                valeurs[i + 1] = valeurs[i]
+
+            self.noeuds_explores += 1
+            bornes[i + 1] = self.borne(i + 1, valeurs[i + 1], capacites)
+            if bornes[i + 1] <= self.seuil:
+                self.elaguer()
+                continue
+            if self.est_domine(i + 1, capacites, valeurs[i + 1]):
+                continue
+            pile.append(0)
+
+        return None
+
+    def meilleur_d_abord(self):
+        """
+        Développe toujours le noeud ouvert de plus grande borne (tas).
+        Un noeud est (-borne, ordre, i, valeur, capacites, chaine) où
+        chaine = (choix du colis i-1, chaine du parent) garde l'affectation
+        partielle sans la recopier à chaque noeud.
+
+        Quand la liste ouverte dépasse memoire_max, les noeuds retirés du
+        tas sont explorés en profondeur (plongée) jusqu'à ce qu'elle soit
+        redescendue sous la moitié du plafond.
+        """
+        n = len(self.colis)
+        m = len(self.capacites)
+        ordre = itertools.count()
+        tas = [(-self.borne(0, 0, self.capacites), next(ordre), 0, 0, tuple(self.capacites), None)]
+        plongee = False
+
+        while tas:
+            self.arret = self.budget_epuise()
+            if self.arret is not None:
+                return -tas[0][0]
+
+            moins_borne, _, i, valeur, capacites, chaine = heapq.heappop(tas)
+            if -moins_borne <= self.seuil:
+                # Le tas est trié : tous les noeuds restants sont dominés
+                return None
+
+            if len(tas) >= self.memoire_max:
+                plongee = True
+            elif len(tas) <= self.memoire_max // 2:
+                plongee = False
+
+            if plongee:
+                reste = self.profondeur(i, list(capacites), deplier(chaine, n), valeur, -moins_borne)
+                if reste is not None:
+                    return max(reste, -tas[0][0]) if tas else reste
+                continue
+
+            for choix in range(m + 1):
+                if choix < m:
+                    if self.poids[i] > capacites[choix]:
+                        continue
+                    if self.symetrie and capacites[choix] in capacites[:choix]:
+                        continue
+                    fils_capacites = (capacites[:choix] + (capacites[choix] - self.poids[i],)
+                                      + capacites[choix + 1:])
+                    fils_valeur = valeur + self.valeurs[i]
+                    fils_chaine = (choix, chaine)
+                else:
+                    fils_capacites = capacites
+                    fils_valeur = valeur
+                    fils_chaine = (-1, chaine)
+
+                self.noeuds_explores += 1
+                fils_borne = self.borne(i + 1, fils_valeur, fils_capacites)
+                if fils_borne <= self.seuil:
+                    self.elaguer()
+                elif i + 1 == n:
+                    self.enregistrer(fils_valeur, deplier(fils_chaine, n))
+                elif not self.est_domine(i + 1, fils_capacites, fils_valeur):
+                    heapq.heappush(tas, (-fils_borne, next(ordre), i + 1, fils_valeur,
+                                         fils_capacites, fils_chaine))
+        return None
+
+    def ecart(self):
+        """Écart relatif entre la borne prouvée et la meilleure solution"""
+        if not self.borne_prouvee:
+            return 0.0
+        return (self.borne_prouvee - self.meilleure_valeur) / self.borne_prouvee
+
+    def repartition(self):
+        """Répartition {id_camion: [id_colis, ...]} de la meilleure solution"""
+        repartition = {cid: [] for cid in self.ids_camions}
+        for c, k in zip(self.colis, self.meilleure_affectation):
+            if k >= 0:
+                repartition[self.ids_camions[k]].append(c["id_colis"])
+        return repartition
+
+    def solution(self):
+        return {
+            "valeur": self.meilleure_valeur,
+            "repartition": self.repartition(),
+            "borne": self.borne_prouvee,
+            "gap": self.ecart(),
+            "optimal": self.arret is None,
+            "arret": self.arret,
+            "duree": self.duree,
+            "noeuds_explores": self.noeuds_explores,
+            "noeuds_elagues": self.noeuds_elagues,
+            "noeuds_domines": self.noeuds_domines,
+            "valeur_demarrage": self.valeur_demarrage,
+            "elagues_par_demarrage": self.elagues_par_demarrage,
+            "strategie": self.strategie,
+        }
+
+
+# Incumbent partagé entre processus, fixé par l'initialiseur de chaque worker
+_incumbent_worker = None
+
+
+def _initialiser_worker(incumbent_partage):
+    global _incumbent_worker
+    _incumbent_worker = incumbent_partage
+
+
+def _resoudre_sous_probleme(colis, camions, options, noeud, echeance, noeuds_max):
+    """
+    Tâche d'un worker : explore un sous-arbre en élaguant sur l'incumbent
+    global. echeance est une date absolue (time.time()) commune à tous les
+    workers, ou None.
+    """
+    temps_max = None if echeance is None else max(0.0, echeance - time.time())
+    solveur = KnapsackSolver(colis, camions, demarrage=False, temps_max=temps_max,
+                             noeuds_max=noeuds_max, **options)
+    solveur.incumbent_partage = _incumbent_worker
+    solveur.seuil = _incumbent_worker.value
+    reste = solveur.resoudre_depuis(*noeud)
+    ameliore = solveur.meilleure_valeur > 0
+    return {
+        "valeur": solveur.meilleure_valeur,
+        "affectation": solveur.meilleure_affectation if ameliore else None,
+        "reste": reste,
+        "arret": solveur.arret,
+        "noeuds_explores": solveur.noeuds_explores,
+        "noeuds_elagues": solveur.noeuds_elagues,
+        "noeuds_domines": solveur.noeuds_domines,
+    }
+
+
+def resoudre_parallele(colis, camions, workers=None, sous_problemes_par_worker=4,
+                       temps_max=None, noeuds_max=None, demarrage=True, **options):
+    """
+    Branch and bound parallèle : l'arbre est découpé en sous-problèmes sur
+    ses premiers niveaux, chacun exploré en profondeur dans un
+    ProcessPoolExecutor. La meilleure valeur trouvée est partagée entre
+    les workers (multiprocessing.Value) pour que tous élaguent sur
+    l'optimum global courant.
+
+    options : mode, symetrie, table_max (comme KnapsackSolver).
+    Renvoie un dict de la même forme que KnapsackSolver.solution().
+    """
+    workers = workers or multiprocessing.cpu_count()
+    # Dicts simples (les lignes RealDictRow n'ont pas à traverser les processus)
+    colis = [{"id_colis": c["id_colis"], "poids": c["poids"], "priorite": c["priorite"]} for c in colis]
+    camions = [{"id_camion": c["id_camion"], "capacite": c["capacite"]} for c in camions]
+    solveur = KnapsackSolver(colis, camions, temps_max=temps_max, noeuds_max=noeuds_max,
+                             demarrage=demarrage, **options)
+    solveur.debut = time.monotonic()
+    if demarrage:
+        solveur.amorcer()
+    sous_problemes = solveur.decouper(workers * sous_problemes_par_worker)
+
+    restes = []
+    if sous_problemes:
+        incumbent = multiprocessing.Value("d", solveur.seuil)
+        # Budget de noeuds réparti entre les sous-problèmes
+        noeuds_par_tache = None
+        if noeuds_max is not None:
+            noeuds_par_tache = max(1, math.ceil((noeuds_max - solveur.noeuds_explores) / len(sous_problemes)))
+        echeance = None
+        if temps_max is not None:
+            echeance = time.time() + temps_max - (time.monotonic() - solveur.debut)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_initialiser_worker,
+                                 initargs=(incumbent,)) as pool:
+            taches = [
+                pool.submit(_resoudre_sous_probleme, colis, camions, options,
+                            noeud, echeance, noeuds_par_tache)
+                for noeud in sous_problemes
+            ]
+            for tache in taches:
+                resultat = tache.result()
+                solveur.noeuds_explores += resultat["noeuds_explores"]
+                solveur.noeuds_elagues += resultat["noeuds_elagues"]
+                solveur.noeuds_domines += resultat["noeuds_domines"]
+                if resultat["affectation"] is not None:
+                    solveur.enregistrer(resultat["valeur"], resultat["affectation"])
+                if resultat["reste"] is not None:
+                    restes.append(resultat["reste"])
+                    solveur.arret = solveur.arret or resultat["arret"]
+
+    solveur.borne_prouvee = max([solveur.meilleure_valeur] + restes)
+    solveur.duree = time.monotonic() - solveur.debut
+    return solveur.solution()
+
+
+def enregistrer_run(conn, cur, date_exec, solution):
+    """
+    Insère la ligne optimisation_runs avec la valeur, la borne et l'écart.
+    Retombe sur l'ancien schéma (executed_at seul) si les colonnes de
+    statistiques n'existent pas, et renvoie None si la table est absente.
+    """
+    requetes = [
+        ("""
+            INSERT INTO optimisation_runs
+                (executed_at, valeur, borne, gap, optimal, arret, noeuds_explores)
+            VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id
+        """, (date_exec, solution["valeur"], solution["borne"], solution["gap"],
+              solution["optimal"], solution["arret"], solution["noeuds_explores"])),
+        ("INSERT INTO optimisation_runs (executed_at) VALUES (%s) RETURNING id", (date_exec,)),
+    ]
+    for sql, params in requetes:
+        try:
+            cur.execute(sql, params)
+            row = cur.fetchone()
+            return row["id"] if row else None
+        except Exception as e:
+            # Une requête en échec annule la transaction PostgreSQL en cours
+            conn.rollback()
+            print("optimisation_runs insert failed:", e)
+    # Si la table optimisation_runs n'existe pas, on continue sans run_id
+    return None
+
+
+def calculer_priorites(colis, maintenant):
+    """
+    Calcule en un seul passage la priorité (1 / secondes restantes) et
+    l'horizon de livraison (aujourd'hui, demain, plus tard) de chaque colis.
+    """
+    demain = maintenant.date() + timedelta(days=1)
+    for c in colis:
+        date = c["date_livraison"] or maintenant + DELAI_SANS_DATE
+        temps = (date - maintenant).total_seconds()
+        c["priorite"] = 1 / temps if temps > 0 else PRIORITE_RETARD
+        if date.date() <= maintenant.date():
+            c["horizon"] = HORIZON_AUJOURDHUI
+        elif date.date() == demain:
+            c["horizon"] = HORIZON_DEMAIN
+        else:
+            c["horizon"] = HORIZON_PLUS_TARD
+    return colis
+
+
+def _fusionner_solutions(solutions, camions):
+    """Solution globale à partir des solutions de chaque horizon"""
+    repartition = {c["id_camion"]: [] for c in camions}
+    for solution in solutions.values():
+        for id_camion, ids in solution["repartition"].items():
+            repartition[id_camion].extend(ids)
+    valeur = sum(s["valeur"] for s in solutions.values())
+    # Borne du problème décomposé (chaque horizon sur la capacité qu'on lui a laissée)
+    borne = sum(s["borne"] for s in solutions.values())
+
+    def somme(cle):
+        return sum(s[cle] for s in solutions.values())
+
+    return {
+        "valeur": valeur,
+        "repartition": repartition,
+        "borne": borne,
+        "gap": (borne - valeur) / borne if borne else 0.0,
+        "optimal": all(s["optimal"] for s in solutions.values()),
+        "arret": next((s["arret"] for s in solutions.values() if s["arret"]), None),
+        "duree": somme("duree"),
+        "noeuds_explores": somme("noeuds_explores"),
+        "noeuds_elagues": somme("noeuds_elagues"),
+        "noeuds_domines": somme("noeuds_domines"),
+        "valeur_demarrage": somme("valeur_demarrage"),
+        "elagues_par_demarrage": somme("elagues_par_demarrage"),
+        "strategie": next((s["strategie"] for s in solutions.values()), None),
+        "horizons": {
+            NOMS_HORIZONS[h]: {cle: s[cle] for cle in ("valeur", "borne", "gap", "optimal", "arret")}
+            for h, s in solutions.items()
+        },
+    }
+
+
+def resoudre_par_horizon(colis, camions, partition=None, **options):
+    """
+    Découpe les colis par horizon de livraison (champ "horizon") et résout
+    un sous-problème par horizon, beaucoup plus petit que le problème entier.
+
+    Sans partition, les horizons sont traités du plus urgent au moins
+    urgent, chacun sur la capacité laissée par les précédents ; le budget
+    de temps est partagé entre eux. Avec partition = {horizon: [id_camion,
+    ...]} (camions réservés à un jour), les sous-problèmes sont
+    indépendants et résolus en parallèle dans un ProcessPoolExecutor.
+    """
+    groupes = {}
+    for c in colis:
+        horizon = c.get("horizon", HORIZON_PLUS_TARD)
+        groupes.setdefault(horizon, []).append(
+            {"id_colis": c["id_colis"], "poids": c["poids"], "priorite": c["priorite"]}
+        )
+    camions = [{"id_camion": c["id_camion"], "capacite": c["capacite"]} for c in camions]
+    solutions = {}
+
+    if partition is not None:
+        with ProcessPoolExecutor(max_workers=len(groupes) or 1) as pool:
+            taches = {
+                h: pool.submit(resoudre_affectation, groupe,
+                               [c for c in camions if c["id_camion"] in partition.get(h, [])],
+                               **options)
+                for h, groupe in groupes.items()
             }
-        return
+            solutions = {h: tache.result() for h, tache in sorted(taches.items())}
+        return _fusionner_solutions(solutions, camions)
+
+    restantes = {c["id_camion"]: c["capacite"] for c in camions}
+    poids = {c["id_colis"]: c["poids"] for c in colis}
+    temps_max = options.pop("temps_max", None)
+    for h in sorted(groupes):
+        budget = None
+        if temps_max is not None:
+            budget = temps_max / len(groupes)
+        capacites = [{"id_camion": k, "capacite": max(0.0, v)} for k, v in restantes.items()]
+        solutions[h] = resoudre_affectation(groupes[h], capacites, temps_max=budget, **options)
+        for id_camion, ids in solutions[h]["repartition"].items():
+            restantes[id_camion] -= sum(poids[i] for i in ids)
+    return _fusionner_solutions(solutions, camions)
 
-    c = colis_restants[0]
-    reste = colis_restants[1:]
 
-    for cid, camion in camions_dict.items():
+def resoudre_affectation(colis, camions, mode=MODE_NAIF, temps_max=None, noeuds_max=None,
+                         strategie=STRATEGIE_PROFONDEUR, workers=None, moteur=MOTEUR_BNB,
+                         horizon=False, partition_horizons=None):
+    """Résout l'affectation avec le moteur choisi (sans accès à la base)"""
+    if horizon:
+        return resoudre_par_horizon(colis, camions, partition=partition_horizons, mode=mode,
+                                    temps_max=temps_max, noeuds_max=noeuds_max,
+                                    strategie=strategie, workers=workers, moteur=moteur)
+    if moteur == MOTEUR_DP:
+        # Import local : dp_knapsack réutilise les bornes de ce module
+        from services.dp_knapsack import resoudre_dp
+        return resoudre_dp(colis, camions)
+    if workers:
+        # Le mode parallèle explore chaque sous-problème en profondeur
+        return resoudre_parallele(colis, camions, workers=workers, mode=mode,
+                                  temps_max=temps_max, noeuds_max=noeuds_max)
+    return KnapsackSolver(colis, camions, mode=mode, temps_max=temps_max,
+                          noeuds_max=noeuds_max, strategie=strategie).resoudre()
 
-        if c["poids"] <= camion["capacite_restante"]:
 
-           
-            camion["capacite_restante"] -= c["poids"]
-            repartition_courante[cid].append(c["id_colis"])
+def resoudre_incremental(colis, camions, actuelles, deplacements_max=0, **options):
+    """
+    Ré-optimisation incrémentale : les colis déjà affectés (actuelles =
+    {id_colis: id_camion}) restent en place et réduisent la capacité de
+    leur camion ; seuls les colis non affectés sont résolus. Au plus
+    deplacements_max colis déjà affectés peuvent changer de camion pour
+    faire de la place aux nouveaux.
 
-            nouvelle_valeur = valeur_courante + c["priorite"]
+    La solution contient la répartition complète, et dans
+    nouvelles_affectations uniquement les lignes à insérer (nouveaux
+    colis et colis déplacés).
+    """
+    ids_camions = [c["id_camion"] for c in camions]
+    par_id = {c["id_colis"]: c for c in colis}
+    fixes = {i: k for i, k in actuelles.items() if i in par_id and k in ids_camions}
 
-            borne = nouvelle_valeur + sum(x["priorite"] for x in reste)
+    charge = {k: 0.0 for k in ids_camions}
+    for id_colis, id_camion in fixes.items():
+        charge[id_camion] += par_id[id_colis]["poids"]
+    camions_reduits = [
+        {"id_camion": c["id_camion"], "capacite": max(0.0, c["capacite"] - charge[c["id_camion"]])}
+        for c in camions
+    ]
+    nouveaux = [c for c in colis if c["id_colis"] not in fixes]
+    solution = resoudre_affectation(nouveaux, camions_reduits, **options)
 
-            if borne > meilleure_solution["valeur"]:
-                branch_and_bound(reste, camions_dict, nouvelle_valeur, repartition_courante)
+    affectes = dict(fixes)
+    for id_camion, ids in solution["repartition"].items():
+        for id_colis in ids:
+            affectes[id_colis] = id_camion
 
-        
-            repartition_courante[cid].pop()
-            camion["capacite_restante"] += c["poids"]
+    deplaces = set()
+    if deplacements_max > 0:
+        indices = {k: idx for idx, k in enumerate(ids_camions)}
+        poids = [c["poids"] for c in colis]
+        valeurs = [c["priorite"] for c in colis]
+        affectation = [indices[affectes[c["id_colis"]]] if c["id_colis"] in affectes else -1
+                       for c in colis]
+        restantes = [c["capacite"] for c in camions]
+        for i, k in enumerate(affectation):
+            if k >= 0:
+                restantes[k] -= poids[i]
+        libres = [i for i, c in enumerate(colis) if c["id_colis"] not in affectes]
+        deplaces_idx = inserer_avec_deplacements(poids, valeurs, affectation, restantes,
+                                                 libres, deplacements_max)
+        affectes = {c["id_colis"]: ids_camions[k] for c, k in zip(colis, affectation) if k >= 0}
+        # Un colis revenu dans son camion d'origine n'a pas bougé
+        deplaces = {colis[i]["id_colis"] for i in deplaces_idx
+                    if colis[i]["id_colis"] in fixes
+                    and affectes.get(colis[i]["id_colis"]) != fixes[colis[i]["id_colis"]]}
 
-    branch_and_bound(reste, camions_dict, valeur_courante, repartition_courante)
+    repartition = {k: [] for k in ids_camions}
+    nouvelles = {k: [] for k in ids_camions}
+    for c in colis:
+        id_colis = c["id_colis"]
+        if id_colis not in affectes:
+            continue
+        repartition[affectes[id_colis]].append(id_colis)
+        if id_colis not in fixes or id_colis in deplaces:
+            nouvelles[affectes[id_colis]].append(id_colis)
 
+    valeur = sum(par_id[i]["priorite"] for i in affectes if i not in fixes)
+    solution.update({
+        "repartition": repartition,
+        "nouvelles_affectations": nouvelles,
+        "valeur": valeur,
+        "borne": max(solution["borne"], valeur),
+        "colis_nouveaux": len(nouveaux),
+        "colis_deplaces": sorted(deplaces),
+    })
+    if solution["borne"]:
+        solution["gap"] = (solution["borne"] - valeur) / solution["borne"]
+    return solution
 
-def executer_bnb():
-    global meilleure_solution
 
+def executer_bnb(mode=MODE_NAIF, temps_max=None, noeuds_max=None,
+                 strategie=STRATEGIE_PROFONDEUR, workers=None, moteur=MOTEUR_BNB,
+                 incremental=False, deplacements_max=0, horizon=False, partition_horizons=None):
     conn = get_connection()
     cur = conn.cursor()
 
@@ -53,37 +826,33 @@ def executer_bnb():
     cur.execute("SELECT id_colis, poids, date_livraison FROM colis")
     colis = cur.fetchall()
 
-    now = datetime.now()
-    for c in colis:
-        temps = (c["date_livraison"] - now).total_seconds()
-        c["priorite"] = 1 / temps if temps > 0 else 1000
-
+    calculer_priorites(colis, datetime.now())
 
-    camions_dict = {c["id_camion"]: {"capacite_restante": c["capacite"]} for c in camions}
-    repartition_init = {c["id_camion"]: [] for c in camions}
-
-    meilleure_solution = {"valeur": 0, "repartition": {}}
-
-    branch_and_bound(colis, camions_dict, 0, repartition_init)
+    options = dict(mode=mode, temps_max=temps_max, noeuds_max=noeuds_max,
+                   strategie=strategie, workers=workers, moteur=moteur,
+                   horizon=horizon, partition_horizons=partition_horizons)
+    if incremental:
+        # Affectation actuelle de chaque colis = sa ligne d'assignments la plus récente
+        cur.execute("""
+            SELECT DISTINCT ON (id_colis) id_colis, id_camion
+            FROM assignments
+            ORDER BY id_colis, time DESC
+        """)
+        actuelles = {row["id_colis"]: row["id_camion"] for row in cur.fetchall()}
+        solution = resoudre_incremental(colis, camions, actuelles,
+                                        deplacements_max=deplacements_max, **options)
+        a_inserer = solution["nouvelles_affectations"]
+    else:
+        solution = resoudre_affectation(colis, camions, **options)
+        a_inserer = solution["repartition"]
 
     date_exec = datetime.now()
 
-    # 🔹 créer UN seul run (si possible) et insérer les assignments
-    run_id = None
-    try:
-        cur.execute(
-            "INSERT INTO optimisation_runs (executed_at) VALUES (%s) RETURNING id",
-            (date_exec,)
-        )
-        row = cur.fetchone()
-        if row:
-            run_id = row[0]
-    except Exception as e:
-        # Si la table optimisation_runs n'existe pas, on continue sans run_id
-        print("optimisation_runs not available, continuing without run_id:", e)
+    # 🔹 créer UN seul run (si possible) avec ses statistiques, puis insérer les assignments
+    run_id = enregistrer_run(conn, cur, date_exec, solution)
 
     # 🔹 ensuite insérer les assignments (avec ou sans run_id selon disponibilité)
-    for camion_id, colis_list in meilleure_solution["repartition"].items():
+    for camion_id, colis_list in a_inserer.items():
         for id_colis in colis_list:
             try:
                 if run_id is not None:
@@ -105,5 +874,18 @@ def executer_bnb():
 
     return {
         "date_execution": str(date_exec),
-        "repartition": meilleure_solution["repartition"]
+        "run_id": run_id,
+        "repartition": solution["repartition"],
+        "valeur": solution["valeur"],
+        "borne": solution["borne"],
+        "gap": solution["gap"],
+        "optimal": solution["optimal"],
+        "arret": solution["arret"],
+        "noeuds_explores": solution["noeuds_explores"],
+        "valeur_demarrage": solution["valeur_demarrage"],
+        "elagues_par_demarrage": solution["elagues_par_demarrage"],
+        "strategie": solution["strategie"],
+        "colis_nouveaux": solution.get("colis_nouveaux"),
+        "colis_deplaces": solution.get("colis_deplaces", []),
+        "horizons": solution.get("horizons"),
     }
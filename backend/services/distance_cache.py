@@ -0,0 +1,255 @@
+"""
+Cache des distances entre points, partagé entre camions et entre calculs.
+
+Une distance est repérée par sa source (osrm, ...) et les coordonnées
+arrondies de ses deux extrémités : la même paire de colis, ou la même
+jambe depuis le dépôt, n'est demandée qu'une fois au service de routage.
+Deux niveaux : un LRU en mémoire borné devant la table cache_distances.
+
+Le cache d'une source est partagé par les threads du serveur : le LRU est
+protégé par un verrou. Les distances calculées n'y entrent qu'après le
+commit de la session qui les a écrites en base ; après un rollback, elles
+sont oubliées et seront redemandées.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import as_completed
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, CacheDistance
+
+TAILLE_LRU_DEFAUT = 200000
+# 5 décimales ~ 1 m : deux adresses aussi proches partagent leurs distances
+PRECISION_DEFAUT = 5
+# Distances écrites dans la transaction en cours, publiées dans le LRU au commit
+CLE_EN_ATTENTE = "distances_en_attente"
+# Lignes par INSERT (PostgreSQL limite le nombre de paramètres d'une requête)
+TAILLE_LOT_INSERTION = 1000
+
+
+def cle_point(latitude, longitude, precision=PRECISION_DEFAUT):
+    return f"{latitude:.{precision}f},{longitude:.{precision}f}"
+
+
+def decouper_manquantes(manquantes, n):
+    """
+    Blocs (sources, destinations) qui couvrent les paires manquantes sans
+    tout redemander : les points nouveaux (aucune distance connue) donnent
+    leurs lignes complètes et leurs colonnes depuis les anciens points ; les
+    autres paires isolées forment un dernier bloc.
+    """
+    par_ligne = {}
+    for i, j in manquantes:
+        par_ligne.setdefault(i, set()).add(j)
+    par_colonne = {}
+    for i, j in manquantes:
+        par_colonne.setdefault(j, set()).add(i)
+    nouveaux = sorted(i for i in range(n)
+                      if len(par_ligne.get(i, ())) == n - 1 and len(par_colonne.get(i, ())) == n - 1)
+    if not nouveaux:
+        return [(sorted(par_ligne), sorted(par_colonne))]
+    tous = list(range(n))
+    anciens = [i for i in tous if i not in set(nouveaux)]
+    blocs = [(nouveaux, tous)]
+    if anciens:
+        blocs.append((anciens, nouveaux))
+    nouveaux = set(nouveaux)
+    reste = [(i, j) for i, j in manquantes if i not in nouveaux and j not in nouveaux]
+    if reste:
+        blocs.append((sorted({i for i, _ in reste}), sorted({j for _, j in reste})))
+    return blocs
+
+
+def inserer_sans_doublons(lignes):
+    """
+    Ajoute des lignes à cache_distances dans la transaction en cours ; une
+    paire déjà présente (écrite entre-temps par un autre calcul) est
+    ignorée (ON CONFLICT DO NOTHING sur l'index unique).
+    """
+    dialecte = db.session.get_bind().dialect.name
+    if dialecte == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialecte == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        db.session.add_all(CacheDistance(**ligne) for ligne in lignes)
+        return
+    for debut in range(0, len(lignes), TAILLE_LOT_INSERTION):
+        requete = (insert(CacheDistance)
+                   .values(lignes[debut:debut + TAILLE_LOT_INSERTION])
+                   .on_conflict_do_nothing(index_elements=["source", "depart", "arrivee"]))
+        db.session.execute(requete)
+
+
+class DistanceCache:
+    """
+    matrice(points, calculer) assemble la matrice des points (latitude,
+    longitude) à partir du cache et n'appelle calculer(sources,
+    destinations) que pour les paires manquantes, regroupées en au plus
+    trois blocs (decouper_manquantes). calculer renvoie le bloc
+    len(sources) × len(destinations), ou None en cas d'erreur.
+    Les nouvelles distances sont ajoutées à la session ; le commit est
+    laissé à l'appelant, et elles ne passent dans le LRU qu'à ce commit
+    (tout de suite si le cache n'est pas persistant).
+    """
+
+    def __init__(self, source, taille_max=TAILLE_LRU_DEFAUT, precision=PRECISION_DEFAUT, persistant=True):
+        self.source = source
+        self.taille_max = taille_max
+        self.precision = precision
+        self.persistant = persistant
+        self.lru = OrderedDict()
+        self._verrou = threading.Lock()
+        self.appels = 0
+        self.paires_calculees = 0
+
+    # _lire et _ecrire s'appellent verrou pris
+    def _lire(self, cle):
+        distance = self.lru.get(cle)
+        if distance is not None:
+            self.lru.move_to_end(cle)
+        return distance
+
+    def _ecrire(self, cle, distance):
+        self.lru[cle] = distance
+        self.lru.move_to_end(cle)
+        if len(self.lru) > self.taille_max:
+            self.lru.popitem(last=False)
+
+    def _lire_table(self, cles, manquantes, matrice):
+        """Complète matrice depuis la table pour les paires manquantes ; renvoie celles qui restent"""
+        departs = {cles[i] for i, _ in manquantes}
+        arrivees = {cles[j] for _, j in manquantes}
+        lignes = (CacheDistance.query
+                  .filter(CacheDistance.source == self.source,
+                          CacheDistance.depart.in_(departs),
+                          CacheDistance.arrivee.in_(arrivees))
+                  .all())
+        connues = {(ligne.depart, ligne.arrivee): ligne.distance for ligne in lignes}
+        restantes = []
+        with self._verrou:
+            for i, j in manquantes:
+                distance = connues.get((cles[i], cles[j]))
+                if distance is None:
+                    restantes.append((i, j))
+                else:
+                    matrice[i, j] = distance
+                    self._ecrire((cles[i], cles[j]), distance)
+        return restantes
+
+    def publier(self, nouvelles):
+        """Ajoute au LRU des distances {(depart, arrivee): distance}"""
+        with self._verrou:
+            for cle, distance in nouvelles.items():
+                self._ecrire(cle, distance)
+
+    def _manquantes(self, points):
+        """Matrice complétée depuis le cache, clés des points et paires encore inconnues"""
+        n = len(points)
+        cles = [cle_point(lat, lon, self.precision) for lat, lon in points]
+        matrice = np.full((n, n), np.nan)
+        np.fill_diagonal(matrice, 0.0)
+
+        manquantes = []
+        with self._verrou:
+            for i in range(n):
+                for j in range(n):
+                    if i != j:
+                        distance = self._lire((cles[i], cles[j]))
+                        if distance is None:
+                            manquantes.append((i, j))
+                        else:
+                            matrice[i, j] = distance
+        if manquantes and self.persistant:
+            manquantes = self._lire_table(cles, manquantes, matrice)
+        return cles, matrice, manquantes
+
+    def _integrer(self, cles, matrice, a_remplir, sources, destinations, bloc, nouvelles):
+        """Reporte un bloc calculé dans la matrice et dans nouvelles"""
+        with self._verrou:
+            self.appels += 1
+        for k, i in enumerate(sources):
+            for l, j in enumerate(destinations):
+                distance = bloc[k][l]
+                if (i, j) not in a_remplir or distance is None or np.isnan(distance):
+                    continue  # déjà connue, ou pas de route : on ne la garde pas
+                matrice[i, j] = distance
+                nouvelles[(cles[i], cles[j])] = float(distance)
+
+    def _persister(self, nouvelles):
+        with self._verrou:
+            self.paires_calculees += len(nouvelles)
+        if not self.persistant:
+            self.publier(nouvelles)
+            return
+        inserer_sans_doublons([{"source": self.source, "depart": a, "arrivee": b, "distance": d}
+                               for (a, b), d in nouvelles.items()])
+        db.session.info.setdefault(CLE_EN_ATTENTE, []).append((self, nouvelles))
+
+    def matrice(self, points, calculer):
+        cles, matrice, manquantes = self._manquantes(points)
+        if manquantes:
+            nouvelles = {}
+            a_remplir = set(manquantes)
+            for sources, destinations in decouper_manquantes(manquantes, len(points)):
+                bloc = calculer(sources, destinations)
+                if bloc is None:
+                    return None
+                self._integrer(cles, matrice, a_remplir, sources, destinations, bloc, nouvelles)
+            self._persister(nouvelles)
+        return matrice
+
+    def matrices(self, listes_points, calculer, executeur):
+        """
+        Comme matrice() pour plusieurs listes de points, mais les blocs
+        manquants de toutes les listes sont calculés en parallèle :
+        calculer(points, sources, destinations) est soumis à executeur.
+        La session n'est utilisée que par le thread appelant. Renvoie une matrice par liste, None si un de ses blocs a
+        échoué.
+        """
+        etats = [self._manquantes(points) for points in listes_points]
+        taches = {}
+        for k, (points, (_, _, manquantes)) in enumerate(zip(listes_points, etats)):
+            for sources, destinations in (decouper_manquantes(manquantes, len(points)) if manquantes else []):
+                futur = executeur.submit(calculer, points, sources, destinations)
+                taches[futur] = (k, sources, destinations)
+
+        resultats = [matrice for _, matrice, _ in etats]
+        a_remplir = [set(manquantes) for _, _, manquantes in etats]
+        # Partagé entre les listes : une paire commune à deux camions n'est enregistrée qu'une fois
+        nouvelles = {}
+        for futur in as_completed(taches):
+            k, sources, destinations = taches[futur]
+            bloc = futur.result()
+            if bloc is None:
+                resultats[k] = None
+            elif resultats[k] is not None:
+                self._integrer(etats[k][0], resultats[k], a_remplir[k], sources, destinations, bloc, nouvelles)
+        self._persister(nouvelles)
+        return resultats
+
+
+@event.listens_for(Session, "after_commit")
+def _publier_apres_commit(session):
+    for cache, nouvelles in session.info.pop(CLE_EN_ATTENTE, []):
+        cache.publier(nouvelles)
+
+
+@event.listens_for(Session, "after_rollback")
+def _oublier_apres_rollback(session):
+    session.info.pop(CLE_EN_ATTENTE, None)
+
+
+# Un cache par source, partagé par tout le processus
+_caches = {}
+_verrou_caches = threading.Lock()
+
+
+def cache_pour(source):
+    with _verrou_caches:
+        if source not in _caches:
+            _caches[source] = DistanceCache(source)
+        return _caches[source]
@@ -1,20 +1,26 @@
-import requests
-from models import db, Camion, Colis, Assignment, DistanceMatrix, Depot
+import numpy as np
+from config import Config
+from models import db, Colis, Assignment, DistanceMatrix, Depot, MatriceDistances
+from services.distance_provider import DistanceIndisponible, fournisseur_distances
 from datetime import datetime
 
-# URL publique OSRM pour les distances
-OSRM_URL = "http://router.project-osrm.org/table/v1/driving/"
+def point_colis(latitude, longitude, destination):
+    """(latitude, longitude) du colis : ses coordonnées géocodées, sinon sa destination « lat,lon »"""
+    if latitude is not None and longitude is not None:
+        return latitude, longitude
+    lat, lon = map(float, destination.split(","))
+    return lat, lon
 
-def get_coordinates(depot, colis_list):
-    """
-    Retourne les coordonnées sous format 'lon,lat;lon,lat;...' pour OSRM.
-    Le dépôt est ajouté en premier.
-    """
-    coords = [f"{depot.longitude},{depot.latitude}"]  # dépôt en premier
+def lire_points(depot, colis_list):
+    """Liste (latitude, longitude) : le dépôt puis les colis"""
+    points = [(depot.latitude, depot.longitude)]
     for c in colis_list:
-        lat, lon = map(float, c.destination.split(","))  # adapte si tu stockes lat/lon séparément
-        coords.append(f"{lon},{lat}")
-    return ";".join(coords)
+        points.append(point_colis(c.latitude, c.longitude, c.destination))
+    return points
+
+def fournisseur_matrices():
+    """Fournisseur de distances des matrices stockées (Config.DISTANCE_PROVIDER_MATRICES)"""
+    return fournisseur_distances(Config.DISTANCE_PROVIDER_MATRICES)
 
 def compute_distance_matrix(camion_id):
     """Calcule et stocke la matrice des distances pour un camion avec dépôt inclus."""
@@ -32,53 +38,121 @@ def compute_distance_matrix(camion_id):
         print(f"Aucun colis assigné pour le camion {camion_id}.")
         return
 
-    # Construire la chaîne de coordonnées pour OSRM
-    coords = get_coordinates(depot, colis_list)
-    url = OSRM_URL + coords + "?annotations=distance"
-
-    response = requests.get(url)
-    if response.status_code != 200:
-        print("Erreur OSRM :", response.text)
+    # Le fournisseur configuré (OSRM derrière le cache partagé par défaut) donne des km
+    try:
+        distances = fournisseur_matrices().matrice(lire_points(depot, colis_list))
+    except DistanceIndisponible as e:
+        print("Erreur :", e)
         return
 
-    data = response.json()
-    distances = data["distances"]  # distances[i][j]
-
-    # Supprimer les anciennes distances pour ce camion
-    DistanceMatrix.query.filter_by(id_camion=camion_id).delete()
-
-    # Stocker dans la base
+    # Stocker dans la base (en mètres)
     points = [0] + [c.id_colis for c in colis_list]  # 0 = dépôt, puis les colis
-    for i, from_id in enumerate(points):
-        for j, to_id in enumerate(points):
-            dm = DistanceMatrix(
-                id_camion=camion_id,
-                id_from=from_id,
-                id_to=to_id,
-                distance=distances[i][j]
-            )
-            db.session.add(dm)
+    enregistrer_matrice(camion_id, points, distances * 1000)
     db.session.commit()
     print(f"Matrice des distances pour camion {camion_id} enregistrée.")
 
-def compute_all_matrices():
-    """Calcule les matrices pour tous les camions ayant des assignments."""
-    camions = Camion.query.all()
-    for camion in camions:
-        compute_distance_matrix(camion.id_camion)
+def enregistrer_matrice(camion_id, points, distances):
+    """
+    Remplace la matrice du camion par un blob float32 (les distances
+    inconnues, None chez OSRM, deviennent NaN). Les anciennes lignes par
+    cellule du camion sont supprimées. Le commit est laissé à l'appelant.
+    """
+    enregistrer_matrices({camion_id: (points, distances)})
+
+def enregistrer_matrices(matrices):
+    """
+    enregistrer_matrice pour plusieurs camions {camion_id: (points,
+    distances)} : une requête pour les lignes existantes et une
+    suppression groupée de l'ancienne table.
+    """
+    blobs = {}
+    for camion_id, (points, distances) in matrices.items():
+        matrice = np.asarray(np.array(distances, dtype=np.float64), dtype=np.float32)
+        if matrice.shape != (len(points), len(points)):
+            raise ValueError(f"Matrice {matrice.shape} pour {len(points)} points")
+        blobs[camion_id] = np.ascontiguousarray(matrice).tobytes()
+    if not blobs:
+        return
+    DistanceMatrix.query.filter(DistanceMatrix.id_camion.in_(blobs)).delete(synchronize_session=False)
+    existantes = {ligne.id_camion: ligne
+                  for ligne in MatriceDistances.query.filter(MatriceDistances.id_camion.in_(blobs))}
+    maintenant = datetime.utcnow()
+    for camion_id, blob in blobs.items():
+        ligne = existantes.get(camion_id)
+        if ligne is None:
+            ligne = MatriceDistances(id_camion=camion_id)
+            db.session.add(ligne)
+        ligne.points = list(matrices[camion_id][0])
+        ligne.distances = blob
+        ligne.calculee_le = maintenant
+
+def charger_flotte():
+    """
+    Dépôt et colis de chaque camion en deux requêtes (au lieu d'une par
+    camion plus un chargement paresseux par colis) :
+    (dépôt, {camion_id: [(id_colis, (latitude, longitude)), ...]}).
+    """
+    depot = Depot.query.first()
+    lignes = (db.session.query(Assignment.id_camion, Colis.id_colis,
+                               Colis.latitude, Colis.longitude, Colis.destination)
+              .join(Colis, Colis.id_colis == Assignment.id_colis)
+              .order_by(Assignment.id_camion, Assignment.id_assignment)
+              .all())
+    flotte = {}
+    for camion_id, colis_id, latitude, longitude, destination in lignes:
+        flotte.setdefault(camion_id, []).append((colis_id, point_colis(latitude, longitude, destination)))
+    return depot, flotte
+
+def compute_all_matrices(workers=None):
+    """
+    Calcule les matrices de tous les camions ayant des assignments.
+    Les requêtes du fournisseur (OSRM) pour toute la flotte partent en
+    parallèle sur au plus workers threads ; la base et le cache ne sont
+    touchés que par le thread appelant, avec une seule écriture groupée à
+    la fin. Renvoie les identifiants des camions dont la matrice a été
+    enregistrée.
+    """
+    depot, flotte = charger_flotte()
+    if not depot:
+        print("Erreur : aucun dépôt trouvé.")
+        return []
+    camions = list(flotte)
+    listes_points = [[(depot.latitude, depot.longitude)] + [point for _, point in flotte[camion_id]]
+                     for camion_id in camions]
+    resultats = fournisseur_matrices().matrices(listes_points, workers)
+
+    matrices = {}
+    for camion_id, distances in zip(camions, resultats):
+        if distances is None:
+            print(f"Erreur : matrice du camion {camion_id} non calculée.")
+            continue
+        matrices[camion_id] = ([0] + [colis_id for colis_id, _ in flotte[camion_id]], distances * 1000)
+    enregistrer_matrices(matrices)
+    db.session.commit()
+    print(f"Matrices des distances enregistrées pour {len(matrices)} camion(s).")
+    return list(matrices)
 
 def get_matrix(camion_id):
     """
     Récupère la matrice de distances d'un camion.
-    Renvoie un dict {id_from: {id_to: distance}}
+    Renvoie (points, matrice) : points = identifiants des lignes/colonnes
+    (0 = dépôt) et matrice = ndarray float32 n×n, lu sans copie depuis le
+    blob (donc en lecture seule). Retombe sur l'ancienne table par cellule
+    si le camion n'a pas encore de blob ; ([], matrice vide) si rien.
     """
-    dm = DistanceMatrix.query.filter_by(id_camion=camion_id).all()
-    matrix = {}
+    ligne = db.session.get(MatriceDistances, camion_id)
+    if ligne is not None:
+        n = len(ligne.points)
+        return list(ligne.points), np.frombuffer(ligne.distances, dtype=np.float32).reshape(n, n)
+
+    dm = DistanceMatrix.query.filter_by(id_camion=camion_id).order_by(DistanceMatrix.id).all()
+    points = list(dict.fromkeys(row.id_from for row in dm))
+    indices = {p: i for i, p in enumerate(points)}
+    matrix = np.full((len(points), len(points)), np.nan, dtype=np.float32)
     for row in dm:
-        if row.id_from not in matrix:
-            matrix[row.id_from] = {}
-        matrix[row.id_from][row.id_to] = row.distance
-    return matrix
+        if row.id_to in indices:
+            matrix[indices[row.id_from], indices[row.id_to]] = row.distance
+    return points, matrix
 
 if __name__ == "__main__":
     # Exemple de lancement
@@ -0,0 +1,205 @@
+"""
+Fournisseurs de distances entre points (latitude, longitude), en km.
+
+Une seule interface pour les tournées et les matrices stockées :
+    bloc(points, sources, destinations)  distances des points d'indices
+                                         sources vers ceux d'indices destinations
+    matrice(points)                      matrice n×n complète
+    matrices(listes_points, workers)     une matrice par liste, None en cas d'échec
+
+Implémentations : haversine (vectorisée, sans réseau), OSRM (distances
+routières), un cache devant un autre fournisseur (DistanceCache) et un
+repli sur un second fournisseur quand le premier est indisponible ou n'a
+pas de route pour certaines paires. fournisseur_distances(nom) assemble
+la combinaison décrite par la configuration.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from config import Config
+from services.distance_cache import cache_pour
+from services.osrm_client import OSRMClient, OSRMErreur
+from services.simulated_annealing import calculate_distance_matrix_gps
+
+HAVERSINE = "haversine"
+OSRM = "osrm"
+FOURNISSEURS = (HAVERSINE, OSRM)
+
+RAYON_TERRE = 6371  # km
+# Les fournisseurs rendent des km : leur source dans cache_distances porte
+# l'unité, pour ne jamais relire comme des km des lignes en mètres (source
+# "osrm" de l'ancien calcul des matrices)
+SUFFIXE_CACHE = "_km"
+
+
+class DistanceIndisponible(Exception):
+    """Le fournisseur n'a pas pu calculer les distances demandées"""
+
+
+def distances_haversine(latitudes1, longitudes1, latitudes2, longitudes2):
+    """Bloc len(points1) × len(points2) des distances haversine (km)"""
+    lat1 = np.radians(np.asarray(latitudes1, dtype=np.float64))[:, None]
+    lon1 = np.radians(np.asarray(longitudes1, dtype=np.float64))[:, None]
+    lat2 = np.radians(np.asarray(latitudes2, dtype=np.float64))[None, :]
+    lon2 = np.radians(np.asarray(longitudes2, dtype=np.float64))[None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RAYON_TERRE * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class DistanceProvider:
+    """Interface commune ; nom identifie la source des distances (cache, empreinte des tournées)"""
+    nom = None
+
+    def bloc(self, points, sources, destinations):
+        raise NotImplementedError
+
+    def matrice(self, points):
+        tous = list(range(len(points)))
+        return self.bloc(points, tous, tous)
+
+    def _matrice_ou_none(self, points):
+        try:
+            return self.matrice(points)
+        except DistanceIndisponible as e:
+            print("Distances indisponibles :", e)
+            return None
+
+    def matrices(self, listes_points, workers=None):
+        return [self._matrice_ou_none(points) for points in listes_points]
+
+
+class HaversineProvider(DistanceProvider):
+    nom = HAVERSINE
+
+    def bloc(self, points, sources, destinations):
+        latitudes, longitudes = np.asarray(points, dtype=np.float64).T
+        return distances_haversine(latitudes[sources], longitudes[sources],
+                                   latitudes[destinations], longitudes[destinations])
+
+    def matrice(self, points):
+        latitudes, longitudes = zip(*points)
+        return calculate_distance_matrix_gps(latitudes, longitudes)
+
+
+class OSRMProvider(DistanceProvider):
+    """Distances routières du service table d'OSRM ; les paires sans route valent NaN"""
+    nom = OSRM
+
+    def __init__(self, client):
+        self.client = client
+
+    def bloc(self, points, sources, destinations):
+        try:
+            return self.client.table(points, sources, destinations) / 1000
+        except OSRMErreur as e:
+            raise DistanceIndisponible(str(e)) from e
+
+    def matrices(self, listes_points, workers=None):
+        # Les requêtes HTTP de toutes les listes partent en parallèle
+        with ThreadPoolExecutor(max_workers=workers or Config.OSRM_WORKERS) as executeur:
+            return list(executeur.map(self._matrice_ou_none, listes_points))
+
+
+class CachedProvider(DistanceProvider):
+    """
+    Fournisseur précédé du cache partagé de sa source : seules les paires
+    inconnues lui sont demandées. Le cache ajoute ses nouvelles distances à
+    la session ; le commit est laissé à l'appelant.
+    """
+
+    def __init__(self, fournisseur):
+        self.fournisseur = fournisseur
+        self.nom = fournisseur.nom
+
+    @property
+    def cache(self):
+        return cache_pour(self.nom + SUFFIXE_CACHE)
+
+    def _calculer(self, points, sources, destinations):
+        """Bloc du fournisseur, ou None en cas d'échec (convention de DistanceCache)"""
+        try:
+            return self.fournisseur.bloc(points, sources, destinations)
+        except DistanceIndisponible as e:
+            print("Distances indisponibles :", e)
+            return None
+
+    def bloc(self, points, sources, destinations):
+        return self.matrice(points)[np.ix_(sources, destinations)]
+
+    def matrice(self, points):
+        matrice = self.cache.matrice(points, lambda s, d: self._calculer(points, s, d))
+        if matrice is None:
+            raise DistanceIndisponible(f"{self.nom} : distances manquantes non calculées")
+        return matrice
+
+    def matrices(self, listes_points, workers=None):
+        # Le cache reste dans le thread appelant, seuls les calculs sont parallèles
+        with ThreadPoolExecutor(max_workers=workers or Config.OSRM_WORKERS) as executeur:
+            return self.cache.matrices(listes_points, self._calculer, executeur)
+
+
+class FallbackProvider(DistanceProvider):
+    """
+    Fournisseur principal, complété par le secours (haversine par défaut)
+    quand il échoue ou laisse des paires sans distance (NaN). replis
+    compte les matrices concernées.
+    """
+
+    def __init__(self, principal, secours=None):
+        self.principal = principal
+        self.secours = secours or HaversineProvider()
+        self.nom = principal.nom
+        self.replis = 0
+
+    def _completer(self, points, matrice):
+        if matrice is None:
+            self.replis += 1
+            print(f"Repli sur {self.secours.nom} pour {len(points)} points")
+            return self.secours.matrice(points)
+        manquantes = np.isnan(matrice)
+        if manquantes.any():
+            self.replis += 1
+            matrice = np.where(manquantes, self.secours.matrice(points), matrice)
+        return matrice
+
+    def bloc(self, points, sources, destinations):
+        return self.matrice(points)[np.ix_(sources, destinations)]
+
+    def matrice(self, points):
+        return self._completer(points, self.principal._matrice_ou_none(points))
+
+    def matrices(self, listes_points, workers=None):
+        resultats = self.principal.matrices(listes_points, workers)
+        return [self._completer(points, matrice) for points, matrice in zip(listes_points, resultats)]
+
+
+# Un fournisseur par nom, partagé par le processus (session HTTP, compteurs)
+_fournisseurs = {}
+_verrou_fournisseurs = threading.Lock()
+
+
+def fournisseur_distances(nom=None):
+    """
+    Fournisseur configuré pour nom (Config.DISTANCE_PROVIDER par défaut).
+    OSRM passe par le cache (DISTANCE_CACHE) et se replie sur haversine
+    (DISTANCE_REPLI) ; haversine est calculée directement.
+    """
+    nom = nom or Config.DISTANCE_PROVIDER
+    if nom not in FOURNISSEURS:
+        raise ValueError(f"fournisseur de distances inconnu : {nom} (attendu : {', '.join(FOURNISSEURS)})")
+    with _verrou_fournisseurs:
+        if nom not in _fournisseurs:
+            if nom == HAVERSINE:
+                fournisseur = HaversineProvider()
+            else:
+                client = OSRMClient(Config.OSRM_URL, taille_tuile=Config.OSRM_TAILLE_TUILE,
+                                    timeout=Config.OSRM_TIMEOUT, connexions=Config.OSRM_WORKERS)
+                fournisseur = OSRMProvider(client)
+                if Config.DISTANCE_CACHE:
+                    fournisseur = CachedProvider(fournisseur)
+                if Config.DISTANCE_REPLI:
+                    fournisseur = FallbackProvider(fournisseur)
+            _fournisseurs[nom] = fournisseur
+        return _fournisseurs[nom]
@@ -0,0 +1,129 @@
+"""
+Moteur de programmation dynamique pour l'affectation des colis aux camions.
+
+Les poids sont discrétisés (pas de 0,1 kg par défaut) : le sac à dos d'un
+camion se résout alors exactement par un tableau de taille capacité/pas,
+vectorisé avec NumPy. Plusieurs camions sont traités par décomposition :
+un sac à dos par camion (du plus grand au plus petit) sur les colis encore
+libres, puis une réparation par recherche locale.
+
+Adapté aux grands nombres de colis avec peu de camions, où l'arbre du
+branch and bound devient trop grand.
+"""
+import math
+import time
+
+import numpy as np
+
+from services.bnb_knapsack import borne_fractionnelle, calculer_prefixes, trier_par_ratio
+from services.heuristiques_knapsack import recherche_locale, valeur_affectation
+
+PAS_DEFAUT = 0.1
+
+
+def discretiser(poids, capacites, pas=PAS_DEFAUT):
+    """
+    Poids arrondis au pas supérieur et capacités au pas inférieur : une
+    solution du problème discrétisé est toujours réalisable en kg réels.
+    """
+    # round() absorbe le bruit flottant (0.3 / 0.1 = 2.9999999999999996)
+    poids_int = [math.ceil(round(p / pas, 6)) for p in poids]
+    capacites_int = [math.floor(round(c / pas, 6)) for c in capacites]
+    return poids_int, capacites_int
+
+
+class TableSacADos:
+    """
+    Tableau de programmation dynamique d'un sac à dos 0/1.
+
+    valeur[c] est la meilleure valeur avec une capacité c, et prend[i, c]
+    indique si le colis i fait partie de cette solution. Le même tableau
+    sert pour toute capacité <= capacite_max.
+    """
+
+    def __init__(self, indices, poids_int, valeurs, capacite_max):
+        self.indices = list(indices)
+        self.poids_int = poids_int
+        self.capacite_max = capacite_max
+        self.valeur = np.zeros(capacite_max + 1)
+        self.prend = np.zeros((len(self.indices), capacite_max + 1), dtype=bool)
+
+        for ligne, i in enumerate(self.indices):
+            w = poids_int[i]
+            if w > capacite_max:
+                continue
+            # Les valeurs de droite sont évaluées avant l'affectation :
+            # candidat utilise bien la ligne précédente du tableau
+            candidat = self.valeur[:capacite_max + 1 - w] + valeurs[i]
+            meilleur = candidat > self.valeur[w:]
+            self.prend[ligne, w:] = meilleur
+            self.valeur[w:] = np.where(meilleur, candidat, self.valeur[w:])
+
+    def choisir(self, capacite):
+        """Colis de la meilleure solution pour une capacité <= capacite_max"""
+        choisis = []
+        c = capacite
+        for ligne in range(len(self.indices) - 1, -1, -1):
+            if self.prend[ligne, c]:
+                i = self.indices[ligne]
+                choisis.append(i)
+                c -= self.poids_int[i]
+        choisis.reverse()
+        return choisis
+
+
+def resoudre_dp(colis, camions, pas=PAS_DEFAUT):
+    """
+    Affecte les colis aux camions par décomposition en sacs à dos simples.
+    Renvoie un dict de la même forme que KnapsackSolver.solution().
+    """
+    debut = time.monotonic()
+    poids = [c["poids"] for c in colis]
+    valeurs = [c["priorite"] for c in colis]
+    capacites = [c["capacite"] for c in camions]
+    poids_int, capacites_int = discretiser(poids, capacites, pas)
+
+    affectation = [-1] * len(colis)
+    libres = list(range(len(colis)))
+    for k in sorted(range(len(camions)), key=lambda k: capacites_int[k], reverse=True):
+        if not libres or capacites_int[k] <= 0:
+            continue
+        table = TableSacADos(libres, poids_int, valeurs, capacites_int[k])
+        for i in table.choisir(capacites_int[k]):
+            affectation[i] = k
+        libres = [i for i in libres if affectation[i] < 0]
+
+    # Réparation : les sacs successifs laissent des places que la recherche
+    # locale (déplacements / échanges entre camions) peut combler
+    restantes = list(capacites)
+    for i, k in enumerate(affectation):
+        if k >= 0:
+            restantes[k] -= poids[i]
+    affectation, _ = recherche_locale(poids, valeurs, affectation, restantes)
+    valeur = valeur_affectation(valeurs, affectation)
+
+    # Borne fractionnelle sur la capacité totale, pour mesurer l'écart
+    colis_tries = trier_par_ratio(colis)
+    prefixe_poids, prefixe_valeurs = calculer_prefixes(colis_tries)
+    borne = max(valeur, borne_fractionnelle(prefixe_poids, prefixe_valeurs, 0, sum(capacites)))
+
+    repartition = {c["id_camion"]: [] for c in camions}
+    for c, k in zip(colis, affectation):
+        if k >= 0:
+            repartition[camions[k]["id_camion"]].append(c["id_colis"])
+
+    return {
+        "valeur": valeur,
+        "repartition": repartition,
+        "borne": borne,
+        "gap": (borne - valeur) / borne if borne else 0.0,
+        "optimal": borne - valeur <= 1e-12,
+        "arret": None,
+        "duree": time.monotonic() - debut,
+        "noeuds_explores": 0,
+        "noeuds_elagues": 0,
+        "noeuds_domines": 0,
+        "valeur_demarrage": 0,
+        "elagues_par_demarrage": 0,
+        "strategie": None,
+    }
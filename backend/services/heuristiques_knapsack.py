@@ -0,0 +1,177 @@
+"""
+Heuristiques rapides pour l'affectation des colis aux camions.
+
+Elles construisent une bonne solution (pas forcément optimale) en quelques
+millisecondes, utilisée pour amorcer le branch and bound.
+
+Représentation commune : les colis et les camions sont repérés par leur
+indice, affectation[i] = indice du camion du colis i, ou -1 s'il n'est pas
+chargé, et restantes[k] = capacité restante du camion k.
+"""
+
+
+def ordre_par_ratio(poids, valeurs):
+    """Indices des colis par priorite/poids décroissant"""
+    def ratio(i):
+        return valeurs[i] / poids[i] if poids[i] > 0 else float("inf")
+    return sorted(range(len(poids)), key=ratio, reverse=True)
+
+
+def meilleur_camion(poids_colis, restantes):
+    """Camion où le colis laisse le moins de place libre (best fit), -1 si aucun"""
+    meilleur = -1
+    for k, reste in enumerate(restantes):
+        if poids_colis <= reste and (meilleur < 0 or reste < restantes[meilleur]):
+            meilleur = k
+    return meilleur
+
+
+def glouton_best_fit(poids, valeurs, capacites):
+    """Best-fit decreasing : chaque colis, par ratio décroissant, va dans le camion le plus plein qui l'accepte"""
+    affectation = [-1] * len(poids)
+    restantes = list(capacites)
+    for i in ordre_par_ratio(poids, valeurs):
+        k = meilleur_camion(poids[i], restantes)
+        if k >= 0:
+            affectation[i] = k
+            restantes[k] -= poids[i]
+    return affectation, restantes
+
+
+def _inserer(i, k, poids, affectation, restantes):
+    affectation[i] = k
+    restantes[k] -= poids[i]
+
+
+def _retirer(i, poids, affectation, restantes):
+    k = affectation[i]
+    affectation[i] = -1
+    restantes[k] += poids[i]
+    return k
+
+
+def _faire_place(u, poids, affectation, restantes, charges):
+    """
+    Essaie de charger le colis u en déplaçant un colis déjà chargé vers un
+    autre camion (move) ou en échangeant deux colis entre camions (swap).
+    """
+    m = len(restantes)
+    for k in range(m):
+        manque = poids[u] - restantes[k]
+        if manque <= 0:
+            _inserer(u, k, poids, affectation, restantes)
+            return True
+        for a in charges[k]:
+            if poids[a] < manque:
+                continue
+            # Move : a part dans un autre camion et libère sa place
+            for k2 in range(m):
+                if k2 != k and poids[a] <= restantes[k2]:
+                    _retirer(a, poids, affectation, restantes)
+                    _inserer(a, k2, poids, affectation, restantes)
+                    _inserer(u, k, poids, affectation, restantes)
+                    return True
+            # Swap : a échange avec un colis b plus léger d'un autre camion
+            for k2 in range(m):
+                if k2 == k:
+                    continue
+                for b in charges[k2]:
+                    gain = poids[a] - poids[b]
+                    if gain >= manque and poids[a] <= restantes[k2] + poids[b]:
+                        _retirer(a, poids, affectation, restantes)
+                        _retirer(b, poids, affectation, restantes)
+                        _inserer(a, k2, poids, affectation, restantes)
+                        _inserer(b, k, poids, affectation, restantes)
+                        _inserer(u, k, poids, affectation, restantes)
+                        return True
+    return False
+
+
+def _echanger_moins_prioritaire(u, poids, valeurs, affectation, restantes, charges):
+    """Remplace un colis chargé moins prioritaire par le colis u s'il tient à sa place"""
+    for k, charge in enumerate(charges):
+        for a in charge:
+            if valeurs[a] < valeurs[u] and poids[u] <= restantes[k] + poids[a]:
+                _retirer(a, poids, affectation, restantes)
+                _inserer(u, k, poids, affectation, restantes)
+                return True
+    return False
+
+
+def _charges(affectation, m):
+    """Liste des colis chargés dans chaque camion"""
+    charges = [[] for _ in range(m)]
+    for i, k in enumerate(affectation):
+        if k >= 0:
+            charges[k].append(i)
+    return charges
+
+
+def recherche_locale(poids, valeurs, affectation, restantes, iterations_max=50):
+    """
+    Améliore une affectation sur place : insertion des colis non chargés,
+    avec déplacement ou échange de colis entre camions pour faire de la
+    place, puis remplacement de colis moins prioritaires.
+    S'arrête dès qu'un passage complet n'améliore plus rien.
+    """
+    ordre = ordre_par_ratio(poids, valeurs)
+    for _ in range(iterations_max):
+        ameliore = False
+        charges = None
+        for u in ordre:
+            if affectation[u] >= 0:
+                continue
+            if charges is None:
+                charges = _charges(affectation, len(restantes))
+            if (_faire_place(u, poids, affectation, restantes, charges)
+                    or _echanger_moins_prioritaire(u, poids, valeurs, affectation, restantes, charges)):
+                ameliore = True
+                charges = None
+        if not ameliore:
+            break
+    return affectation, restantes
+
+
+def valeur_affectation(valeurs, affectation):
+    return sum(v for v, k in zip(valeurs, affectation) if k >= 0)
+
+
+def demarrage(poids, valeurs, capacites):
+    """Solution initiale : glouton best-fit decreasing puis recherche locale"""
+    affectation, restantes = glouton_best_fit(poids, valeurs, capacites)
+    affectation, _ = recherche_locale(poids, valeurs, affectation, restantes)
+    return affectation, valeur_affectation(valeurs, affectation)
+
+
+def inserer_avec_deplacements(poids, valeurs, affectation, restantes, libres, deplacements_max):
+    """
+    Charge les colis libres (indices) en déplaçant au plus deplacements_max
+    colis déjà chargés vers un autre camion pour leur faire de la place.
+    Renvoie l'ensemble des colis déplacés.
+    """
+    deplaces = set()
+    budget = deplacements_max
+    for u in sorted(libres, key=lambda i: valeurs[i] / poids[i] if poids[i] > 0 else float("inf"),
+                    reverse=True):
+        if affectation[u] >= 0:
+            continue
+        k = meilleur_camion(poids[u], restantes)
+        if k >= 0:
+            _inserer(u, k, poids, affectation, restantes)
+            continue
+        if budget <= 0:
+            continue
+        charges = _charges(affectation, len(restantes))
+        for k in range(len(restantes)):
+            manque = poids[u] - restantes[k]
+            a, k2 = next(((a, k2) for a in charges[k] if poids[a] >= manque
+                          for k2 in range(len(restantes))
+                          if k2 != k and poids[a] <= restantes[k2]), (None, None))
+            if a is not None:
+                _retirer(a, poids, affectation, restantes)
+                _inserer(a, k2, poids, affectation, restantes)
+                _inserer(u, k, poids, affectation, restantes)
+                deplaces.add(a)
+                budget -= 1
+                break
+    return deplaces
@@ -0,0 +1,109 @@
+"""
+Client du service table d'OSRM.
+
+Les grandes matrices dépassent la taille maximale d'une requête table
+(max-table-size côté serveur) et la longueur des URL : elles sont
+découpées en tuiles sources × destinations, demandées une à une sur une
+session HTTP réutilisée (keep-alive), puis réassemblées en un ndarray.
+Chaque tuile a un timeout et est retentée avec un délai exponentiel sur
+les erreurs réseau et les réponses 429 / 5xx.
+"""
+import threading
+import time
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+OSRM_BASE_URL = "http://router.project-osrm.org"
+# Au plus TAILLE_TUILE sources et autant de destinations par requête
+TAILLE_TUILE = 100
+TIMEOUT = 10.0
+TENTATIVES = 3
+DELAI_INITIAL = 0.5
+
+
+class OSRMErreur(Exception):
+    """Réponse invalide d'OSRM, ou échec après toutes les tentatives"""
+
+
+class OSRMClient:
+    def __init__(self, base_url=OSRM_BASE_URL, profil="driving", taille_tuile=TAILLE_TUILE,
+                 timeout=TIMEOUT, tentatives=TENTATIVES, delai_initial=DELAI_INITIAL, connexions=10):
+        self.base_url = base_url.rstrip("/")
+        self.profil = profil
+        self.taille_tuile = taille_tuile
+        self.timeout = timeout
+        self.tentatives = tentatives
+        self.delai_initial = delai_initial
+        self.session = requests.Session()
+        adaptateur = HTTPAdapter(pool_connections=connexions, pool_maxsize=connexions)
+        self.session.mount("http://", adaptateur)
+        self.session.mount("https://", adaptateur)
+        # Le client est partagé entre threads (session comprise, urllib3 étant thread-safe)
+        self.requetes = 0
+        self._verrou = threading.Lock()
+
+    def _get(self, url, params):
+        """GET avec timeout et nouvelles tentatives (délai doublé à chaque échec)"""
+        delai = self.delai_initial
+        for tentative in range(self.tentatives):
+            dernier = tentative == self.tentatives - 1
+            try:
+                with self._verrou:
+                    self.requetes += 1
+                reponse = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if dernier:
+                    raise OSRMErreur(f"OSRM injoignable : {e}") from e
+            else:
+                if reponse.status_code == 200:
+                    try:
+                        donnees = reponse.json()
+                    except ValueError as e:
+                        raise OSRMErreur(f"Réponse OSRM illisible : {e}") from e
+                    if not isinstance(donnees, dict):
+                        raise OSRMErreur("Réponse OSRM inattendue")
+                    if donnees.get("code") != "Ok":
+                        raise OSRMErreur(f"OSRM : {donnees.get('code')} {donnees.get('message', '')}")
+                    return donnees
+                if reponse.status_code != 429 and reponse.status_code < 500:
+                    raise OSRMErreur(f"OSRM {reponse.status_code} : {reponse.text[:200]}")
+                if dernier:
+                    raise OSRMErreur(f"OSRM {reponse.status_code} après {self.tentatives} tentatives")
+            time.sleep(delai)
+            delai *= 2
+
+    def _tuile(self, points, sources, destinations):
+        """Bloc sources × destinations ; seuls les points utilisés sont envoyés"""
+        utilises = sorted(set(sources) | set(destinations))
+        position = {p: k for k, p in enumerate(utilises)}
+        coords = ";".join(f"{points[p][1]},{points[p][0]}" for p in utilises)
+        params = {
+            "annotations": "distance",
+            "sources": ";".join(str(position[i]) for i in sources),
+            "destinations": ";".join(str(position[j]) for j in destinations),
+        }
+        donnees = self._get(f"{self.base_url}/table/v1/{self.profil}/{coords}", params)
+        # null (pas de route) devient NaN
+        try:
+            bloc = np.array(donnees["distances"], dtype=np.float64)
+        except (KeyError, TypeError, ValueError) as e:
+            raise OSRMErreur(f"Distances OSRM invalides : {e!r}") from e
+        if bloc.shape != (len(sources), len(destinations)):
+            raise OSRMErreur(f"Bloc OSRM {bloc.shape} pour {len(sources)} × {len(destinations)} points")
+        return bloc
+
+    def table(self, points, sources=None, destinations=None):
+        """
+        Distances routières en mètres des points (latitude, longitude)
+        d'indices sources vers ceux d'indices destinations (tous par défaut).
+        """
+        sources = list(range(len(points))) if sources is None else list(sources)
+        destinations = list(range(len(points))) if destinations is None else list(destinations)
+        matrice = np.full((len(sources), len(destinations)), np.nan)
+        t = self.taille_tuile
+        for i in range(0, len(sources), t):
+            for j in range(0, len(destinations), t):
+                matrice[i:i + t, j:j + t] = self._tuile(points, sources[i:i + t], destinations[j:j + t])
+        return matrice
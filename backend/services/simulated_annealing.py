@@ -1,5 +1,38 @@
 import random
 import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+MOUVEMENT_SWAP = "swap"
+MOUVEMENT_2OPT = "2opt"
+MOUVEMENT_OR_OPT = "or_opt"
+MOUVEMENT_RELOCATE = "relocate"
+MOUVEMENTS = (MOUVEMENT_SWAP, MOUVEMENT_2OPT, MOUVEMENT_OR_OPT, MOUVEMENT_RELOCATE)
+VOISINAGES_DEFAUT = (MOUVEMENT_2OPT, MOUVEMENT_OR_OPT, MOUVEMENT_RELOCATE)
+K_VOISINS_DEFAUT = 8
+
+CONSTRUCTION_ALEATOIRE = "aleatoire"
+CONSTRUCTION_PPV = "plus_proche_voisin"
+CONSTRUCTION_GLOUTON = "glouton_aretes"
+CONSTRUCTION_HILBERT = "hilbert"
+CONSTRUCTIONS = (CONSTRUCTION_ALEATOIRE, CONSTRUCTION_PPV, CONSTRUCTION_GLOUTON, CONSTRUCTION_HILBERT)
+ORDRE_HILBERT = 16
+
+# Calibration automatique de la température initiale : un mouvement
+# dégradant moyen doit être accepté avec la probabilité P0_DEFAUT
+TEMPERATURE_AUTO = "auto"
+P0_DEFAUT = 0.8
+ECHANTILLON_CALIBRATION = 200
+# min_temp="auto" vaut T0 * RATIO_TEMP_MIN (T0 calibrée ou donnée)
+RATIO_TEMP_MIN = 1e-3
+
+ARRET_TEMPERATURE = "temperature"
+ARRET_TEMPS = "temps"
+ARRET_STAGNATION = "stagnation"
+ARRET_ITERATIONS = "iterations"
 
 def calculate_distance_gps(lat1, lon1, lat2, lon2):
     """Calcule la distance entre deux points GPS (formule haversine)"""
@@ -18,13 +51,153 @@ def calculate_distance_gps(lat1, lon1, lat2, lon2):
     
     return R * c
 
+def calculate_distance_matrix_gps(latitudes, longitudes, dtype=np.float64):
+    """
+    Matrice n×n des distances haversine (km), vectorisée : la trigonométrie
+    n'est évaluée qu'une fois par paire i < j puis recopiée par symétrie.
+    """
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    n = len(lat)
+    i, j = np.triu_indices(n, k=1)
+    a = (np.sin((lat[j] - lat[i]) / 2) ** 2
+         + np.cos(lat[i]) * np.cos(lat[j]) * np.sin((lon[j] - lon[i]) / 2) ** 2)
+    distances = 2 * 6371 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    matrice = np.zeros((n, n), dtype=dtype)
+    matrice[i, j] = distances
+    matrice[j, i] = distances
+    return matrice
+
+def indices_hilbert(x, y, ordre=ORDRE_HILBERT):
+    """
+    Position sur la courbe de Hilbert d'ordre donné des points entiers
+    (x, y) de [0, 2**ordre[ ; deux points proches sur la courbe le sont
+    aussi dans le plan. Vectorisé sur des tableaux NumPy.
+    """
+    x = np.asarray(x, dtype=np.int64).copy()
+    y = np.asarray(y, dtype=np.int64).copy()
+    cote = 1 << ordre
+    d = np.zeros(len(x), dtype=np.int64)
+    s = cote >> 1
+    while s > 0:
+        rx = ((x & s) > 0).astype(np.int64)
+        ry = ((y & s) > 0).astype(np.int64)
+        d += s * s * ((3 * rx) ^ ry)
+        # Rotation du quadrant pour que la sous-courbe soit dans le bon sens
+        tourne = ry == 0
+        miroir = tourne & (rx == 1)
+        x = np.where(miroir, cote - 1 - x, x)
+        y = np.where(miroir, cote - 1 - y, y)
+        x, y = np.where(tourne, y, x), np.where(tourne, x, y)
+        s >>= 1
+    return d
+
 class SimulatedAnnealing:
-    def __init__(self, distance_matrix, initial_temp=1000, cooling_rate=0.95, min_temp=1, use_nearest_neighbor=True):
+    """
+    Recuit simulé pour le TSP.
+
+    voisinages : mouvements tirés à chaque itération, parmi MOUVEMENTS.
+    2-opt et Or-opt ne sont proposés que vers les k_voisins plus proches
+    voisins de la ville tirée (listes calculées une fois par instance), ce
+    qui concentre la recherche sur les arêtes prometteuses.
+    Si la matrice n'est pas symétrique (distances routières), 2-opt et
+    l'insertion inversée d'Or-opt sont désactivés : leur variation en O(1)
+    suppose d(a, b) == d(b, a).
+
+    Planning de refroidissement : facteur_iterations * n itérations par
+    palier de température (une seule si None, comportement historique),
+    arrêt à min_temp, après temps_max secondes ou après
+    max_sans_amelioration itérations sans améliorer la meilleure route.
+    initial_temp=TEMPERATURE_AUTO calibre T0 sur des mouvements tirés au
+    hasard pour qu'une dégradation moyenne soit acceptée avec probabilité p0.
+
+    seed : graine du générateur propre à l'instance (random.Random) ; avec
+    la même graine, la même matrice et un arrêt qui ne dépend pas de
+    l'horloge (iterations_max au lieu de temps_max), solve() rend toujours
+    la même route.
+
+    construction : route initiale parmi CONSTRUCTIONS (par défaut plus
+    proche voisin, ou aléatoire si use_nearest_neighbor=False). Le plus
+    proche voisin et le glouton sur les arêtes s'appuient sur les listes de
+    voisins ; hilbert exige coordonnees[ville] = (latitude, longitude).
+
+    distance_matrix : liste de listes ou ndarray. Un ndarray est converti
+    une fois en listes Python, dont l'accès élément par élément est bien
+    plus rapide que l'indexation NumPy dans la boucle du recuit.
+    """
+
+    def __init__(self, distance_matrix, initial_temp=1000, cooling_rate=0.95, min_temp=1, use_nearest_neighbor=True,
+                 voisinages=VOISINAGES_DEFAUT, k_voisins=K_VOISINS_DEFAUT, polissage=True,
+                 facteur_iterations=None, temps_max=None, max_sans_amelioration=None, p0=P0_DEFAUT,
+                 iterations_max=None, seed=None, construction=None, coordonnees=None):
+        if construction is None:
+            construction = CONSTRUCTION_PPV if use_nearest_neighbor else CONSTRUCTION_ALEATOIRE
+        if construction not in CONSTRUCTIONS:
+            raise ValueError(f"Construction inconnue : {construction}")
+        if construction == CONSTRUCTION_HILBERT and coordonnees is None:
+            raise ValueError("La construction hilbert exige les coordonnées des villes")
+        inconnus = set(voisinages) - set(MOUVEMENTS)
+        if not voisinages or inconnus:
+            raise ValueError(f"Voisinages invalides : {sorted(inconnus) or voisinages}")
+        self._matrice_np = None
+        if isinstance(distance_matrix, np.ndarray):
+            symetrique = bool(np.array_equal(distance_matrix, distance_matrix.T))
+            self._matrice_np = distance_matrix
+            distance_matrix = distance_matrix.tolist()
+        else:
+            symetrique = all(
+                distance_matrix[a][b] == distance_matrix[b][a]
+                for a in range(len(distance_matrix)) for b in range(a)
+            )
         self.distance_matrix = distance_matrix
         self.initial_temp = initial_temp
         self.cooling_rate = cooling_rate
         self.min_temp = min_temp
         self.use_nearest_neighbor = use_nearest_neighbor
+        self.construction = construction
+        self.coordonnees = coordonnees
+        self.k_voisins = k_voisins
+        self.polissage = polissage
+        self.facteur_iterations = facteur_iterations
+        self.temps_max = temps_max
+        self.max_sans_amelioration = max_sans_amelioration
+        self.p0 = p0
+        self.iterations_max = iterations_max
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.statistiques = {}
+        self.symetrique = symetrique
+        if not self.symetrique:
+            voisinages = [v for v in voisinages if v != MOUVEMENT_2OPT] or [MOUVEMENT_SWAP]
+        self.voisinages = tuple(voisinages)
+        self._voisins = None
+
+    @property
+    def matrice_np(self):
+        """La matrice en ndarray, pour les calculs vectorisés"""
+        if self._matrice_np is None:
+            self._matrice_np = np.asarray(self.distance_matrix, dtype=np.float64)
+        return self._matrice_np
+
+    @property
+    def voisins(self):
+        """
+        k plus proches voisins de chaque ville, du plus proche au plus
+        lointain : tri partiel des lignes (argpartition) puis tri des k
+        retenus, O(n²) en NumPy au lieu de n tris Python.
+        """
+        if self._voisins is None:
+            n = len(self.distance_matrix)
+            k = min(self.k_voisins, n - 1)
+            if k <= 0:
+                self._voisins = [[] for _ in range(n)]
+                return self._voisins
+            matrice = np.array(self.matrice_np, dtype=np.float64)
+            np.fill_diagonal(matrice, np.inf)
+            proches = np.argpartition(matrice, k - 1, axis=1)[:, :k]
+            ordre = np.take_along_axis(matrice, proches, axis=1).argsort(axis=1, kind="stable")
+            self._voisins = np.take_along_axis(proches, ordre, axis=1).tolist()
+        return self._voisins
     
     def calculate_distance(self, route):
         """Calcule la distance totale d'une route"""
@@ -38,59 +211,631 @@ class SimulatedAnnealing:
     def swap_cities(self, route):
         """Échange deux villes aléatoirement"""
         new_route = route.copy()
-        i, j = random.sample(range(len(route)), 2)
+        i, j = self.rng.sample(range(len(route)), 2)
         new_route[i], new_route[j] = new_route[j], new_route[i]
         return new_route
+
+    def _aretes_touchees(self, route, positions):
+        """Somme des arêtes (route[p], route[p+1]) pour les positions données"""
+        n = len(route)
+        return sum(self.distance_matrix[route[p]][route[(p + 1) % n]] for p in positions)
+
+    def delta_swap(self, route, i, j):
+        """
+        Variation de distance si on échange les villes des positions i et j.
+        Seules les (au plus) 4 arêtes autour de i et j changent : O(1).
+        """
+        if i == j:
+            return 0
+        n = len(route)
+        positions = {(i - 1) % n, i, (j - 1) % n, j}
+        avant = self._aretes_touchees(route, positions)
+        self.appliquer_swap(route, i, j)
+        apres = self._aretes_touchees(route, positions)
+        self.appliquer_swap(route, i, j)  # annulation
+        return apres - avant
+
+    def appliquer_swap(self, route, i, j):
+        """Échange en place (appliquer deux fois annule le mouvement)"""
+        route[i], route[j] = route[j], route[i]
     
     def random_initial(self, cities):
         """Génère une solution initiale aléatoire"""
         route = cities.copy()
-        random.shuffle(route)
+        self.rng.shuffle(route)
         return route
     
     def nearest_neighbor_initial(self, cities):
-        """Génère une solution initiale avec descente locale (plus proche voisin)"""
+        """
+        Génère une solution initiale avec descente locale (plus proche voisin).
+        Le premier voisin candidat non visité est le plus proche de tous ;
+        si tous les candidats sont visités, on cherche dans la ligne de la
+        matrice (argmin NumPy masqué).
+        """
         if not cities:
             return []
-        start = random.choice(cities)
+        start = self.rng.choice(cities)
         route = [start]
-        unvisited = set(cities) - {start}
-        while unvisited:
+        libres = [False] * len(self.distance_matrix)
+        masque = np.full(len(self.distance_matrix), np.inf)
+        for ville in cities:
+            libres[ville] = True
+            masque[ville] = 0.0
+        libres[start] = False
+        masque[start] = np.inf
+        voisins = self.voisins
+        for _ in range(len(cities) - 1):
             current = route[-1]
-            next_city = min(unvisited, key=lambda city: self.distance_matrix[current][city])
+            next_city = next((c for c in voisins[current] if libres[c]), -1)
+            if next_city < 0:
+                next_city = int(np.argmin(self.matrice_np[current] + masque))
             route.append(next_city)
-            unvisited.remove(next_city)
+            libres[next_city] = False
+            masque[next_city] = np.inf
         return route
 
+    def greedy_edge_initial(self, cities):
+        """
+        Glouton sur les arêtes : les arêtes candidates (listes de voisins)
+        sont ajoutées de la plus courte à la plus longue tant qu'elles ne
+        donnent ni degré 3 ni cycle ; les chemins obtenus sont ensuite
+        raccordés bout à bout au plus proche.
+        """
+        if len(cities) < 3:
+            return list(cities)
+        d = self.distance_matrix
+        dans = set(cities)
+        aretes = sorted({(min(a, b), max(a, b)) for a in cities for b in self.voisins[a] if b in dans},
+                        key=lambda e: d[e[0]][e[1]])
+        parent = {v: v for v in cities}
+
+        def racine(v):
+            while parent[v] != v:
+                parent[v] = parent[parent[v]]
+                v = parent[v]
+            return v
+
+        adjacents = {v: [] for v in cities}
+        for a, b in aretes:
+            if len(adjacents[a]) < 2 and len(adjacents[b]) < 2:
+                ra, rb = racine(a), racine(b)
+                if ra != rb:
+                    parent[ra] = rb
+                    adjacents[a].append(b)
+                    adjacents[b].append(a)
+
+        # Les composantes sont des chemins : on les parcourt depuis une extrémité
+        chemins, vus = [], set()
+        for v in cities:
+            if v in vus or len(adjacents[v]) == 2:
+                continue
+            chemin, precedent = [v], None
+            vus.add(v)
+            while True:
+                suivants = [w for w in adjacents[chemin[-1]] if w != precedent]
+                if not suivants:
+                    break
+                precedent = chemin[-1]
+                chemin.append(suivants[0])
+                vus.add(suivants[0])
+            chemins.append(chemin)
+
+        route = chemins.pop(0)
+        while chemins:
+            fin = route[-1]
+            k, inverse = min(((k, inv) for k in range(len(chemins)) for inv in (False, True)),
+                             key=lambda e: d[fin][chemins[e[0]][-1 if e[1] else 0]])
+            chemin = chemins.pop(k)
+            route.extend(reversed(chemin) if inverse else chemin)
+        return route
+
+    def hilbert_initial(self, cities):
+        """Villes dans l'ordre de la courbe de Hilbert sur leurs coordonnées"""
+        if len(cities) < 3:
+            return list(cities)
+        points = np.asarray([self.coordonnees[c] for c in cities], dtype=np.float64)
+        minimum = points.min(axis=0)
+        etendue = max(float((points.max(axis=0) - minimum).max()), 1e-12)
+        grille = ((points - minimum) / etendue * ((1 << ORDRE_HILBERT) - 1)).astype(np.int64)
+        # x = longitude, y = latitude
+        ordre = np.argsort(indices_hilbert(grille[:, 1], grille[:, 0]), kind="stable")
+        return [cities[i] for i in ordre]
+
+    def construire(self, cities):
+        """Route initiale selon self.construction"""
+        if self.construction == CONSTRUCTION_PPV:
+            return self.nearest_neighbor_initial(cities)
+        if self.construction == CONSTRUCTION_GLOUTON:
+            return self.greedy_edge_initial(cities)
+        if self.construction == CONSTRUCTION_HILBERT:
+            return self.hilbert_initial(cities)
+        return self.random_initial(cities)
+
     
+    def _positions(self, route):
+        """pos[ville] = indice dans la route, -1 pour les villes hors tournée"""
+        pos = [-1] * len(self.distance_matrix)
+        for p, ville in enumerate(route):
+            pos[ville] = p
+        return pos
+
+    def _proposer_swap(self, route, pos):
+        i, j = self.rng.sample(range(len(route)), 2)
+        return self.delta_swap(route, i, j), (MOUVEMENT_SWAP, i, j)
+
+    def _proposer_2opt(self, route, pos):
+        """
+        Relie une ville a à l'un de ses voisins candidats c : les arêtes
+        (a, succ a) et (c, succ c) sont remplacées par (a, c) et
+        (succ a, succ c), en inversant le segment entre les deux.
+        """
+        n = len(route)
+        d = self.distance_matrix
+        i = self.rng.randrange(n)
+        a = route[i]
+        c = self.rng.choice(self.voisins[a])
+        j = pos[c]
+        b = route[(i + 1) % n]
+        if j < 0 or c == b:
+            return None
+        e = route[(j + 1) % n]
+        delta = d[a][c] + d[b][e] - d[a][b] - d[c][e]
+        return delta, (MOUVEMENT_2OPT, i, j)
+
+    def _proposer_or_opt(self, route, pos, longueur):
+        """
+        Déplace le segment de `longueur` villes qui commence à une position
+        tirée entre un voisin candidat c de sa tête et le successeur de c,
+        dans le sens le plus court (l'inversion exige une matrice symétrique).
+        """
+        n = len(route)
+        if n < longueur + 3:
+            return None
+        d = self.distance_matrix
+        s = self.rng.randrange(n - longueur + 1)
+        tete, queue = route[s], route[s + longueur - 1]
+        c = self.rng.choice(self.voisins[tete])
+        j = pos[c]
+        # c doit être hors du segment et différent du prédécesseur
+        if j < 0 or s - 1 <= j < s + longueur or (s == 0 and j == n - 1):
+            return None
+        p = route[s - 1]
+        suivant = route[(s + longueur) % n]
+        e = route[(j + 1) % n]
+        retire = d[p][suivant] - d[p][tete] - d[queue][suivant] - d[c][e]
+        delta = retire + d[c][tete] + d[queue][e]
+        inverse = False
+        if longueur > 1 and self.symetrique:
+            delta_inverse = retire + d[c][queue] + d[tete][e]
+            if delta_inverse < delta:
+                delta, inverse = delta_inverse, True
+        return delta, (MOUVEMENT_OR_OPT, s, longueur, c, inverse)
+
+    def _proposer(self, route, pos):
+        """Tire un mouvement : (variation de distance, mouvement) ou None"""
+        voisinage = self.rng.choice(self.voisinages)
+        if voisinage == MOUVEMENT_SWAP:
+            proposition = self._proposer_swap(route, pos)
+        elif voisinage == MOUVEMENT_2OPT:
+            proposition = self._proposer_2opt(route, pos)
+        elif voisinage == MOUVEMENT_OR_OPT:
+            proposition = self._proposer_or_opt(route, pos, self.rng.choice((2, 3)))
+        else:
+            proposition = self._proposer_or_opt(route, pos, 1)
+        return None if proposition is None else self._evaluer(route, pos, proposition)
+
+    def _preparer(self, route):
+        """Point d'extension : état dérivé de la route courante (rien ici)"""
+
+    def _evaluer(self, route, pos, proposition):
+        """
+        Point d'extension : filtre ou ajuste une proposition (variation,
+        mouvement) avant le critère d'acceptation. None = mouvement interdit.
+        """
+        return proposition
+
+    def _appliquer(self, route, pos, mouvement):
+        """Applique en place un mouvement renvoyé par _proposer"""
+        nature = mouvement[0]
+        if nature == MOUVEMENT_SWAP:
+            _, i, j = mouvement
+            self.appliquer_swap(route, i, j)
+            pos[route[i]], pos[route[j]] = i, j
+        elif nature == MOUVEMENT_2OPT:
+            _, i, j = mouvement
+            debut, fin = (i + 1, j) if i < j else (j + 1, i)
+            route[debut:fin + 1] = route[debut:fin + 1][::-1]
+            for p in range(debut, fin + 1):
+                pos[route[p]] = p
+        else:
+            _, s, longueur, c, inverse = mouvement
+            segment = route[s:s + longueur]
+            if inverse:
+                segment.reverse()
+            del route[s:s + longueur]
+            j = route.index(c)
+            route[j + 1:j + 1] = segment
+            for p, ville in enumerate(route):
+                pos[ville] = p
+
+    def polir_2opt(self, route):
+        """
+        Descente 2-opt déterministe sur les listes de voisins : pour chaque
+        ville a, on essaie les candidats c plus proches que son successeur,
+        jusqu'à ce qu'aucun échange n'améliore la route. Modifie route en place.
+        """
+        n = len(route)
+        if n < 4 or not self.symetrique:
+            return route
+        d = self.distance_matrix
+        pos = self._positions(route)
+        self._preparer(route)
+        ameliore = True
+        while ameliore:
+            ameliore = False
+            for a in list(route):
+                i = pos[a]
+                b = route[(i + 1) % n]
+                for c in self.voisins[a]:
+                    if d[a][c] >= d[a][b]:
+                        break  # les candidats suivants sont plus loin encore
+                    j = pos[c]
+                    if j < 0:
+                        continue
+                    e = route[(j + 1) % n]
+                    delta = d[a][c] + d[b][e] - d[a][b] - d[c][e]
+                    if delta >= -1e-9:
+                        continue
+                    proposition = self._evaluer(route, pos, (delta, (MOUVEMENT_2OPT, i, j)))
+                    if proposition is not None and proposition[0] < -1e-9:
+                        self._appliquer(route, pos, proposition[1])
+                        ameliore = True
+                        break
+        return route
+
+    def calibrer_temperature(self, route, pos):
+        """
+        T0 = -moyenne des dégradations / ln(p0), sur un échantillon de
+        mouvements proposés depuis route (aucun n'est appliqué).
+        """
+        degradations = []
+        for _ in range(ECHANTILLON_CALIBRATION):
+            proposition = self._proposer(route, pos)
+            if proposition is not None and proposition[0] > 0:
+                degradations.append(proposition[0])
+        if not degradations:
+            return 1.0
+        return -(sum(degradations) / len(degradations)) / math.log(self.p0)
+
     def solve(self, cities):
         """Résout le TSP avec recuit simulé"""
         # Choisir la méthode de solution initiale
-        if self.use_nearest_neighbor:
-            current_route = self.nearest_neighbor_initial(cities)
-        else:
-            current_route = self.random_initial(cities)
+        current_route = self.construire(cities)
+        self._preparer(current_route)
             
         current_distance = self.calculate_distance(current_route)
         
         best_route = current_route.copy()
         best_distance = current_distance
         
+        debut = time.monotonic()
+        n = len(current_route)
+        pos = self._positions(current_route)
+
         temperature = self.initial_temp
-        
-        while temperature > self.min_temp:
-            new_route = self.swap_cities(current_route)
-            new_distance = self.calculate_distance(new_route)
-            
-            # Critère d'acceptation
-            if new_distance < current_distance or random.random() < math.exp(-(new_distance - current_distance) / temperature):
-                current_route = new_route
-                current_distance = new_distance
-                
-                if current_distance < best_distance:
-                    best_route = current_route.copy()
-                    best_distance = current_distance
-            
+        min_temp = self.min_temp
+        if temperature == TEMPERATURE_AUTO:
+            temperature = self.calibrer_temperature(current_route, pos) if n >= 2 else 1.0
+        if min_temp == TEMPERATURE_AUTO:
+            min_temp = temperature * RATIO_TEMP_MIN
+        temperature_initiale = temperature
+        palier = max(1, self.facteur_iterations * n) if self.facteur_iterations else 1
+        echeance = debut + self.temps_max if self.temps_max else None
+
+        iterations = 0
+        sans_amelioration = 0
+        arret = ARRET_TEMPERATURE
+        while temperature > min_temp and n >= 2 and arret == ARRET_TEMPERATURE:
+            for _ in range(palier):
+                iterations += 1
+                sans_amelioration += 1
+                proposition = self._proposer(current_route, pos)
+                if proposition is not None:
+                    delta, mouvement = proposition
+
+                    # Critère d'acceptation
+                    if delta < 0 or self.rng.random() < math.exp(-delta / temperature):
+                        self._appliquer(current_route, pos, mouvement)
+                        current_distance += delta
+
+                        if current_distance < best_distance - 1e-12:
+                            best_route = current_route.copy()
+                            best_distance = current_distance
+                            sans_amelioration = 0
+
+                if self.max_sans_amelioration and sans_amelioration >= self.max_sans_amelioration:
+                    arret = ARRET_STAGNATION
+                    break
+                if self.iterations_max and iterations >= self.iterations_max:
+                    arret = ARRET_ITERATIONS
+                    break
+                # Lecture de l'horloge toutes les 256 itérations seulement
+                if echeance is not None and iterations % 256 == 0 and time.monotonic() >= echeance:
+                    arret = ARRET_TEMPS
+                    break
+            if echeance is not None and arret == ARRET_TEMPERATURE and time.monotonic() >= echeance:
+                arret = ARRET_TEMPS
+
             temperature *= self.cooling_rate
+
+        if self.polissage:
+            self.polir_2opt(best_route)
         
-        return best_route, best_distance
\ No newline at end of file
+        # Recalcul exact (les deltas cumulés accumulent des erreurs d'arrondi)
+        best_distance = self.calculate_distance(best_route)
+        self.statistiques = {
+            "iterations": iterations,
+            "temperature_initiale": temperature_initiale,
+            "arret": arret,
+            "duree": time.monotonic() - debut,
+        }
+        return best_route, best_distance
+
+
+# Tournée ancrée au dépôt : vitesse moyenne (km/h) et pénalité (km) par
+# heure de retard maximal, qui fait primer la ponctualité sur la distance
+VITESSE_DEFAUT = 50.0
+PENALITE_RETARD = 1000.0
+
+
+class TableMin:
+    """Minimum d'une plage [a, b] en O(1) (sparse table construite en O(n log n))"""
+
+    def __init__(self, valeurs):
+        niveau = np.asarray(valeurs, dtype=np.float64)
+        self.niveaux = [niveau.tolist()]
+        n, largeur = len(niveau), 1
+        while 2 * largeur <= n:
+            niveau = np.minimum(niveau[:-largeur], niveau[largeur:])
+            self.niveaux.append(niveau.tolist())
+            largeur *= 2
+
+    def minimum(self, a, b):
+        k = (b - a + 1).bit_length() - 1
+        niveau = self.niveaux[k]
+        return min(niveau[a], niveau[b - (1 << k) + 1])
+
+
+class SimulatedAnnealingDepot(SimulatedAnnealing):
+    """
+    Tournée qui part du dépôt (toujours en tête de route) et y revient, avec
+    une échéance par ville en heures après le départ (None = aucune).
+    Le temps de trajet vaut distance / vitesse, plus `service` heures à
+    chaque arrêt.
+
+    Avec temps[p] l'heure d'arrivée en position p, une route modifiée est
+    une suite de morceaux de l'ancienne, parcourus à l'endroit (décalés
+    d'une constante) ou à l'envers (temps[b] - temps[p] depuis le premier
+    arrêt, la matrice étant symétrique). La marge minimale d'un morceau
+    est donc le minimum d'une plage de (échéance - temps) ou de
+    (échéance + temps) : deux TableMin, reconstruites après chaque
+    mouvement accepté, rendent le test de retard de chaque mouvement O(1).
+
+    Un mouvement ne peut pas augmenter le retard maximal ; s'il le réduit,
+    le gain compte PENALITE_RETARD km par heure.
+    """
+
+    def __init__(self, distance_matrix, echeances, depot=0, vitesse=VITESSE_DEFAUT, service=0.0, **options):
+        super().__init__(distance_matrix, **options)
+        self.depot = depot
+        self.echeances = [math.inf if e is None else e for e in echeances]
+        self.echeances[depot] = math.inf
+        self.vitesse = vitesse
+        self.service = service
+        self._retard = 0.0
+
+    def _preparer(self, route):
+        d = self.distance_matrix
+        temps = [0.0] * len(route)
+        for p in range(1, len(route)):
+            temps[p] = (temps[p - 1] + (self.service if p > 1 else 0.0)
+                        + d[route[p - 1]][route[p]] / self.vitesse)
+        self._temps = temps
+        self._avance = TableMin([self.echeances[v] - t for v, t in zip(route, temps)])
+        self._recul = TableMin([self.echeances[v] + t for v, t in zip(route, temps)])
+        self._retard = max(0.0, -self._avance.minimum(0, len(route) - 1))
+
+    def _marge(self, route, morceaux):
+        """Marge minimale (heures) de la route formée des morceaux (a, b, inverse)"""
+        d = self.distance_matrix
+        temps = self._temps
+        marge = math.inf
+        precedent, heure = None, 0.0
+        for a, b, inverse in morceaux:
+            if a > b:
+                continue
+            premier, dernier = (route[b], route[a]) if inverse else (route[a], route[b])
+            if precedent is not None:
+                heure += (self.service if precedent != self.depot else 0.0) + d[precedent][premier] / self.vitesse
+            if inverse:
+                marge = min(marge, self._recul.minimum(a, b) - (heure + temps[b]))
+            else:
+                marge = min(marge, self._avance.minimum(a, b) - (heure - temps[a]))
+            heure += temps[b] - temps[a]
+            precedent = dernier
+        return marge
+
+    def _morceaux(self, route, pos, mouvement):
+        """Découpe de la route après le mouvement, ou None s'il déplace le dépôt"""
+        n = len(route)
+        nature = mouvement[0]
+        if nature == MOUVEMENT_SWAP:
+            i, j = sorted(mouvement[1:])
+            if i == 0:
+                return None
+            return [(0, i - 1, False), (j, j, False), (i + 1, j - 1, False), (i, i, False), (j + 1, n - 1, False)]
+        if nature == MOUVEMENT_2OPT:
+            _, i, j = mouvement
+            debut, fin = (i + 1, j) if i < j else (j + 1, i)
+            return [(0, debut - 1, False), (debut, fin, True), (fin + 1, n - 1, False)]
+        _, s, longueur, c, inverse = mouvement
+        if s == 0:
+            return None
+        j = pos[c]
+        segment = (s, s + longueur - 1, inverse)
+        if j > s:
+            return [(0, s - 1, False), (s + longueur, j, False), segment, (j + 1, n - 1, False)]
+        return [(0, j, False), segment, (j + 1, s - 1, False), (s + longueur, n - 1, False)]
+
+    def _evaluer(self, route, pos, proposition):
+        delta, mouvement = proposition
+        morceaux = self._morceaux(route, pos, mouvement)
+        if morceaux is None:
+            return None
+        retard = max(0.0, -self._marge(route, morceaux))
+        if retard > self._retard + 1e-9:
+            return None
+        return delta + PENALITE_RETARD * (retard - self._retard), mouvement
+
+    def _appliquer(self, route, pos, mouvement):
+        super()._appliquer(route, pos, mouvement)
+        self._preparer(route)
+
+    def construire(self, cities):
+        """
+        Meilleure route (retard maximal puis distance) entre la construction
+        choisie et l'ordre des échéances, tournée pour commencer au dépôt.
+        """
+        if self.depot not in cities:
+            raise ValueError("Le dépôt doit faire partie des villes de la tournée")
+        candidates = [super().construire(cities), sorted(cities, key=lambda v: self.echeances[v])]
+        meilleure = None
+        for route in candidates:
+            k = route.index(self.depot)
+            route = route[k:] + route[:k]
+            self._preparer(route)
+            cle = (self._retard, self.calculate_distance(route))
+            if meilleure is None or cle < meilleure[0]:
+                meilleure = (cle, route)
+        return meilleure[1]
+
+    def planning(self, route):
+        """
+        Heures d'arrivée (après le départ) à chaque ville d'une route qui
+        commence au dépôt, et heure de retour au dépôt.
+        """
+        self._preparer(route)
+        retour = self._temps[-1]
+        if len(route) > 1:
+            retour += self.service + self.distance_matrix[route[-1]][route[0]] / self.vitesse
+        return list(self._temps), retour
+
+
+def creer_recuit(distance_matrix, **options):
+    """SimulatedAnnealingDepot si des échéances sont données, sinon SimulatedAnnealing"""
+    if "echeances" in options:
+        return SimulatedAnnealingDepot(distance_matrix, **options)
+    return SimulatedAnnealing(distance_matrix, **options)
+
+
+# Matrice des distances, transmise une fois à chaque worker par l'initialiseur
+_matrice_worker = None
+
+
+def _initialiser_worker(distance_matrix):
+    global _matrice_worker
+    _matrice_worker = distance_matrix
+
+
+def _recuit_depart(cities, options, seed, distance_matrix=None):
+    """Tâche d'un worker : un recuit complet avec sa propre graine"""
+    sa = creer_recuit(_matrice_worker if distance_matrix is None else distance_matrix,
+                      seed=seed, **options)
+    route, distance = sa.solve(cities)
+    return {"seed": seed, "route": route, "distance": distance,
+            "iterations": sa.statistiques["iterations"], "arret": sa.statistiques["arret"]}
+
+
+def solve_multi_depart(distance_matrix, cities, departs=4, workers=None, seed=None, **options):
+    """
+    Lance `departs` recuits indépendants, chacun avec sa graine dérivée de
+    seed, dans un ProcessPoolExecutor, et garde la meilleure route.
+    options : paramètres de SimulatedAnnealing. temps_max s'applique à
+    chaque départ : avec departs <= workers, la durée totale reste celle
+    d'un seul recuit.
+
+    Renvoie (route, distance, parametres) ; parametres contient les graines
+    de tous les départs, celle de la route retenue et son nombre
+    d'itérations, ce qui suffit à la régénérer avec rejouer().
+    """
+    generateur = random.Random(seed)
+    seeds = [generateur.getrandbits(32) for _ in range(departs)]
+    workers = min(departs, workers or multiprocessing.cpu_count())
+    if workers <= 1:
+        resultats = [_recuit_depart(cities, options, s, distance_matrix) for s in seeds]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_initialiser_worker,
+                                 initargs=(distance_matrix,)) as pool:
+            resultats = list(pool.map(_recuit_depart, [cities] * departs, [options] * departs, seeds))
+
+    # A distance égale, le premier départ l'emporte : le choix est reproductible
+    meilleur = min(resultats, key=lambda r: r["distance"])
+    parametres = {
+        "seeds": seeds,
+        "seed": meilleur["seed"],
+        "iterations": meilleur["iterations"],
+        "arret": meilleur["arret"],
+        "distances": [r["distance"] for r in resultats],
+        "options": {k: list(v) if isinstance(v, tuple) else v
+                    for k, v in options.items() if k != "coordonnees"},
+    }
+    return meilleur["route"], meilleur["distance"], parametres
+
+
+def rejouer(distance_matrix, cities, parametres, coordonnees=None):
+    """
+    Régénère exactement la route retenue par solve_multi_depart : même
+    graine, et arrêt au même nombre d'itérations au lieu de l'échéance.
+    Les coordonnées (construction hilbert) ne sont pas enregistrées dans
+    parametres et doivent être fournies à nouveau.
+    """
+    options = dict(parametres["options"], temps_max=None)
+    sa = creer_recuit(distance_matrix, seed=parametres["seed"], iterations_max=parametres["iterations"],
+                      coordonnees=coordonnees, **options)
+    return sa.solve(cities)
+
+
+def _optimiser_tournee(latitudes, longitudes, options, seed):
+    """Tâche d'un worker de solve_flotte : matrice (haversine si non fournie) puis multi-départ séquentiel"""
+    matrice = options.pop("matrice", None)
+    if matrice is None:
+        matrice = calculate_distance_matrix_gps(latitudes, longitudes)
+    return solve_multi_depart(matrice, list(range(len(latitudes))), workers=1, seed=seed,
+                              coordonnees=list(zip(latitudes, longitudes)), **options)
+
+
+def _options_probleme(probleme, options):
+    """(latitudes, longitudes, seed[, options du problème]) -> arguments de _optimiser_tournee"""
+    latitudes, longitudes, seed, *propres = probleme
+    return latitudes, longitudes, dict(options, **(propres[0] if propres else {})), seed
+
+
+def solve_flotte(problemes, workers=None, **options):
+    """
+    Optimise plusieurs tournées indépendantes (une par camion) en parallèle.
+    problemes : {cle: (latitudes, longitudes, seed)}, avec en quatrième
+    élément facultatif des options propres à ce problème (échéances du
+    mode ancré au dépôt, matrice des distances déjà calculée, par
+    exemple). Chaque tournée est traitée entièrement par un worker (matrice
+    haversine comprise si elle n'est pas fournie) ; options est
+    transmis à solve_multi_depart (departs, paramètres du recuit).
+    Renvoie {cle: (route, distance, parametres)}.
+    """
+    workers = min(len(problemes), workers or multiprocessing.cpu_count())
+    if workers <= 1:
+        return {cle: _optimiser_tournee(*_options_probleme(probleme, options))
+                for cle, probleme in problemes.items()}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        taches = {cle: pool.submit(_optimiser_tournee, *_options_probleme(probleme, options))
+                  for cle, probleme in problemes.items()}
+        return {cle: tache.result() for cle, tache in taches.items()}
@@ -3,6 +3,8 @@ from flask_cors import CORS
 import math
 import random
 
+from services.simulated_annealing import calculate_distance_matrix_gps
+
 app = Flask(__name__)
 CORS(app, supports_credentials=True)
 app.config['SECRET_KEY'] = 'dev-secret-key'
@@ -22,21 +24,6 @@ CLIENTS = [
 
 TOURNEES = []
 
-def calculate_distance_gps(lat1, lon1, lat2, lon2):
-    R = 6371
-    lat1_rad = math.radians(lat1)
-    lon1_rad = math.radians(lon1)
-    lat2_rad = math.radians(lat2)
-    lon2_rad = math.radians(lon2)
-    
-    dlat = lat2_rad - lat1_rad
-    dlon = lon2_rad - lon1_rad
-    
-    a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    
-    return R * c
-
 def simulated_annealing(distance_matrix, cities):
     current_route = cities.copy()
     random.shuffle(current_route)
@@ -103,16 +90,9 @@ def optimize_tournee(camion_id):
     
     # Créer matrice des distances
     n = len(CLIENTS)
-    distance_matrix = [[0 for _ in range(n)] for _ in range(n)]
-    
-    for i in range(n):
-        for j in range(n):
-            if i != j:
-                dist = calculate_distance_gps(
-                    CLIENTS[i]['latitude'], CLIENTS[i]['longitude'],
-                    CLIENTS[j]['latitude'], CLIENTS[j]['longitude']
-                )
-                distance_matrix[i][j] = dist
+    distance_matrix = calculate_distance_matrix_gps(
+        [c['latitude'] for c in CLIENTS], [c['longitude'] for c in CLIENTS]
+    )
     
     # Optimiser avec recuit simulé
     cities = list(range(n))
@@ -0,0 +1,85 @@
+import os
+import sys
+
+# Les modules du backend s'importent depuis la racine backend/ (comme app.py)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+import pytest
+from flask import Flask
+
+
+@pytest.fixture
+def client():
+    """Client de test avec le seul blueprint de l'optimisation (sans base de données)"""
+    from routes.routes_bnb import solution_bp
+    app = Flask(__name__)
+    app.register_blueprint(solution_bp, url_prefix="/api")
+    return app.test_client()
+
+
+@pytest.fixture
+def app_base():
+    """Application sur une base SQLite en mémoire, dans son contexte"""
+    from models import db
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def app_tournee(app_base):
+    """Application avec le blueprint des tournées"""
+    from routes.tournee_route import tournee_bp
+    app_base.register_blueprint(tournee_bp, url_prefix="/api/tournee")
+    return app_base
+
+
+@pytest.fixture
+def charger_tournee(app_base):
+    """Crée un camion et n colis qui lui sont affectés ; renvoie l'id du camion"""
+    import random
+    from datetime import datetime
+    from models import db
+    from models.models import Assignment, Camion, Client, Colis, Depot
+
+    def charger(n, seed=0, camion_id=1):
+        r = random.Random(seed)
+        if db.session.get(Client, 1) is None:
+            db.session.add(Client(id_client=1, nom="Dupont", prenom="Jean", adresse="Paris"))
+            db.session.add(Depot(id_depot=1, nom="Dépôt", adresse="Paris", latitude=48.85, longitude=2.35))
+        db.session.add(Camion(id_camion=camion_id, marque="Renault", capacite=1000))
+        db.session.flush()
+        for _ in range(n):
+            colis = Colis(id_client=1, destination="Paris", poids=1.0,
+                          date_livraison=datetime(2026, 1, 1),
+                          latitude=48.8 + r.uniform(0, 0.2), longitude=2.2 + r.uniform(0, 0.3))
+            colis.destination = f"{colis.latitude},{colis.longitude}"
+            db.session.add(colis)
+            db.session.flush()
+            db.session.add(Assignment(id_camion=camion_id, id_colis=colis.id_colis))
+        db.session.commit()
+        return camion_id
+
+    return charger
+
+
+@pytest.fixture
+def serveur_osrm():
+    """Faux OSRM local (distances haversine en mètres) ; options via serveur_osrm(...)"""
+    from osrm_stub import demarrer
+    serveurs = []
+
+    def lancer(**options):
+        serveurs.append(demarrer(**options))
+        return serveurs[-1]
+
+    yield lancer
+    for serveur in serveurs:
+        serveur.shutdown()
+        serveur.server_close()
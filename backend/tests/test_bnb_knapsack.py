@@ -0,0 +1,372 @@
+import random
+import time
+
+import pytest
+import routes.routes_bnb as routes_bnb
+import services.bnb_knapsack as bnb
+
+
+def instance(n, capacites, seed=0):
+    r = random.Random(seed)
+    colis = [
+        {"id_colis": i, "poids": round(r.uniform(0.5, 30), 1), "priorite": r.uniform(0.01, 1)}
+        for i in range(n)
+    ]
+    return colis, capacites
+
+
+def camions(capacites):
+    return [{"id_camion": k, "capacite": c} for k, c in enumerate(capacites)]
+
+
+def resoudre(colis, capacites, mode):
+    return bnb.KnapsackSolver(colis, camions(capacites), mode=mode).resoudre()
+
+
+def force_brute(colis, capacites):
+    """Meilleure valeur par énumération de toutes les affectations"""
+    meilleure = 0
+    m = len(capacites)
+    for code in range((m + 1) ** len(colis)):
+        charge = [0.0] * m
+        valeur = 0
+        for c in colis:
+            code, k = divmod(code, m + 1)
+            if k < m:
+                charge[k] += c["poids"]
+                valeur += c["priorite"]
+        if all(charge[k] <= capacites[k] for k in range(m)):
+            meilleure = max(meilleure, valeur)
+    return meilleure
+
+
+def test_borne_fractionnelle_coupe_le_dernier_colis():
+    colis = bnb.trier_par_ratio([
+        {"id_colis": 1, "poids": 10, "priorite": 10},
+        {"id_colis": 2, "poids": 10, "priorite": 5},
+    ])
+    pp, pv = bnb.calculer_prefixes(colis)
+    assert bnb.borne_fractionnelle(pp, pv, 0, 15) == pytest.approx(12.5)
+
+
+def test_borne_fractionnelle_colis_de_poids_nul():
+    colis = bnb.trier_par_ratio([
+        {"id_colis": 1, "poids": 0, "priorite": 3},
+        {"id_colis": 2, "poids": 4, "priorite": 2},
+    ])
+    assert colis[0]["id_colis"] == 1
+    pp, pv = bnb.calculer_prefixes(colis)
+    assert bnb.borne_fractionnelle(pp, pv, 0, 2) == pytest.approx(4.0)
+
+
+def test_borne_fractionnelle_fin_des_colis():
+    colis = [{"id_colis": 1, "poids": 1, "priorite": 1}]
+    pp, pv = bnb.calculer_prefixes(colis)
+    assert bnb.borne_fractionnelle(pp, pv, 1, 100) == 0.0
+
+
+def test_borne_fractionnelle_capacite_superieure_au_poids_total():
+    colis = bnb.trier_par_ratio([
+        {"id_colis": 1, "poids": 2, "priorite": 1},
+        {"id_colis": 2, "poids": 3, "priorite": 4},
+    ])
+    pp, pv = bnb.calculer_prefixes(colis)
+    assert bnb.borne_fractionnelle(pp, pv, 0, 1000) == pytest.approx(5.0)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_fractionnel_et_naif_meme_optimum(seed):
+    colis, capacites = instance(8, [30.0, 45.0], seed=seed)
+    fractionnel = resoudre(colis, capacites, bnb.MODE_FRACTIONNEL)["valeur"]
+    assert fractionnel == pytest.approx(resoudre(colis, capacites, bnb.MODE_NAIF)["valeur"])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_solveur_optimal_par_force_brute(seed):
+    colis, capacites = instance(6, [20.0, 35.0], seed=seed)
+    solution = resoudre(colis, capacites, bnb.MODE_FRACTIONNEL)
+    assert solution["valeur"] == pytest.approx(force_brute(colis, capacites))
+
+
+def test_repartition_respecte_les_capacites():
+    colis, capacites = instance(10, [25.0, 40.0, 40.0], seed=3)
+    solution = resoudre(colis, capacites, bnb.MODE_FRACTIONNEL)
+    poids = {c["id_colis"]: c["poids"] for c in colis}
+    assert set(solution["repartition"]) == {0, 1, 2}
+    for k, ids in solution["repartition"].items():
+        assert sum(poids[i] for i in ids) <= capacites[k]
+    charges = [i for ids in solution["repartition"].values() for i in ids]
+    assert len(charges) == len(set(charges))
+
+
+def test_solveurs_independants():
+    colis, capacites = instance(8, [30.0, 45.0], seed=1)
+    premier = bnb.KnapsackSolver(colis, camions(capacites))
+    second = bnb.KnapsackSolver(colis[:3], camions([5.0]))
+    premier.resoudre()
+    second.resoudre()
+    assert premier.meilleure_valeur == pytest.approx(resoudre(colis, capacites, bnb.MODE_NAIF)["valeur"])
+    assert second.meilleure_valeur == pytest.approx(force_brute(colis[:3], [5.0]))
+    assert premier.noeuds_explores != second.noeuds_explores
+
+
+def test_pas_de_limite_de_recursion():
+    colis, _ = instance(3000, [], seed=2)
+    solution = resoudre(colis, [500.0], bnb.MODE_FRACTIONNEL)
+    assert sum(len(ids) for ids in solution["repartition"].values()) > 0
+
+
+def test_route_mode_inconnu(client):
+    reponse = client.get("/api/solution/sac_a_dos?mode=inexistant")
+    assert reponse.status_code == 400
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_symetrie_meme_optimum_moins_de_noeuds(seed):
+    colis, capacites = instance(9, [6.0] * 4 + [10.0] * 3, seed=seed)
+    sans = bnb.KnapsackSolver(colis, camions(capacites), symetrie=False)
+    avec = bnb.KnapsackSolver(colis, camions(capacites), symetrie=True)
+    assert avec.resoudre()["valeur"] == pytest.approx(sans.resoudre()["valeur"])
+    assert avec.noeuds_explores < sans.noeuds_explores
+
+
+def test_borne_ignore_la_capacite_inutilisable():
+    colis = [{"id_colis": 1, "poids": 5, "priorite": 5}, {"id_colis": 2, "poids": 5, "priorite": 5}]
+    solveur = bnb.KnapsackSolver(colis, camions([5.0, 4.0]))
+    # 4 unités restent dans le second camion mais aucun colis n'y rentre
+    assert solveur.borne(0, 0, [5.0, 4.0]) == pytest.approx(5.0)
+    assert solveur.resoudre()["valeur"] == pytest.approx(5.0)
+
+
+def test_budget_noeuds_renvoie_borne_et_ecart():
+    colis, capacites = instance(40, [60.0, 60.0, 90.0], seed=4)
+    solution = bnb.KnapsackSolver(colis, camions(capacites), noeuds_max=200).resoudre()
+    assert solution["arret"] == bnb.ARRET_NOEUDS
+    assert not solution["optimal"]
+    assert solution["noeuds_explores"] == 200
+    assert solution["borne"] >= solution["valeur"]
+    assert solution["gap"] == pytest.approx((solution["borne"] - solution["valeur"]) / solution["borne"])
+
+
+def test_chronometre_consulte_meme_sans_multiple_exact():
+    colis, capacites = instance(10, [30.0], seed=0)
+    solveur = bnb.KnapsackSolver(colis, camions(capacites), temps_max=0.0)
+    solveur.debut = time.monotonic()
+    assert solveur.budget_epuise() == bnb.ARRET_TEMPS
+    # Le best-first ajoute plusieurs noeuds par itération : 1020 -> 1027 saute 1024
+    solveur.noeuds_explores = 1020
+    assert solveur.budget_epuise() is None
+    solveur.noeuds_explores = 1027
+    assert solveur.budget_epuise() == bnb.ARRET_TEMPS
+
+
+def test_budget_temps_respecte():
+    colis, capacites = instance(60, [200.0, 200.0], seed=1)
+    solution = bnb.KnapsackSolver(colis, camions(capacites), temps_max=0.2).resoudre()
+    assert solution["arret"] == bnb.ARRET_TEMPS
+    assert solution["duree"] < 1.0
+    assert solution["valeur"] > 0
+
+
+def test_recherche_complete_ecart_nul():
+    colis, capacites = instance(8, [30.0, 45.0], seed=0)
+    solution = bnb.KnapsackSolver(colis, camions(capacites), noeuds_max=10 ** 7).resoudre()
+    assert solution["optimal"]
+    assert solution["arret"] is None
+    assert solution["gap"] == 0.0
+
+
+def test_route_budgets(client, monkeypatch):
+    appels = []
+    monkeypatch.setattr(routes_bnb, "executer_bnb", lambda **kw: appels.append(kw) or {})
+    client.get("/api/solution/sac_a_dos")
+    client.get("/api/solution/sac_a_dos?temps_max=0&noeuds_max=5000")
+    assert appels[0]["temps_max"] == routes_bnb.TEMPS_MAX_DEFAUT
+    assert appels[1]["temps_max"] is None
+    assert appels[1]["noeuds_max"] == 5000
+    assert client.get("/api/solution/sac_a_dos?temps_max=abc").status_code == 400
+
+
+def test_demarrage_amorce_la_solution():
+    colis, capacites = instance(60, [200.0, 200.0], seed=1)
+    solution = bnb.KnapsackSolver(colis, camions(capacites), noeuds_max=1).resoudre()
+    assert solution["valeur_demarrage"] > 0
+    assert solution["valeur"] >= solution["valeur_demarrage"]
+    sans = bnb.KnapsackSolver(colis, camions(capacites), noeuds_max=1, demarrage=False).resoudre()
+    assert sans["valeur_demarrage"] == 0
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_demarrage_meme_optimum(seed):
+    colis, capacites = instance(7, [20.0, 35.0], seed=seed)
+    assert resoudre(colis, capacites, bnb.MODE_NAIF)["valeur"] == pytest.approx(force_brute(colis, capacites))
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("mode", [bnb.MODE_NAIF, bnb.MODE_FRACTIONNEL])
+def test_meilleur_d_abord_meme_optimum(seed, mode):
+    colis, capacites = instance(7, [20.0, 35.0, 35.0], seed=seed)
+    solveur = bnb.KnapsackSolver(colis, camions(capacites), mode=mode,
+                                 strategie=bnb.STRATEGIE_MEILLEUR, demarrage=False)
+    solution = solveur.resoudre()
+    assert solution["optimal"]
+    assert solution["valeur"] == pytest.approx(force_brute(colis, capacites))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_meilleur_d_abord_plongee_si_memoire_pleine(seed):
+    colis, capacites = instance(14, [30.0, 45.0, 45.0], seed=seed)
+    attendu = resoudre(colis, capacites, bnb.MODE_FRACTIONNEL)["valeur"]
+    solveur = bnb.KnapsackSolver(colis, camions(capacites), strategie=bnb.STRATEGIE_MEILLEUR,
+                                 memoire_max=4, demarrage=False)
+    assert solveur.resoudre()["valeur"] == pytest.approx(attendu)
+
+
+def test_meilleur_d_abord_budget():
+    colis, capacites = instance(60, [200.0, 200.0], seed=1)
+    solution = bnb.KnapsackSolver(colis, camions(capacites), strategie=bnb.STRATEGIE_MEILLEUR,
+                                  noeuds_max=500).resoudre()
+    assert solution["arret"] == bnb.ARRET_NOEUDS
+    assert solution["borne"] >= solution["valeur"] > 0
+
+
+def test_route_strategie(client, monkeypatch):
+    appels = []
+    monkeypatch.setattr(routes_bnb, "executer_bnb", lambda **kw: appels.append(kw) or {})
+    client.get("/api/solution/sac_a_dos?strategie=meilleur_d_abord")
+    assert appels[0]["strategie"] == bnb.STRATEGIE_MEILLEUR
+    assert client.get("/api/solution/sac_a_dos?strategie=largeur").status_code == 400
+
+
+def test_table_transposition_lru():
+    table = bnb.TableTransposition(taille_max=2)
+    assert not table.domine(1, [5.0, 3.0], 2.0)
+    assert table.domine(1, [3.0, 5.0], 2.0)
+    assert not table.domine(1, [3.0, 5.0], 2.5)
+    assert not table.domine(2, [1.0], 1.0)
+    assert not table.domine(3, [1.0], 1.0)
+    assert len(table) == 2
+    # L'état (1, ...) le moins récemment utilisé a été évincé
+    assert not table.domine(1, [3.0, 5.0], 0.1)
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("strategie", [bnb.STRATEGIE_PROFONDEUR, bnb.STRATEGIE_MEILLEUR])
+def test_table_transposition_meme_optimum(seed, strategie):
+    colis, capacites = instance(7, [20.0, 30.0, 35.0], seed=seed)
+    for c in colis[:3]:
+        c["poids"] = 5.0
+    solveur = bnb.KnapsackSolver(colis, camions(capacites), strategie=strategie, demarrage=False)
+    assert solveur.resoudre()["valeur"] == pytest.approx(force_brute(colis, capacites))
+
+
+def test_table_transposition_reduit_les_noeuds():
+    colis, capacites = instance(18, [40.0, 55.0, 70.0], seed=2)
+    for c in colis:
+        c["poids"] = float(round(c["poids"]))
+    sans = bnb.KnapsackSolver(colis, camions(capacites), table_max=0)
+    avec = bnb.KnapsackSolver(colis, camions(capacites))
+    assert avec.resoudre()["valeur"] == pytest.approx(sans.resoudre()["valeur"])
+    assert avec.noeuds_domines > 0
+    assert avec.noeuds_explores < sans.noeuds_explores
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_parallele_meme_optimum(seed):
+    colis, capacites = instance(12, [30.0, 45.0, 45.0], seed=seed)
+    attendu = resoudre(colis, capacites, bnb.MODE_FRACTIONNEL)["valeur"]
+    solution = bnb.resoudre_parallele(colis, camions(capacites), workers=2, demarrage=False)
+    assert solution["optimal"]
+    assert solution["valeur"] == pytest.approx(attendu)
+    poids = {c["id_colis"]: c["poids"] for c in colis}
+    for k, ids in solution["repartition"].items():
+        assert sum(poids[i] for i in ids) <= capacites[k]
+
+
+def test_parallele_budget_temps():
+    colis, capacites = instance(60, [200.0, 200.0, 150.0], seed=1)
+    solution = bnb.resoudre_parallele(colis, camions(capacites), workers=2, temps_max=0.5)
+    assert solution["arret"] == bnb.ARRET_TEMPS
+    assert solution["duree"] < 3.0
+    assert solution["borne"] >= solution["valeur"] > 0
+
+
+def test_incremental_garde_les_affectations_existantes():
+    colis, capacites = instance(12, [40.0, 60.0], seed=5)
+    actuelles = {0: 0, 1: 1, 2: 1}
+    solution = bnb.resoudre_incremental(colis, camions(capacites), actuelles)
+    for id_colis, id_camion in actuelles.items():
+        assert id_colis in solution["repartition"][id_camion]
+    inseres = [i for ids in solution["nouvelles_affectations"].values() for i in ids]
+    assert not set(inseres) & set(actuelles)
+    assert solution["colis_nouveaux"] == 9
+    poids = {c["id_colis"]: c["poids"] for c in colis}
+    for k, ids in solution["repartition"].items():
+        assert sum(poids[i] for i in ids) <= capacites[k] + 1e-9
+
+
+def test_incremental_ignore_camion_supprime():
+    colis, capacites = instance(4, [100.0], seed=0)
+    solution = bnb.resoudre_incremental(colis, camions(capacites), {0: 99})
+    assert 0 in solution["nouvelles_affectations"][0]
+
+
+def test_incremental_deplacements_bornes():
+    colis = [
+        {"id_colis": 1, "poids": 6.0, "priorite": 1.0},
+        {"id_colis": 2, "poids": 8.0, "priorite": 1.0},
+    ]
+    flotte = [{"id_camion": "A", "capacite": 8.0}, {"id_camion": "B", "capacite": 6.0}]
+    # Le colis 1 occupe le camion A : le colis 2 ne rentre que si 1 passe dans B
+    sans = bnb.resoudre_incremental(colis, flotte, {1: "A"})
+    assert sans["nouvelles_affectations"] == {"A": [], "B": []}
+    avec = bnb.resoudre_incremental(colis, flotte, {1: "A"}, deplacements_max=1)
+    assert avec["colis_deplaces"] == [1]
+    assert avec["nouvelles_affectations"] == {"A": [2], "B": [1]}
+
+
+def test_calculer_priorites_et_horizons():
+    from datetime import datetime, timedelta
+    maintenant = datetime(2026, 10, 18, 8, 0)
+    colis = [
+        {"id_colis": 1, "date_livraison": datetime(2026, 10, 18, 18, 0)},
+        {"id_colis": 2, "date_livraison": datetime(2026, 10, 19, 12, 0)},
+        {"id_colis": 3, "date_livraison": datetime(2026, 10, 25)},
+        {"id_colis": 4, "date_livraison": datetime(2026, 10, 17)},
+        {"id_colis": 5, "date_livraison": None},
+    ]
+    bnb.calculer_priorites(colis, maintenant)
+    assert [c["horizon"] for c in colis] == [
+        bnb.HORIZON_AUJOURDHUI, bnb.HORIZON_DEMAIN, bnb.HORIZON_PLUS_TARD,
+        bnb.HORIZON_AUJOURDHUI, bnb.HORIZON_PLUS_TARD,
+    ]
+    assert colis[0]["priorite"] == pytest.approx(1 / timedelta(hours=10).total_seconds())
+    assert colis[3]["priorite"] == bnb.PRIORITE_RETARD
+    assert 0 < colis[4]["priorite"] < colis[2]["priorite"]
+
+
+def test_horizon_sequentiel_urgent_d_abord():
+    colis = [
+        {"id_colis": 1, "poids": 8.0, "priorite": 0.1, "horizon": bnb.HORIZON_AUJOURDHUI},
+        {"id_colis": 2, "poids": 8.0, "priorite": 5.0, "horizon": bnb.HORIZON_PLUS_TARD},
+        {"id_colis": 3, "poids": 2.0, "priorite": 0.5, "horizon": bnb.HORIZON_DEMAIN},
+    ]
+    solution = bnb.resoudre_affectation(colis, camions([10.0]), horizon=True)
+    # Le colis du jour passe avant le colis plus tard, même moins prioritaire
+    assert sorted(solution["repartition"][0]) == [1, 3]
+    assert set(solution["horizons"]) == {"aujourdhui", "demain", "plus_tard"}
+
+
+def test_horizon_camions_partitionnes_en_parallele():
+    colis, _ = instance(10, [], seed=3)
+    for c in colis:
+        c["horizon"] = c["id_colis"] % 2
+    flotte = camions([40.0, 40.0])
+    solution = bnb.resoudre_par_horizon(colis, flotte, partition={0: [0], 1: [1]})
+    for k, ids in solution["repartition"].items():
+        assert all(i % 2 == k for i in ids)
+    attendu = sum(
+        bnb.resoudre_affectation([c for c in colis if c["horizon"] == h], camions([40.0]))["valeur"]
+        for h in (0, 1)
+    )
+    assert solution["valeur"] == pytest.approx(attendu)
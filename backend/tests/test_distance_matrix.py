@@ -0,0 +1,268 @@
+import numpy as np
+import pytest
+
+from services import distance_cache
+from services import distance_matrix as service
+from services.distance_cache import DistanceCache
+from services.simulated_annealing import calculate_distance_gps
+
+
+@pytest.fixture(autouse=True)
+def caches_vides(monkeypatch):
+    """Le cache partagé est global au processus : un cache neuf par test"""
+    monkeypatch.setattr(distance_cache, "_caches", {})
+
+
+def utiliser_osrm(monkeypatch, client, repli=False):
+    """Les matrices passent par OSRM (client donné) derrière le cache, avec ou sans repli"""
+    from services import distance_provider
+    fournisseur = distance_provider.CachedProvider(distance_provider.OSRMProvider(client))
+    if repli:
+        fournisseur = distance_provider.FallbackProvider(fournisseur)
+    monkeypatch.setattr(distance_provider, "_fournisseurs", {distance_provider.OSRM: fournisseur})
+    return fournisseur
+
+
+@pytest.fixture
+def osrm(serveur_osrm, monkeypatch):
+    """Le fournisseur OSRM du service pointe vers le faux serveur local"""
+    from services.osrm_client import OSRMClient
+    serveur = serveur_osrm()
+    utiliser_osrm(monkeypatch, OSRMClient(serveur.url))
+    return serveur
+
+
+def test_blob_aller_retour(app_base, charger_tournee):
+    from models import db
+    camion_id = charger_tournee(3)
+    distances = [[0, 1.5, 2], [1.5, 0, None], [2, 3, 0]]
+    service.enregistrer_matrice(camion_id, [0, 7, 9], distances)
+    db.session.commit()
+    points, matrice = service.get_matrix(camion_id)
+    assert points == [0, 7, 9]
+    assert matrice.dtype == np.float32 and matrice.shape == (3, 3)
+    assert matrice[0, 1] == pytest.approx(1.5)
+    assert np.isnan(matrice[1, 2])
+    assert not matrice.flags.writeable  # lecture sans copie du blob
+
+
+def test_repli_sur_l_ancienne_table(app_base, charger_tournee):
+    from models import db
+    from models.models import DistanceMatrix
+    camion_id = charger_tournee(2)
+    for i, a in enumerate([0, 1, 2]):
+        for j, b in enumerate([0, 1, 2]):
+            db.session.add(DistanceMatrix(id_camion=camion_id, id_from=a, id_to=b, distance=10 * i + j))
+    db.session.commit()
+    points, matrice = service.get_matrix(camion_id)
+    assert points == [0, 1, 2]
+    assert matrice[2, 1] == 21
+    assert service.get_matrix(99)[0] == []
+
+
+def test_compute_distance_matrix_ecrit_un_blob(app_base, charger_tournee, osrm):
+    from models import db
+    from models.models import DistanceMatrix, MatriceDistances
+    camion_id = charger_tournee(4)
+    db.session.add(DistanceMatrix(id_camion=camion_id, id_from=0, id_to=0, distance=0))
+    db.session.commit()
+    service.compute_distance_matrix(camion_id)
+    assert osrm.requetes == 1
+    points, matrice = service.get_matrix(camion_id)
+    assert len(points) == 5 and points[0] == 0
+    colis = service.Colis.query.order_by("id_colis").all()
+    attendu = calculate_distance_gps(colis[0].latitude, colis[0].longitude, colis[3].latitude, colis[3].longitude)
+    assert matrice[1, 4] == pytest.approx(attendu * 1000, rel=1e-5)
+    # Une seule ligne par camion, les cellules de l'ancienne table sont supprimées
+    assert db.session.query(MatriceDistances).count() == 1
+    assert db.session.query(DistanceMatrix).count() == 0
+
+
+def points_aleatoires(n, seed=0):
+    import random
+    r = random.Random(seed)
+    return [(r.uniform(33, 34), r.uniform(-8, -7)) for _ in range(n)]
+
+
+def calcul_compte(points, appels):
+    def calculer(sources, destinations):
+        appels.append((list(sources), list(destinations)))
+        return [[abs(points[i][0] - points[j][0]) for j in destinations] for i in sources]
+    return calculer
+
+
+def test_cache_ne_demande_que_les_paires_manquantes(app_base):
+    points = points_aleatoires(6)
+    cache = DistanceCache("test")
+    appels = []
+    premiere = cache.matrice(points[:5], calcul_compte(points, appels))
+    assert appels == [([0, 1, 2, 3, 4], [0, 1, 2, 3, 4])]
+    # Même matrice : aucun appel
+    assert np.array_equal(cache.matrice(points[:5], calcul_compte(points, appels)), premiere)
+    assert len(appels) == 1
+    # Un point de plus : seules sa ligne et sa colonne sont demandées
+    appels.clear()
+    matrice = cache.matrice(points, calcul_compte(points, appels))
+    assert appels == [([5], [0, 1, 2, 3, 4, 5]), ([0, 1, 2, 3, 4], [5])]
+    assert cache.paires_calculees == 20 + 10
+    assert matrice[5, 2] == pytest.approx(abs(points[5][0] - points[2][0]))
+
+
+def test_cache_persistant_entre_instances(app_base):
+    from models import db
+    points = points_aleatoires(4, seed=1)
+    DistanceCache("test").matrice(points, calcul_compte(points, []))
+    db.session.commit()
+    appels = []
+    matrice = DistanceCache("test").matrice(points, calcul_compte(points, appels))
+    assert appels == []
+    assert matrice[0, 3] == pytest.approx(abs(points[0][0] - points[3][0]))
+    # Une autre source ne partage pas les distances
+    DistanceCache("autre").matrice(points, calcul_compte(points, appels))
+    assert len(appels) == 1
+
+
+def test_decouper_manquantes():
+    from services.distance_cache import decouper_manquantes
+    # Paires isolées, sans point nouveau : un seul bloc
+    assert decouper_manquantes([(0, 1), (2, 1)], 3) == [([0, 2], [1])]
+    # Point 3 nouveau et paire isolée (0, 1)
+    manquantes = [(3, j) for j in range(3)] + [(i, 3) for i in range(3)] + [(0, 1)]
+    assert decouper_manquantes(manquantes, 4) == [([3], [0, 1, 2, 3]), ([0, 1, 2], [3]), ([0], [1])]
+
+
+def test_cache_lru_borne(app_base):
+    points = points_aleatoires(5, seed=2)
+    cache = DistanceCache("test", taille_max=8, persistant=False)
+    cache.matrice(points, calcul_compte(points, []))
+    assert len(cache.lru) == 8
+
+
+def test_recalcul_sans_appel_osrm(app_base, charger_tournee, osrm):
+    camion_id = charger_tournee(6)
+    autre = charger_tournee(0, camion_id=2)
+    from models import db
+    from models.models import Assignment, Colis
+    # Le camion 2 reçoit les mêmes colis que le camion 1 : jambes déjà connues
+    for colis in Colis.query.all():
+        db.session.add(Assignment(id_camion=autre, id_colis=colis.id_colis))
+    db.session.commit()
+    service.compute_distance_matrix(camion_id)
+    service.compute_distance_matrix(camion_id)
+    service.compute_distance_matrix(autre)
+    assert osrm.requetes == 1
+    assert np.array_equal(service.get_matrix(camion_id)[1], service.get_matrix(autre)[1])
+
+
+def test_osrm_en_panne(app_base, charger_tournee, serveur_osrm, monkeypatch):
+    from services.osrm_client import OSRMClient
+    serveur = serveur_osrm(echecs=10)
+    utiliser_osrm(monkeypatch, OSRMClient(serveur.url, tentatives=2, delai_initial=0))
+    camion_id = charger_tournee(3)
+    service.compute_distance_matrix(camion_id)
+    assert serveur.requetes == 2
+    assert service.get_matrix(camion_id)[0] == []
+
+
+def test_osrm_en_panne_repli_haversine(app_base, charger_tournee, serveur_osrm, monkeypatch):
+    from services.osrm_client import OSRMClient
+    serveur = serveur_osrm(echecs=10)
+    fournisseur = utiliser_osrm(monkeypatch, OSRMClient(serveur.url, tentatives=1), repli=True)
+    camion_id = charger_tournee(3)
+    service.compute_distance_matrix(camion_id)
+    assert fournisseur.replis == 1
+    colis = service.Colis.query.order_by("id_colis").first()
+    attendu = calculate_distance_gps(48.85, 2.35, colis.latitude, colis.longitude)
+    assert service.get_matrix(camion_id)[1][0, 1] == pytest.approx(attendu * 1000, rel=1e-5)
+
+
+def charger_flotte(charger_tournee, camions, colis_par_camion):
+    for k in range(camions):
+        charger_tournee(colis_par_camion, seed=k, camion_id=k + 1)
+
+
+def test_compute_all_matrices(app_base, charger_tournee, osrm):
+    from models import db
+    from models.models import MatriceDistances
+    charger_flotte(charger_tournee, 4, 5)
+    assert sorted(service.compute_all_matrices(workers=3)) == [1, 2, 3, 4]
+    assert db.session.query(MatriceDistances).count() == 4
+    colis = service.Colis.query.order_by("id_colis").all()
+    points, matrice = service.get_matrix(3)
+    assert points == [0] + [c.id_colis for c in colis[10:15]]
+    attendu = calculate_distance_gps(48.85, 2.35, colis[12].latitude, colis[12].longitude)
+    assert matrice[0, 3] == pytest.approx(attendu * 1000, rel=1e-5)
+    # Une matrice par camion, un seul appel OSRM chacun ; ensuite tout vient du cache
+    assert osrm.requetes == 4
+    service.compute_all_matrices()
+    assert osrm.requetes == 4
+
+
+def test_compute_all_matrices_en_parallele(app_base, charger_tournee, serveur_osrm, monkeypatch):
+    import time
+    from services.osrm_client import OSRMClient
+    serveur = serveur_osrm(latence=0.3)
+    utiliser_osrm(monkeypatch, OSRMClient(serveur.url))
+    charger_flotte(charger_tournee, 6, 3)
+    debut = time.perf_counter()
+    assert len(service.compute_all_matrices(workers=6)) == 6
+    # En série : 6 × 0,3 s
+    assert time.perf_counter() - debut < 1.2
+
+
+def test_compute_all_matrices_echec_partiel(app_base, charger_tournee, serveur_osrm, monkeypatch):
+    # Le premier camion demandé échoue, les autres sont tout de même enregistrés
+    from services.osrm_client import OSRMClient
+    serveur = serveur_osrm(echecs=1)
+    utiliser_osrm(monkeypatch, OSRMClient(serveur.url, tentatives=1))
+    charger_flotte(charger_tournee, 3, 4)
+    assert len(service.compute_all_matrices(workers=1)) == 2
+
+
+def test_cache_sans_doublons(app_base):
+    # Deux calculs concurrents écrivent la même paire : une seule ligne reste
+    from models import db
+    from models.models import CacheDistance
+    from services.distance_cache import inserer_sans_doublons
+    ligne = {"source": "test", "depart": "33.00000,-7.00000", "arrivee": "33.10000,-7.00000", "distance": 11.1}
+    inserer_sans_doublons([ligne])
+    inserer_sans_doublons([ligne, dict(ligne, arrivee="33.20000,-7.00000")])
+    db.session.commit()
+    assert db.session.query(CacheDistance).count() == 2
+
+
+def test_cache_publie_au_commit(app_base):
+    from models import db
+    points = points_aleatoires(3, seed=4)
+    cache = DistanceCache("test")
+    cache.matrice(points, calcul_compte(points, []))
+    # Pas encore en mémoire : un rollback ne doit rien laisser dans le LRU
+    assert len(cache.lru) == 0
+    db.session.rollback()
+    appels = []
+    cache.matrice(points, calcul_compte(points, appels))
+    assert len(appels) == 1
+    db.session.commit()
+    assert len(cache.lru) == 6
+
+
+def test_cache_pour_un_seul_cache_par_source():
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=8) as executeur:
+        caches = list(executeur.map(distance_cache.cache_pour, ["osrm_km"] * 32))
+    assert all(cache is caches[0] for cache in caches)
+
+
+def test_lru_partage_entre_threads():
+    from concurrent.futures import ThreadPoolExecutor
+    points = points_aleatoires(12, seed=5)
+    cache = DistanceCache("test", taille_max=40, persistant=False)
+
+    def calcul(k):
+        sous_ensemble = [points[(k + d) % 12] for d in range(6)]
+        for _ in range(20):
+            cache.matrice(sous_ensemble, calcul_compte(sous_ensemble, []))
+
+    with ThreadPoolExecutor(max_workers=6) as executeur:
+        list(executeur.map(calcul, range(12)))
+    assert len(cache.lru) == 40
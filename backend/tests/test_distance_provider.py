@@ -0,0 +1,130 @@
+import random
+
+import numpy as np
+import pytest
+
+from config import Config
+from services import distance_cache, distance_provider
+from services.distance_provider import (
+    CachedProvider, DistanceIndisponible, DistanceProvider, FallbackProvider, HaversineProvider, OSRMProvider,
+    fournisseur_distances,
+)
+from services.osrm_client import OSRMClient
+from services.simulated_annealing import calculate_distance_gps
+
+
+@pytest.fixture(autouse=True)
+def fournisseurs_neufs(monkeypatch):
+    monkeypatch.setattr(distance_cache, "_caches", {})
+    monkeypatch.setattr(distance_provider, "_fournisseurs", {})
+
+
+def points_aleatoires(n, seed=0):
+    r = random.Random(seed)
+    return [(r.uniform(33, 34), r.uniform(-8, -7)) for _ in range(n)]
+
+
+class Fixe(DistanceProvider):
+    """Renvoie toujours la même matrice (ou échoue si elle vaut None)"""
+    nom = "fixe"
+
+    def __init__(self, matrice):
+        self.valeur = matrice
+
+    def matrice(self, points):
+        if self.valeur is None:
+            raise DistanceIndisponible("hors service")
+        return np.array(self.valeur, dtype=np.float64)
+
+
+def test_haversine():
+    points = points_aleatoires(6)
+    fournisseur = HaversineProvider()
+    matrice = fournisseur.matrice(points)
+    assert matrice[1, 4] == pytest.approx(calculate_distance_gps(*points[1], *points[4]))
+    assert np.allclose(fournisseur.bloc(points, [4, 0], [2, 3, 5]), matrice[np.ix_([4, 0], [2, 3, 5])])
+
+
+def test_osrm_en_km(serveur_osrm):
+    serveur = serveur_osrm()
+    points = points_aleatoires(5)
+    matrice = OSRMProvider(OSRMClient(serveur.url)).matrice(points)
+    assert np.allclose(matrice, HaversineProvider().matrice(points))
+
+
+def test_osrm_indisponible(serveur_osrm):
+    serveur = serveur_osrm(echecs=5)
+    fournisseur = OSRMProvider(OSRMClient(serveur.url, tentatives=1))
+    with pytest.raises(DistanceIndisponible):
+        fournisseur.matrice(points_aleatoires(3))
+    assert fournisseur.matrices([points_aleatoires(3), points_aleatoires(4)], workers=2) == [None, None]
+
+
+def test_cache_evite_les_appels(app_base, serveur_osrm):
+    serveur = serveur_osrm()
+    points = points_aleatoires(6)
+    fournisseur = CachedProvider(OSRMProvider(OSRMClient(serveur.url)))
+    premiere = fournisseur.matrice(points[:5])
+    assert np.allclose(fournisseur.matrice(points[:5]), premiere)
+    assert serveur.requetes == 1
+    matrices = fournisseur.matrices([points, points[:3]], workers=2)
+    # Seules la ligne et la colonne du sixième point sont demandées
+    assert serveur.requetes == 3
+    assert np.allclose(matrices[0], HaversineProvider().matrice(points))
+
+
+def test_repli_sur_haversine():
+    points = points_aleatoires(3)
+    fournisseur = FallbackProvider(Fixe(None))
+    assert np.allclose(fournisseur.matrice(points), HaversineProvider().matrice(points))
+    # Paires sans route : complétées par le secours, le reste est conservé
+    fournisseur = FallbackProvider(Fixe([[0, np.nan, 7], [5, 0, 7], [7, 7, 0]]))
+    matrice = fournisseur.matrice(points)
+    assert matrice[0, 1] == pytest.approx(calculate_distance_gps(*points[0], *points[1]))
+    assert matrice[1, 0] == 5
+    assert fournisseur.replis == 1
+
+
+def test_fournisseur_selon_la_configuration(monkeypatch):
+    monkeypatch.setattr(Config, "DISTANCE_PROVIDER", "osrm")
+    fournisseur = fournisseur_distances()
+    assert isinstance(fournisseur, FallbackProvider) and isinstance(fournisseur.principal, CachedProvider)
+    assert fournisseur.nom == "osrm" and fournisseur_distances("osrm") is fournisseur
+    assert isinstance(fournisseur_distances("haversine"), HaversineProvider)
+    monkeypatch.setattr(distance_provider, "_fournisseurs", {})
+    monkeypatch.setattr(Config, "DISTANCE_CACHE", False)
+    monkeypatch.setattr(Config, "DISTANCE_REPLI", False)
+    assert isinstance(fournisseur_distances(), OSRMProvider)
+    with pytest.raises(ValueError):
+        fournisseur_distances("google")
+
+
+def test_reponse_osrm_malformee(monkeypatch):
+    client = OSRMClient("http://127.0.0.1:9", tentatives=1)
+
+    class Reponse:
+        status_code = 200
+
+        def json(self):
+            raise ValueError("Expecting value")
+
+    monkeypatch.setattr(client.session, "get", lambda *a, **k: Reponse())
+    with pytest.raises(DistanceIndisponible):
+        OSRMProvider(client).matrice(points_aleatoires(2))
+
+
+def test_cache_en_km_distinct_des_metres(app_base, serveur_osrm):
+    # Des lignes en mètres sous l'ancienne source "osrm" ne sont jamais relues
+    from models import db
+    from models.models import CacheDistance
+    from services.distance_cache import cle_point
+    serveur = serveur_osrm()
+    points = points_aleatoires(2)
+    a, b = (cle_point(*p) for p in points)
+    db.session.add(CacheDistance(source="osrm", depart=a, arrivee=b, distance=123456.0))
+    db.session.commit()
+    matrice = CachedProvider(OSRMProvider(OSRMClient(serveur.url))).matrice(points)
+    assert serveur.requetes == 1
+    assert matrice[0, 1] == pytest.approx(calculate_distance_gps(*points[0], *points[1]))
+    db.session.commit()
+    assert {l.source for l in CacheDistance.query} == {"osrm", "osrm_km"}
@@ -0,0 +1,47 @@
+import pytest
+
+import services.bnb_knapsack as bnb
+from services import dp_knapsack as dp
+from test_bnb_knapsack import camions, force_brute, instance
+
+
+def test_discretiser_arrondit_du_bon_cote():
+    poids_int, capacites_int = dp.discretiser([0.3, 1.25], [10.0, 2.99])
+    assert poids_int == [3, 13]
+    assert capacites_int == [100, 29]
+
+
+def test_table_sac_a_dos_reutilisable_pour_plusieurs_capacites():
+    poids_int = [3, 4, 5]
+    valeurs = [3.0, 4.0, 5.5]
+    table = dp.TableSacADos(range(3), poids_int, valeurs, 9)
+    assert sorted(table.choisir(9)) == [1, 2]
+    assert table.choisir(5) == [2]
+    assert table.valeur[7] == pytest.approx(7.0)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_un_camion_optimal(seed):
+    colis, capacites = instance(9, [40.0], seed=seed)
+    solution = dp.resoudre_dp(colis, camions(capacites))
+    assert solution["valeur"] == pytest.approx(force_brute(colis, capacites))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_plusieurs_camions_realisable(seed):
+    colis, capacites = instance(300, [150.0, 200.0, 250.0], seed=seed)
+    solution = dp.resoudre_dp(colis, camions(capacites))
+    poids = {c["id_colis"]: c["poids"] for c in colis}
+    for k, ids in solution["repartition"].items():
+        assert sum(poids[i] for i in ids) <= capacites[k] + 1e-9
+    assert solution["borne"] >= solution["valeur"]
+    assert solution["gap"] < 0.02
+
+
+def test_route_moteur(client, monkeypatch):
+    import routes.routes_bnb as routes_bnb
+    appels = []
+    monkeypatch.setattr(routes_bnb, "executer_bnb", lambda **kw: appels.append(kw) or {})
+    client.get("/api/solution/sac_a_dos?engine=dp")
+    assert appels[0]["moteur"] == bnb.MOTEUR_DP
+    assert client.get("/api/solution/sac_a_dos?engine=glouton").status_code == 400
@@ -0,0 +1,39 @@
+import pytest
+
+from services import heuristiques_knapsack as h
+from test_bnb_knapsack import instance
+
+
+def verifier(poids, capacites, affectation):
+    charge = [0.0] * len(capacites)
+    for i, k in enumerate(affectation):
+        if k >= 0:
+            charge[k] += poids[i]
+    assert all(charge[k] <= capacites[k] + 1e-9 for k in range(len(capacites)))
+
+
+def test_glouton_best_fit_choisit_le_camion_le_plus_plein():
+    affectation, restantes = h.glouton_best_fit([4.0], [1.0], [10.0, 5.0])
+    assert affectation == [1]
+    assert restantes == [10.0, 1.0]
+
+
+def test_recherche_locale_deplace_pour_faire_place():
+    # Le colis 0 (6) occupe le camion de 8 ; le colis 1 (8) ne rentre nulle part
+    poids = [6.0, 8.0]
+    valeurs = [6.0, 5.0]
+    affectation, restantes = h.recherche_locale(poids, valeurs, [0, -1], [2.0, 6.0])
+    assert -1 not in affectation
+    verifier(poids, [8.0, 6.0], affectation)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_demarrage_realisable(seed):
+    colis, capacites = instance(40, [30.0, 45.0, 45.0], seed=seed)
+    poids = [c["poids"] for c in colis]
+    valeurs = [c["priorite"] for c in colis]
+    affectation, valeur = h.demarrage(poids, valeurs, capacites)
+    verifier(poids, capacites, affectation)
+    assert valeur == pytest.approx(h.valeur_affectation(valeurs, affectation))
+    glouton, _ = h.glouton_best_fit(poids, valeurs, capacites)
+    assert valeur >= h.valeur_affectation(valeurs, glouton)
@@ -0,0 +1,89 @@
+import random
+
+import numpy as np
+import pytest
+
+from services.osrm_client import OSRMClient, OSRMErreur
+from services.simulated_annealing import calculate_distance_matrix_gps
+
+
+def points_aleatoires(n, seed=0):
+    r = random.Random(seed)
+    return [(r.uniform(33, 34), r.uniform(-8, -7)) for _ in range(n)]
+
+
+def haversine_metres(points):
+    latitudes, longitudes = zip(*points)
+    return calculate_distance_matrix_gps(latitudes, longitudes) * 1000
+
+
+def test_tuiles_reassemblees(serveur_osrm):
+    serveur = serveur_osrm(taille_max=4)
+    points = points_aleatoires(10)
+    client = OSRMClient(serveur.url, taille_tuile=4)
+    matrice = client.table(points)
+    # 3 × 3 tuiles de 4 au plus, aucune refusée par le serveur
+    assert serveur.requetes == 9
+    assert np.allclose(matrice, haversine_metres(points), rtol=1e-9)
+
+
+def test_sous_matrice(serveur_osrm):
+    serveur = serveur_osrm()
+    points = points_aleatoires(6, seed=1)
+    matrice = OSRMClient(serveur.url, taille_tuile=2).table(points, [5, 1], [0, 3, 4])
+    assert matrice.shape == (2, 3)
+    assert np.allclose(matrice, haversine_metres(points)[[5, 1]][:, [0, 3, 4]])
+
+
+def test_nouvelles_tentatives(serveur_osrm):
+    serveur = serveur_osrm(echecs=2)
+    client = OSRMClient(serveur.url, tentatives=3, delai_initial=0)
+    assert client.table(points_aleatoires(3)).shape == (3, 3)
+    assert serveur.requetes == 3
+
+
+def test_echec_apres_toutes_les_tentatives(serveur_osrm):
+    serveur = serveur_osrm(echecs=5)
+    with pytest.raises(OSRMErreur, match="503"):
+        OSRMClient(serveur.url, tentatives=3, delai_initial=0).table(points_aleatoires(3))
+    assert serveur.requetes == 3
+
+
+def test_table_trop_grande(serveur_osrm):
+    # Erreur du client (400) : pas de nouvelle tentative
+    serveur = serveur_osrm(taille_max=3)
+    with pytest.raises(OSRMErreur, match="TooBig"):
+        OSRMClient(serveur.url, taille_tuile=5).table(points_aleatoires(5))
+    assert serveur.requetes == 1
+
+
+def test_serveur_injoignable():
+    client = OSRMClient("http://127.0.0.1:9", tentatives=2, delai_initial=0, timeout=1)
+    with pytest.raises(OSRMErreur, match="injoignable"):
+        client.table(points_aleatoires(2))
+
+
+class ReponseBrute:
+    status_code = 200
+
+    def __init__(self, json):
+        self._json = json
+
+    def json(self):
+        if isinstance(self._json, Exception):
+            raise self._json
+        return self._json
+
+
+@pytest.mark.parametrize("corps", [
+    ValueError("Expecting value"),        # corps non JSON (page HTML d'un proxy...)
+    ["Ok"],                               # JSON d'une autre forme
+    {"code": "Ok"},                       # pas de distances
+    {"code": "Ok", "distances": [[0]]},   # mauvaise taille
+    {"code": "Ok", "distances": [["a", 1], [1, 0]]},
+])
+def test_reponse_200_invalide(monkeypatch, corps):
+    client = OSRMClient("http://127.0.0.1:9", tentatives=1)
+    monkeypatch.setattr(client.session, "get", lambda *a, **k: ReponseBrute(corps))
+    with pytest.raises(OSRMErreur):
+        client.table(points_aleatoires(2))
@@ -0,0 +1,317 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from services.simulated_annealing import (
+    SimulatedAnnealing, calculate_distance_gps, calculate_distance_matrix_gps
+)
+
+
+def matrice_aleatoire(n, seed=0):
+    r = random.Random(seed)
+    points = [(r.uniform(0, 100), r.uniform(0, 100)) for _ in range(n)]
+    return [[math.dist(a, b) for b in points] for a in points]
+
+
+@pytest.mark.parametrize("n", [2, 3, 4, 7, 20])
+def test_delta_swap_egal_au_recalcul(n):
+    sa = SimulatedAnnealing(matrice_aleatoire(n, seed=n))
+    route = list(range(n))
+    random.Random(1).shuffle(route)
+    for i in range(n):
+        for j in range(n):
+            avant = sa.calculate_distance(route)
+            delta = sa.delta_swap(route, i, j)
+            copie = route.copy()
+            sa.appliquer_swap(copie, i, j)
+            assert delta == pytest.approx(sa.calculate_distance(copie) - avant)
+            assert sa.calculate_distance(route) == pytest.approx(avant)
+
+
+def test_solve_distance_coherente():
+    matrice = matrice_aleatoire(30)
+    sa = SimulatedAnnealing(matrice)
+    route, distance = sa.solve(list(range(30)))
+    assert sorted(route) == list(range(30))
+    assert distance == pytest.approx(sa.calculate_distance(route))
+
+
+def verifier_mouvements(sa, route, proposer, essais=300):
+    pos = sa._positions(route)
+    for _ in range(essais):
+        proposition = proposer(route, pos)
+        if proposition is None:
+            continue
+        delta, mouvement = proposition
+        avant = sa.calculate_distance(route)
+        sa._appliquer(route, pos, mouvement)
+        assert sa.calculate_distance(route) - avant == pytest.approx(delta)
+        assert sorted(route) == list(range(len(route)))
+        assert all(pos[v] == p for p, v in enumerate(route))
+
+
+@pytest.mark.parametrize("n", [5, 6, 12, 40])
+def test_delta_2opt_et_or_opt_egaux_au_recalcul(n):
+    random.seed(n)
+    sa = SimulatedAnnealing(matrice_aleatoire(n, seed=n), k_voisins=4)
+    route = list(range(n))
+    random.shuffle(route)
+    verifier_mouvements(sa, route, sa._proposer_2opt)
+    for longueur in (1, 2, 3):
+        verifier_mouvements(sa, route, lambda r, p: sa._proposer_or_opt(r, p, longueur))
+
+
+def test_matrice_asymetrique_sans_2opt():
+    matrice = matrice_aleatoire(15)
+    matrice[0][1] += 5
+    sa = SimulatedAnnealing(matrice)
+    assert not sa.symetrique
+    assert "2opt" not in sa.voisinages
+    random.seed(3)
+    route = list(range(15))
+    verifier_mouvements(sa, route, lambda r, p: sa._proposer_or_opt(r, p, 3))
+
+
+def test_voisinage_inconnu():
+    with pytest.raises(ValueError):
+        SimulatedAnnealing(matrice_aleatoire(5), voisinages=("3opt",))
+
+
+def test_polissage_donne_un_optimum_2opt():
+    n = 25
+    sa = SimulatedAnnealing(matrice_aleatoire(n, seed=7), k_voisins=n - 1)
+    route = list(range(n))
+    random.Random(2).shuffle(route)
+    sa.polir_2opt(route)
+    d = sa.distance_matrix
+    for i in range(n):
+        for j in range(i + 2, n):
+            a, b, c, e = route[i], route[i + 1], route[j], route[(j + 1) % n]
+            assert d[a][c] + d[b][e] - d[a][b] - d[c][e] >= -1e-9
+
+
+def test_voisinages_meilleurs_que_swap():
+    matrice = matrice_aleatoire(80, seed=11)
+    _, swap = SimulatedAnnealing(matrice, voisinages=("swap",), polissage=False, seed=0).solve(list(range(80)))
+    _, voisinages = SimulatedAnnealing(matrice, seed=0).solve(list(range(80)))
+    assert voisinages < swap
+
+
+def test_planning_iterations_par_palier():
+    matrice = matrice_aleatoire(20)
+    sa = SimulatedAnnealing(matrice, initial_temp=10, cooling_rate=0.5, min_temp=1, facteur_iterations=3)
+    sa.solve(list(range(20)))
+    # 4 paliers (10, 5, 2.5, 1.25) de 3 * 20 itérations
+    assert sa.statistiques["iterations"] == 4 * 60
+    assert sa.statistiques["arret"] == "temperature"
+
+
+def test_planning_echeance():
+    matrice = matrice_aleatoire(60)
+    sa = SimulatedAnnealing(matrice, cooling_rate=0.99999, min_temp=1e-9, facteur_iterations=50, temps_max=0.2)
+    route, distance = sa.solve(list(range(60)))
+    assert sa.statistiques["arret"] == "temps"
+    assert sa.statistiques["duree"] < 1.0
+    assert distance == pytest.approx(sa.calculate_distance(route))
+
+
+def test_calibration_temperature():
+    matrice = matrice_aleatoire(40)
+    sa = SimulatedAnnealing(matrice, initial_temp="auto", min_temp="auto", facteur_iterations=5, seed=5)
+    sa.solve(list(range(40)))
+    t0 = sa.statistiques["temperature_initiale"]
+    # Les distances sont de l'ordre de quelques dizaines : T0 du même ordre
+    assert 1 < t0 < 1000
+
+
+def test_matrice_gps_egale_a_la_haversine_scalaire():
+    r = random.Random(4)
+    lat = [r.uniform(30, 36) for _ in range(25)]
+    lon = [r.uniform(-10, -2) for _ in range(25)]
+    matrice = calculate_distance_matrix_gps(lat, lon)
+    assert matrice.shape == (25, 25) and matrice.dtype == np.float64
+    assert np.array_equal(matrice, matrice.T)
+    assert np.all(np.diag(matrice) == 0)
+    for i in range(25):
+        for j in range(25):
+            assert matrice[i, j] == pytest.approx(calculate_distance_gps(lat[i], lon[i], lat[j], lon[j]))
+    assert calculate_distance_matrix_gps(lat, lon, dtype=np.float32).dtype == np.float32
+    assert calculate_distance_matrix_gps([], []).shape == (0, 0)
+
+
+def test_recuit_accepte_un_ndarray():
+    r = random.Random(8)
+    matrice = calculate_distance_matrix_gps([r.uniform(33, 34) for _ in range(30)],
+                                            [r.uniform(-8, -7) for _ in range(30)])
+    sa = SimulatedAnnealing(matrice, facteur_iterations=5)
+    assert sa.symetrique
+    route, distance = sa.solve(list(range(30)))
+    assert sorted(route) == list(range(30))
+    assert isinstance(distance, float)
+    assert distance == pytest.approx(sa.calculate_distance(route))
+
+
+def test_meme_graine_meme_route():
+    matrice = matrice_aleatoire(40, seed=3)
+    routes = {tuple(SimulatedAnnealing(matrice, facteur_iterations=5, seed=7).solve(list(range(40)))[0])
+              for _ in range(3)}
+    assert len(routes) == 1
+
+
+def test_rejouer_un_arret_sur_echeance():
+    from services.simulated_annealing import rejouer, solve_multi_depart
+    matrice = matrice_aleatoire(50, seed=9)
+    route, distance, parametres = solve_multi_depart(
+        matrice, list(range(50)), departs=3, workers=1, seed=1,
+        cooling_rate=0.9999, min_temp=1e-9, facteur_iterations=20, temps_max=0.05)
+    assert parametres["arret"] == "temps"
+    assert distance == min(parametres["distances"])
+    assert rejouer(matrice, list(range(50)), parametres)[0] == route
+
+
+def test_multi_depart_en_processus():
+    from services.simulated_annealing import solve_multi_depart
+    matrice = matrice_aleatoire(25, seed=2)
+    sequentiel = solve_multi_depart(matrice, list(range(25)), departs=2, workers=1, seed=3, facteur_iterations=2)
+    parallele = solve_multi_depart(matrice, list(range(25)), departs=2, workers=2, seed=3, facteur_iterations=2)
+    assert parallele[0] == sequentiel[0]
+    assert parallele[2]["seeds"] == sequentiel[2]["seeds"]
+
+
+def test_solve_flotte_en_processus():
+    from services.simulated_annealing import solve_flotte
+    r = random.Random(6)
+    problemes = {k: ([r.uniform(33, 34) for _ in range(9)], [r.uniform(-8, -7) for _ in range(9)], k)
+                 for k in (1, 2, 3)}
+    sequentiel = solve_flotte(problemes, workers=1, facteur_iterations=2)
+    parallele = solve_flotte(problemes, workers=2, facteur_iterations=2)
+    assert set(parallele) == {1, 2, 3}
+    assert all(parallele[k][0] == sequentiel[k][0] for k in problemes)
+
+
+def test_indices_hilbert_ordre_1_et_2():
+    from services.simulated_annealing import indices_hilbert
+    assert indices_hilbert([0, 0, 1, 1], [0, 1, 1, 0], ordre=1).tolist() == [0, 1, 2, 3]
+    # Ordre 2 : chaque case de la grille 4×4 a un indice distinct, et deux
+    # indices consécutifs sont des cases voisines
+    xs, ys = zip(*[(x, y) for x in range(4) for y in range(4)])
+    d = indices_hilbert(xs, ys, ordre=2)
+    assert sorted(d.tolist()) == list(range(16))
+    cases = {int(v): (x, y) for v, x, y in zip(d, xs, ys)}
+    for v in range(15):
+        (x1, y1), (x2, y2) = cases[v], cases[v + 1]
+        assert abs(x1 - x2) + abs(y1 - y2) == 1
+
+
+def test_plus_proche_voisin_egal_a_la_recherche_exhaustive():
+    n = 60
+    matrice = matrice_aleatoire(n, seed=12)
+    sa = SimulatedAnnealing(matrice, k_voisins=3, seed=1)
+    route = sa.nearest_neighbor_initial(list(range(n)))
+    for a, b in zip(route, route[1:]):
+        restants = set(range(n)) - set(route[:route.index(b)])
+        assert b == min(restants, key=lambda c: matrice[a][c])
+
+
+@pytest.mark.parametrize("construction", ["aleatoire", "plus_proche_voisin", "glouton_aretes", "hilbert"])
+def test_constructions_donnent_une_permutation(construction):
+    r = random.Random(3)
+    points = [(r.uniform(33, 34), r.uniform(-8, -7)) for _ in range(50)]
+    matrice = calculate_distance_matrix_gps(*zip(*points))
+    sa = SimulatedAnnealing(matrice, construction=construction, coordonnees=points, seed=2)
+    villes = list(range(0, 50, 2))
+    route = sa.construire(villes)
+    assert sorted(route) == villes
+
+
+def test_constructions_meilleures_que_le_hasard():
+    r = random.Random(4)
+    points = [(r.uniform(33, 34), r.uniform(-8, -7)) for _ in range(300)]
+    matrice = calculate_distance_matrix_gps(*zip(*points))
+    villes = list(range(300))
+    longueurs = {}
+    for construction in ("aleatoire", "plus_proche_voisin", "glouton_aretes", "hilbert"):
+        sa = SimulatedAnnealing(matrice, construction=construction, coordonnees=points, seed=0)
+        longueurs[construction] = sa.calculate_distance(sa.construire(villes))
+    assert max(longueurs["plus_proche_voisin"], longueurs["glouton_aretes"],
+               longueurs["hilbert"]) < longueurs["aleatoire"] / 3
+
+
+def test_hilbert_exige_les_coordonnees():
+    with pytest.raises(ValueError):
+        SimulatedAnnealing(matrice_aleatoire(5), construction="hilbert")
+    with pytest.raises(ValueError):
+        SimulatedAnnealing(matrice_aleatoire(5), construction="christofides")
+
+
+def marge_exacte(sa, route):
+    """Marge minimale recalculée en simulant la tournée"""
+    heures, _ = sa.planning(route)
+    return min(sa.echeances[v] - h for v, h in zip(route, heures))
+
+
+def instance_depot(n, seed):
+    r = random.Random(seed)
+    matrice = matrice_aleatoire(n, seed=seed)
+    echeances = [None] + [r.choice([None, r.uniform(0.5, 6)]) for _ in range(n - 1)]
+    return matrice, echeances
+
+
+def test_table_min():
+    from services.simulated_annealing import TableMin
+    r = random.Random(1)
+    valeurs = [r.uniform(-5, 5) for _ in range(37)]
+    table = TableMin(valeurs)
+    for a in range(37):
+        for b in range(a, 37):
+            assert table.minimum(a, b) == min(valeurs[a:b + 1])
+
+
+@pytest.mark.parametrize("n", [5, 9, 30])
+def test_marge_en_o1_egale_a_la_simulation(n):
+    from services.simulated_annealing import SimulatedAnnealingDepot
+    matrice, echeances = instance_depot(n, seed=n)
+    sa = SimulatedAnnealingDepot(matrice, echeances, vitesse=40, service=0.1, voisinages=("swap",), seed=n)
+    route = [0] + sa.rng.sample(range(1, n), n - 1)
+    pos = sa._positions(route)
+    sa._preparer(route)
+    generateurs = [sa._proposer_swap, sa._proposer_2opt] + [
+        (lambda r, p, l=l: sa._proposer_or_opt(r, p, l)) for l in (1, 2, 3)]
+    for _ in range(400):
+        proposition = sa.rng.choice(generateurs)(route, pos)
+        if proposition is None:
+            continue
+        morceaux = sa._morceaux(route, pos, proposition[1])
+        if morceaux is None:
+            continue
+        marge = sa._marge(route, morceaux)
+        sa._appliquer(route, pos, proposition[1])
+        assert route[0] == 0
+        assert marge == pytest.approx(marge_exacte(sa, route))
+
+
+def test_recuit_depot_sans_retard():
+    from services.simulated_annealing import SimulatedAnnealingDepot
+    n = 25
+    matrice = matrice_aleatoire(n, seed=5)
+    # Échéances larges mais ordonnées : l'ordre des échéances est réalisable
+    echeances = [None] + [0.5 * k for k in range(1, n)]
+    sa = SimulatedAnnealingDepot(matrice, echeances, vitesse=1000, service=0.05,
+                                 facteur_iterations=10, seed=1)
+    route, distance = sa.solve(list(range(n)))
+    assert route[0] == 0 and sorted(route) == list(range(n))
+    assert marge_exacte(sa, route) >= -1e-9
+    assert distance == pytest.approx(sa.calculate_distance(route))
+
+
+def test_recuit_depot_reduit_le_retard():
+    from services.simulated_annealing import SimulatedAnnealingDepot
+    n = 20
+    matrice, echeances = instance_depot(n, seed=8)
+    sa = SimulatedAnnealingDepot(matrice, echeances, vitesse=30, facteur_iterations=10, seed=2)
+    depart = sa.construire(list(range(n)))
+    route, _ = sa.solve(list(range(n)))
+    assert route[0] == 0
+    assert marge_exacte(sa, route) >= min(0.0, marge_exacte(sa, depart)) - 1e-9
@@ -0,0 +1,204 @@
+import pytest
+
+
+@pytest.fixture
+def client_tournee(app_tournee):
+    return app_tournee.test_client()
+
+
+def test_optimize_planning_par_defaut(client_tournee, charger_tournee):
+    camion_id = charger_tournee(15)
+    reponse = client_tournee.post(f"/api/tournee/optimize/{camion_id}")
+    assert reponse.status_code == 201
+    data = reponse.get_json()
+    assert len(data["ordre_clients"]) == 15
+    # Bien plus que les ~135 itérations du refroidissement historique
+    assert data["parametres"]["iterations"] > 1000
+
+
+def test_optimize_arret_par_stagnation(client_tournee, charger_tournee):
+    camion_id = charger_tournee(10)
+    reponse = client_tournee.post(
+        f"/api/tournee/optimize/{camion_id}?max_sans_amelioration=50&facteur_iterations=100")
+    assert reponse.status_code == 201
+    assert reponse.get_json()["parametres"]["arret"] == "stagnation"
+
+
+@pytest.mark.parametrize("query", [
+    "cooling_rate=1.5", "facteur_iterations=0", "temps_max=abc",
+    "initial_temp=-3", "voisinages=3opt", "p0=1", "departs=0", "seed=x", "distances=google",
+])
+def test_optimize_parametre_invalide(client_tournee, charger_tournee, query):
+    camion_id = charger_tournee(5)
+    assert client_tournee.post(f"/api/tournee/optimize/{camion_id}?{query}").status_code == 400
+
+
+def test_optimize_temperature_initiale_donnee(client_tournee, charger_tournee):
+    # min_temp reste "auto" : T0 * RATIO_TEMP_MIN avec la T0 donnée
+    camion_id = charger_tournee(6)
+    reponse = client_tournee.post(f"/api/tournee/optimize/{camion_id}?initial_temp=500&facteur_iterations=2")
+    assert reponse.status_code == 201
+    assert reponse.get_json()["parametres"]["arret"] == "temperature"
+
+
+@pytest.mark.parametrize("valeur", ["0", "-5"])
+def test_optimize_sans_limite_de_stagnation(client_tournee, charger_tournee, valeur):
+    camion_id = charger_tournee(6)
+    reponse = client_tournee.post(
+        f"/api/tournee/optimize/{camion_id}?max_sans_amelioration={valeur}&facteur_iterations=2&temps_max=0")
+    assert reponse.status_code == 201
+    data = reponse.get_json()["parametres"]
+    assert data["arret"] == "temperature" and data["iterations"] > 100
+
+
+def test_optimize_multi_depart_reproductible(client_tournee, charger_tournee):
+    from services.simulated_annealing import calculate_distance_matrix_gps, rejouer
+    from models.models import Colis
+
+    camion_id = charger_tournee(12)
+    query = "departs=3&workers=1&seed=42&temps_max=0&facteur_iterations=5"
+    premiere = client_tournee.post(f"/api/tournee/optimize/{camion_id}?{query}").get_json()
+    seconde = client_tournee.post(f"/api/tournee/optimize/{camion_id}?{query}&force=1").get_json()
+    assert not seconde["cache"]
+    assert premiere["ordre_clients"] == seconde["ordre_clients"]
+    parametres = premiere["parametres"]
+    assert parametres["seed_depart"] == 42 and len(parametres["seeds"]) == 3
+    assert parametres["seed"] in parametres["seeds"]
+
+    # Régénération à partir des seuls paramètres enregistrés
+    colis = sorted(Colis.query.all(), key=lambda c: c.id_colis)
+    matrice = calculate_distance_matrix_gps([c.latitude for c in colis], [c.longitude for c in colis])
+    route, _ = rejouer(matrice, list(range(len(colis))), parametres)
+    assert [colis[i].id_colis for i in route] == premiere["ordre_clients"]
+
+
+def test_optimize_all(app_tournee, client_tournee, charger_tournee):
+    from models import db
+    from models.models import Tournee
+    charger_tournee(8, seed=1, camion_id=1)
+    charger_tournee(12, seed=2, camion_id=2)
+    charger_tournee(1, seed=3, camion_id=3)
+    reponse = client_tournee.post("/api/tournee/optimize-all?workers=1&facteur_iterations=5&seed=4")
+    assert reponse.status_code == 201
+    data = reponse.get_json()
+    assert sorted(t["camion_id"] for t in data["tournees"]) == [1, 2]
+    assert {t["camion_id"]: len(t["ordre_clients"]) for t in data["tournees"]} == {1: 8, 2: 12}
+    assert "3" in data["ignores"]
+    assert db.session.query(Tournee).count() == 2
+
+
+def test_optimize_all_meme_resultat_que_par_camion(client_tournee, charger_tournee):
+    charger_tournee(10, seed=5, camion_id=1)
+    query = "workers=1&facteur_iterations=5&temps_max=0"
+    flotte = client_tournee.post(f"/api/tournee/optimize-all?{query}&seed=9").get_json()["tournees"][0]
+    seed = flotte["parametres"]["seed_depart"]
+    seul = client_tournee.post(f"/api/tournee/optimize/1?{query}&seed={seed}").get_json()
+    assert seul["ordre_clients"] == flotte["ordre_clients"]
+
+
+def test_optimize_cache_par_empreinte(client_tournee, charger_tournee):
+    from models import db
+    from models.models import Colis, Tournee
+    camion_id = charger_tournee(8)
+    url = f"/api/tournee/optimize/{camion_id}?facteur_iterations=2"
+    premiere = client_tournee.post(url)
+    assert premiere.status_code == 201 and not premiere.get_json()["cache"]
+
+    repetee = client_tournee.post(url)
+    assert repetee.status_code == 200
+    assert repetee.get_json()["cache"]
+    assert repetee.get_json()["id_tournee"] == premiere.get_json()["id_tournee"]
+    assert db.session.query(Tournee).count() == 1
+
+    # Autres paramètres, force ou coordonnées modifiées : nouveau calcul
+    assert client_tournee.post(url + "&cooling_rate=0.9").status_code == 201
+    assert client_tournee.post(url + "&force=1").status_code == 201
+    colis = db.session.query(Colis).first()
+    colis.latitude += 0.01
+    db.session.commit()
+    assert client_tournee.post(url).status_code == 201
+    assert db.session.query(Tournee).count() == 4
+
+
+def test_optimize_all_reprend_le_cache(client_tournee, charger_tournee):
+    charger_tournee(6, seed=1, camion_id=1)
+    charger_tournee(7, seed=2, camion_id=2)
+    client_tournee.post("/api/tournee/optimize/1?workers=1&facteur_iterations=2")
+    data = client_tournee.post("/api/tournee/optimize-all?workers=1&facteur_iterations=2").get_json()
+    assert {t["camion_id"]: t["cache"] for t in data["tournees"]} == {1: True, 2: False}
+
+
+def test_echeance_livraison_minuit_fin_de_journee():
+    from datetime import datetime
+    from routes.tournee_route import echeance_livraison
+    depart = datetime(2026, 1, 1, 8, 0)
+    assert echeance_livraison(datetime(2026, 1, 1), depart) == 16
+    assert echeance_livraison(datetime(2026, 1, 1, 10, 30), depart) == 2.5
+    assert echeance_livraison(None, depart) is None
+
+
+def test_optimize_ancre_au_depot(client_tournee, charger_tournee):
+    camion_id = charger_tournee(10)
+    url = f"/api/tournee/optimize/{camion_id}?depot=1&depart=2026-01-01T08:00&service=6&facteur_iterations=5"
+    data = client_tournee.post(url).get_json()
+    assert len(data["ordre_clients"]) == 10
+    assert data["parametres"]["retards"] == []
+    # Trajets à 50 km/h, plus 10 arrêts de 6 min
+    assert data["temps_estime"] == pytest.approx(data["distance_totale"] / 50 + 1.0, abs=0.02)
+
+
+def test_optimize_ancre_signale_les_retards(client_tournee, charger_tournee):
+    camion_id = charger_tournee(6)
+    url = f"/api/tournee/optimize/{camion_id}?depot=1&depart=2026-01-02T08:00&facteur_iterations=2"
+    data = client_tournee.post(url).get_json()
+    assert sorted(data["parametres"]["retards"]) == sorted(data["ordre_clients"])
+
+
+def test_optimize_ancre_sans_coordonnees_du_depot(client_tournee, charger_tournee):
+    from models import db
+    from models.models import Depot
+    camion_id = charger_tournee(4)
+    db.session.get(Depot, 1).latitude = None
+    db.session.commit()
+    assert client_tournee.post(f"/api/tournee/optimize/{camion_id}?depot=1").status_code == 400
+    assert client_tournee.post("/api/tournee/optimize-all?depot=1").status_code == 400
+
+
+def test_optimize_all_ancre_au_depot(client_tournee, charger_tournee):
+    charger_tournee(5, seed=1, camion_id=1)
+    charger_tournee(7, seed=2, camion_id=2)
+    data = client_tournee.post(
+        "/api/tournee/optimize-all?workers=1&depot=1&depart=2026-01-01T08:00&facteur_iterations=2").get_json()
+    assert {t["camion_id"]: len(t["ordre_clients"]) for t in data["tournees"]} == {1: 5, 2: 7}
+    assert all(t["parametres"]["retards"] == [] for t in data["tournees"])
+
+
+def test_optimize_distances_osrm(client_tournee, charger_tournee, serveur_osrm, monkeypatch):
+    from services import distance_cache, distance_provider
+    from services.osrm_client import OSRMClient
+    serveur = serveur_osrm()
+    monkeypatch.setattr(distance_cache, "_caches", {})
+    monkeypatch.setattr(distance_provider, "_fournisseurs", {
+        "osrm": distance_provider.CachedProvider(distance_provider.OSRMProvider(OSRMClient(serveur.url)))})
+    camion_id = charger_tournee(8)
+    query = "seed=3&temps_max=0&facteur_iterations=5"
+    haversine = client_tournee.post(f"/api/tournee/optimize/{camion_id}?{query}").get_json()
+    osrm = client_tournee.post(f"/api/tournee/optimize/{camion_id}?{query}&distances=osrm")
+    # La source des distances fait partie de l'empreinte
+    assert osrm.status_code == 201 and not osrm.get_json()["cache"]
+    assert serveur.requetes == 1
+    # Le faux OSRM renvoie des distances haversine : même tournée
+    assert osrm.get_json()["distance_totale"] == pytest.approx(haversine["distance_totale"], abs=0.01)
+
+
+def test_optimize_distances_indisponibles(client_tournee, charger_tournee, serveur_osrm, monkeypatch):
+    from services import distance_cache, distance_provider
+    from services.osrm_client import OSRMClient
+    serveur = serveur_osrm(echecs=10)
+    monkeypatch.setattr(distance_cache, "_caches", {})
+    monkeypatch.setattr(distance_provider, "_fournisseurs", {
+        "osrm": distance_provider.OSRMProvider(OSRMClient(serveur.url, tentatives=1))})
+    camion_id = charger_tournee(5)
+    assert client_tournee.post(f"/api/tournee/optimize/{camion_id}?distances=osrm").status_code == 503
+    reponse = client_tournee.post("/api/tournee/optimize-all?distances=osrm").get_json()
+    assert reponse["tournees"] == [] and str(camion_id) in reponse["ignores"]